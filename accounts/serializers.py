@@ -1,5 +1,14 @@
 from django.contrib.auth import get_user_model
-from rest_framework import serializers
+from django.contrib.auth.models import update_last_login
+from rest_framework import exceptions, serializers
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenObtainSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+
+from core.authentication import STAFF_CLAIM, SUPERUSER_CLAIM
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -18,3 +27,45 @@ class UserSerializer(serializers.ModelSerializer):
             user.set_password(password)
             user.save()
         return user
+
+
+def role_access_token(refresh, user):
+    """The access token of `refresh` with the role claims of `user`."""
+    access = refresh.access_token
+    access[STAFF_CLAIM] = user.is_staff
+    access[SUPERUSER_CLAIM] = user.is_superuser
+    return access
+
+
+# Role claims go in the access token only. The refresh token outlives role
+# changes, so `ClaimsTokenRefreshSerializer` reads them again.
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    def validate(self, attrs):
+        data = TokenObtainSerializer.validate(self, attrs)
+        refresh = self.get_token(self.user)
+        data["refresh"] = str(refresh)
+        data["access"] = str(role_access_token(refresh, self.user))
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, self.user)
+        return data
+
+
+# Issues access tokens with role claims read from the database, and none for
+# users that were deleted or deactivated, so demotions take effect on the
+# next refresh.
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    default_error_messages = TokenObtainSerializer.default_error_messages
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user = get_user_model().objects.filter(**{
+            api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM],
+        }).first()
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise exceptions.AuthenticationFailed(
+                self.error_messages["no_active_account"], "no_active_account"
+            )
+
+        data = super().validate(attrs)
+        data["access"] = str(role_access_token(refresh, user))
+        return data
@@ -1,3 +1,113 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
-# Create your tests here.
+from airport.models import Country, Order
+from core.authentication import clear_user_cache
+
+
+class TestClaimsAuthentication(APITestCase):
+    def setUp(self):
+        clear_user_cache()
+        self.user = get_user_model().objects.create_user(
+            username="test", email="test@example.com", password="password"
+        )
+        self.staff = get_user_model().objects.create_user(
+            username="staff", email="staff@example.com", password="password", is_staff=True
+        )
+
+    def authenticate(self, username):
+        response = self.client.post(
+            reverse("accounts:token_obtain_pair"),
+            {"username": username, "password": "password"},
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return response.data
+
+    def user_queries(self, queries):
+        table = get_user_model()._meta.db_table
+        return [query for query in queries.captured_queries if table in query["sql"]]
+
+    def test_token_carries_role_claims(self):
+        tokens = self.authenticate("staff")
+        token = AccessToken(tokens["access"])
+        self.assertEqual(token["user_id"], self.staff.pk)
+        self.assertTrue(token["is_staff"])
+        self.assertFalse(token["is_superuser"])
+
+    def test_refresh_token_has_no_role_claims(self):
+        refresh = RefreshToken(self.authenticate("staff")["refresh"])
+        self.assertNotIn("is_staff", refresh)
+        self.assertNotIn("is_superuser", refresh)
+
+    def test_refresh_reads_role_claims(self):
+        tokens = self.authenticate("staff")
+        url = reverse("accounts:token_refresh")
+        response = self.client.post(url, {"refresh": tokens["refresh"]})
+        self.assertTrue(AccessToken(response.data["access"])["is_staff"])
+
+        self.staff.is_staff = False
+        self.staff.save()
+        response = self.client.post(url, {"refresh": tokens["refresh"]})
+        self.assertFalse(AccessToken(response.data["access"])["is_staff"])
+
+        self.staff.is_active = False
+        self.staff.save()
+        response = self.client.post(url, {"refresh": tokens["refresh"]})
+        self.assertEqual(response.status_code, 401)
+
+    def test_no_user_query(self):
+        self.authenticate("test")
+        Order.objects.create(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("airport:order-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(self.user_queries(queries), [])
+
+    def test_claims_grant_permissions(self):
+        self.authenticate("test")
+        response = self.client.post(reverse("airport:country-list"), {"name": "test"})
+        self.assertEqual(response.status_code, 403)
+
+        self.authenticate("staff")
+        response = self.client.post(reverse("airport:country-list"), {"name": "test"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Country.objects.count(), 1)
+
+    def test_order_created_for_token_user(self):
+        self.authenticate("test")
+        response = self.client.post(reverse("airport:order-list"), {}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.get().user, self.user)
+
+    def test_profile_loads_full_user(self):
+        self.authenticate("test")
+        response = self.client.get(reverse("accounts:profile"))
+        self.assertEqual(response.data["email"], "test@example.com")
+
+    def test_token_without_claims_uses_cached_lookup(self):
+        token = AccessToken.for_user(self.staff)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        url = reverse("airport:order-list")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len(self.user_queries(queries)), 1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.user_queries(queries), [])
+
+    @override_settings(JWT_USER_CACHE_TTL=0)
+    def test_user_cache_disabled(self):
+        token = AccessToken.for_user(self.staff)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        url = reverse("airport:order-list")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len(self.user_queries(queries)), 1)
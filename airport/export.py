@@ -0,0 +1,96 @@
+import csv
+import json
+from datetime import datetime
+
+from airport.models import Order, Ticket
+
+TICKET_EXPORT_COLUMNS = {
+    "ticket_id": "id",
+    "row": "row",
+    "seat": "seat",
+    "order_id": "order_id",
+    "order_created_at": "order__created_at",
+    "user_id": "order__user_id",
+    "user_email": "order__user__email",
+    "flight_id": "flight_id",
+    "departure_time": "flight__departure_time",
+    "arrival_time": "flight__arrival_time",
+    "route_id": "flight__route_id",
+    "source": "flight__route__source__name",
+    "destination": "flight__route__destination__name",
+    "distance": "flight__route__distance",
+}
+ORDER_EXPORT_COLUMNS = {
+    "order_id": "id",
+    "order_created_at": "created_at",
+    "user_id": "user_id",
+    "user_email": "user__email",
+    "ticket_id": "tickets__id",
+    "row": "tickets__row",
+    "seat": "tickets__seat",
+    "flight_id": "tickets__flight_id",
+    "departure_time": "tickets__flight__departure_time",
+    "arrival_time": "tickets__flight__arrival_time",
+    "route_id": "tickets__flight__route_id",
+    "source": "tickets__flight__route__source__name",
+    "destination": "tickets__flight__route__destination__name",
+    "distance": "tickets__flight__route__distance",
+}
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object that returns what is written, for csv.writer."""
+    def write(self, value):
+        return value
+
+
+def _format(value):
+    if isinstance(value, datetime):
+        return value.isoformat().replace("+00:00", "Z")
+    return value
+
+
+def _export_rows(queryset, columns, *ordering):
+    # `values_list().iterator()` lets PostgreSQL stream the rows through a
+    # server-side cursor `EXPORT_CHUNK_SIZE` at a time, with no model
+    # instances built.
+    rows = queryset.order_by(*ordering).values_list(*columns.values())
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield tuple(_format(value) for value in row)
+
+
+def ticket_export_rows(queryset=None):
+    """Yield one tuple per ticket, joined with its order, flight and route."""
+    if queryset is None:
+        queryset = Ticket.objects.all()
+    return _export_rows(queryset, TICKET_EXPORT_COLUMNS, "id")
+
+
+def order_export_rows(queryset=None):
+    """
+    Yield one tuple per ticket of every order, joined with its flight and
+    route, and one with empty ticket columns per order without tickets
+    (the tickets are LEFT JOINed).
+    """
+    if queryset is None:
+        queryset = Order.objects.all()
+    return _export_rows(queryset, ORDER_EXPORT_COLUMNS, "id", "tickets__id")
+
+
+def stream_ndjson(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row))) + "\n"
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+EXPORT_FORMATS = {
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+    "csv": (stream_csv, "text/csv"),
+}
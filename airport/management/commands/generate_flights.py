@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from airport.schedule_import import MAX_REPORTED_ERRORS
+from airport.schedules import GENERATION_DAYS, generate_flights
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the flights of recurring schedules up to a horizon, "
+        "skipping dates already generated"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=GENERATION_DAYS,
+            help=f"How many days ahead to generate flights (default: {GENERATION_DAYS})",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows per INSERT",
+        )
+
+    def handle(self, *args, **options):
+        created, rejected = generate_flights(options["days"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Created {created} scheduled flights"))
+        if rejected:
+            lines = []
+            for schedule_id, departure_time, other_flight_id, crew_id in rejected[:MAX_REPORTED_ERRORS]:
+                booked = "airplane" if crew_id is None else f"crew member {crew_id}"
+                other = f"overlapping flight {other_flight_id}" if other_flight_id else "an overlapping flight"
+                lines.append(
+                    f"schedule {schedule_id} at {departure_time.isoformat()}: {booked} is booked on {other}"
+                )
+            if len(rejected) > MAX_REPORTED_ERRORS:
+                lines.append(f"... and {len(rejected) - MAX_REPORTED_ERRORS} more")
+            self.stdout.write(self.style.WARNING(
+                f"Skipped {len(rejected)} flights overlapping a flight of their airplane or crew:\n"
+                + "\n".join(lines)
+            ))
@@ -0,0 +1,78 @@
+import sys
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from airport.models import Route
+from airport.schedule_import import (
+    MAX_REPORTED_ERRORS,
+    ScheduleResolver,
+    bulk_create_schedule,
+    conflict_message,
+    copy_schedule,
+    read_records,
+    spool_schedule,
+)
+from core.caching import bump_model_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Import routes, flights and crew assignments from a CSV or NDJSON "
+        "schedule, with COPY and set-based upserts on PostgreSQL"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Schedule file, or - to read stdin")
+        parser.add_argument(
+            "--format",
+            choices=("csv", "ndjson"),
+            dest="input_format",
+            help="Input format, guessed from the file extension by default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows per INSERT when COPY is unavailable",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        input_format = options["input_format"]
+        if input_format is None:
+            input_format = "csv" if path.endswith(".csv") else "ndjson"
+
+        stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        try:
+            resolver = ScheduleResolver()
+            resolved = resolver.resolve(read_records(stream, input_format))
+            if connection.vendor == "postgresql":
+                load = partial(copy_schedule, *spool_schedule(resolved))
+            else:
+                load = partial(bulk_create_schedule, list(resolved), options["batch_size"])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.check_errors(resolver.errors)
+        with transaction.atomic():
+            stats = load()
+            for line, *conflict in stats["conflicts"]:
+                resolver.error(line, conflict_message(*conflict))
+            self.check_errors(resolver.errors)
+
+        if stats["routes"]:
+            bump_model_version(Route)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['created']} new flights, updated {stats['updated']}, "
+            f"created {stats['routes']} routes and {stats['crew']} crew assignments"
+        ))
+
+    def check_errors(self, errors):
+        if errors:
+            reported = errors[:MAX_REPORTED_ERRORS]
+            if len(errors) > MAX_REPORTED_ERRORS:
+                reported.append(f"... and {len(errors) - MAX_REPORTED_ERRORS} more")
+            raise CommandError("Nothing imported:\n" + "\n".join(reported))
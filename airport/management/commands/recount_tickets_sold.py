@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Now
+
+from airport.models import Flight, Ticket
+
+
+class Command(BaseCommand):
+    help = "Recompute Flight.tickets_sold from the ticket table in one UPDATE"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--flight",
+            type=int,
+            nargs="+",
+            dest="flights",
+            help="Only recount these flight ids",
+        )
+
+    def handle(self, *args, **options):
+        sold = Ticket.objects.filter(
+            flight=OuterRef("pk")
+        ).order_by().values("flight").annotate(count=Count("pk")).values("count")
+
+        actual = Coalesce(Subquery(sold), 0)
+
+        flights = Flight.objects.exclude(tickets_sold=actual)
+        if options["flights"]:
+            flights = flights.filter(pk__in=options["flights"])
+        updated = flights.update(tickets_sold=actual, updated_at=Now())
+
+        self.stdout.write(self.style.SUCCESS(f"Corrected ticket counts of {updated} flights"))
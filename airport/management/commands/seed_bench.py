@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from airport.models import Country
+from airport.seeding import ROWS_PER_SCALE, seed_bench
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-create a deterministic benchmark dataset: countries, cities, "
+        "airports, routes, airplanes, crew, flights, flight schedules, users, "
+        "orders and tickets"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            type=int,
+            default=1,
+            help=f"Dataset size multiplier; 1 creates {ROWS_PER_SCALE['flights']} flights (default: 1)",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed, so runs with the same scale build the same data (default: 0)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows per INSERT",
+        )
+
+    def handle(self, *args, **options):
+        if options["scale"] < 1:
+            raise CommandError("--scale must be at least 1")
+        if Country.objects.exists():
+            raise CommandError("The database already has data; seed an empty database")
+
+        counts = seed_bench(options["scale"], seed=options["seed"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            "Created " + ", ".join(f"{count} {name}" for name, count in counts.items())
+        ))
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:56
+
+from django.db import migrations, models
+
+SEAT_BOUNDS_TRIGGER = """
+CREATE OR REPLACE FUNCTION airport_ticket_check_seat_bounds() RETURNS trigger AS $$
+DECLARE
+    max_row integer;
+    max_seat integer;
+BEGIN
+    IF NEW.flight_id IS NULL THEN
+        RETURN NEW;
+    END IF;
+    SELECT airplane.rows, airplane.seats_per_row
+      INTO max_row, max_seat
+      FROM airport_flight flight
+      JOIN airport_airplane airplane ON airplane.id = flight.airplane_id
+     WHERE flight.id = NEW.flight_id;
+    IF NEW."row" > max_row OR NEW.seat > max_seat THEN
+        RAISE EXCEPTION 'Seat (%, %) does not exist on flight %', NEW."row", NEW.seat, NEW.flight_id
+            USING ERRCODE = 'check_violation';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER airport_ticket_check_seat_bounds
+    BEFORE INSERT OR UPDATE OF flight_id, "row", seat ON airport_ticket
+    FOR EACH ROW EXECUTE FUNCTION airport_ticket_check_seat_bounds();
+"""
+
+DROP_SEAT_BOUNDS_TRIGGER = """
+DROP TRIGGER IF EXISTS airport_ticket_check_seat_bounds ON airport_ticket;
+DROP FUNCTION IF EXISTS airport_ticket_check_seat_bounds();
+"""
+
+
+def create_seat_bounds_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(SEAT_BOUNDS_TRIGGER, params=None)
+
+
+def drop_seat_bounds_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_SEAT_BOUNDS_TRIGGER, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('airport', '0002_flight_order_ticket_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='ticket',
+            name='unique_ticket',
+        ),
+        migrations.AddConstraint(
+            model_name='ticket',
+            constraint=models.UniqueConstraint(fields=('flight', 'row', 'seat'), name='unique_ticket'),
+        ),
+        migrations.AddConstraint(
+            model_name='ticket',
+            constraint=models.CheckConstraint(condition=models.Q(('row__gte', 1), ('seat__gte', 1)), name='ticket_seat_positive'),
+        ),
+        migrations.RunPython(create_seat_bounds_trigger, drop_seat_bounds_trigger),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:09
+
+import airport.models
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('airport', '0006_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlightSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('days_of_week', models.PositiveSmallIntegerField(help_text='Bitmask of operating days: Monday = 1, Tuesday = 2, ... Sunday = 64', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(127)])),
+                ('departure_time', models.TimeField(help_text='Local departure time in `timezone`')),
+                ('duration', models.DurationField()),
+                ('timezone', models.CharField(default='UTC', max_length=64, validators=[airport.models.validate_timezone])),
+                ('valid_from', models.DateField()),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('generated_until', models.DateField(editable=False, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('airplane', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='airport.airplane')),
+                ('crew', models.ManyToManyField(blank=True, related_name='schedules', to='airport.crew')),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='airport.route')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='schedule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='flights', to='airport.flightschedule'),
+        ),
+        migrations.AddConstraint(
+            model_name='flight',
+            constraint=models.UniqueConstraint(fields=('schedule', 'departure_time'), name='unique_scheduled_flight'),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:23
+
+from django.db import migrations, models
+
+CREW_OVERLAP_TRIGGERS = """
+CREATE INDEX IF NOT EXISTS flight_period_gist_idx
+    ON airport_flight USING gist (tstzrange(departure_time, arrival_time, '[]'));
+
+CREATE OR REPLACE FUNCTION airport_flight_crew_check_overlap() RETURNS trigger AS $$
+DECLARE
+    conflict bigint;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('airport_crew_schedule'), (NEW.crew_id % 2147483647)::integer);
+    SELECT other.id
+      INTO conflict
+      FROM airport_flight flight
+      JOIN airport_flight_crew assignment
+        ON assignment.crew_id = NEW.crew_id AND assignment.flight_id <> NEW.flight_id
+      JOIN airport_flight other ON other.id = assignment.flight_id
+     WHERE flight.id = NEW.flight_id
+       AND other.departure_time < flight.arrival_time
+       AND other.arrival_time > flight.departure_time
+     LIMIT 1;
+    IF FOUND THEN
+        RAISE EXCEPTION 'Crew member % is already assigned to flight %, which overlaps flight %',
+            NEW.crew_id, conflict, NEW.flight_id
+            USING ERRCODE = 'exclusion_violation';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER airport_flight_crew_check_overlap
+    BEFORE INSERT OR UPDATE ON airport_flight_crew
+    FOR EACH ROW EXECUTE FUNCTION airport_flight_crew_check_overlap();
+
+CREATE OR REPLACE FUNCTION airport_flight_check_crew_overlap() RETURNS trigger AS $$
+DECLARE
+    crew bigint;
+    conflict bigint;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('airport_crew_schedule'), (assignment.crew_id % 2147483647)::integer)
+       FROM airport_flight_crew assignment
+      WHERE assignment.flight_id = NEW.id
+      ORDER BY assignment.crew_id;
+    SELECT assignment.crew_id, other.id
+      INTO crew, conflict
+      FROM airport_flight_crew assignment
+      JOIN airport_flight_crew other_assignment
+        ON other_assignment.crew_id = assignment.crew_id AND other_assignment.flight_id <> NEW.id
+      JOIN airport_flight other ON other.id = other_assignment.flight_id
+     WHERE assignment.flight_id = NEW.id
+       AND other.departure_time < NEW.arrival_time
+       AND other.arrival_time > NEW.departure_time
+     LIMIT 1;
+    IF FOUND THEN
+        RAISE EXCEPTION 'Crew member % is already assigned to flight %, which overlaps flight %',
+            crew, conflict, NEW.id
+            USING ERRCODE = 'exclusion_violation';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER airport_flight_check_crew_overlap
+    BEFORE UPDATE OF departure_time, arrival_time ON airport_flight
+    FOR EACH ROW EXECUTE FUNCTION airport_flight_check_crew_overlap();
+"""
+
+DROP_CREW_OVERLAP_TRIGGERS = """
+DROP TRIGGER IF EXISTS airport_flight_check_crew_overlap ON airport_flight;
+DROP FUNCTION IF EXISTS airport_flight_check_crew_overlap();
+DROP TRIGGER IF EXISTS airport_flight_crew_check_overlap ON airport_flight_crew;
+DROP FUNCTION IF EXISTS airport_flight_crew_check_overlap();
+DROP INDEX IF EXISTS flight_period_gist_idx;
+"""
+
+
+def create_crew_overlap_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREW_OVERLAP_TRIGGERS, params=None)
+
+
+def drop_crew_overlap_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_CREW_OVERLAP_TRIGGERS, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('airport', '0007_flight_schedule'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='flight',
+            constraint=models.CheckConstraint(condition=models.Q(('arrival_time__gte', models.F('departure_time'))), name='flight_arrival_after_departure'),
+        ),
+        migrations.RunPython(create_crew_overlap_triggers, drop_crew_overlap_triggers),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:02
+
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+
+AIRPLANE_OVERLAP_CONSTRAINT = """
+ALTER TABLE airport_flight
+    ADD CONSTRAINT flight_airplane_no_overlap
+    EXCLUDE USING gist (
+        airplane_id WITH =,
+        tstzrange(departure_time, arrival_time, '[)') WITH &&
+    );
+"""
+
+DROP_AIRPLANE_OVERLAP_CONSTRAINT = """
+ALTER TABLE airport_flight DROP CONSTRAINT IF EXISTS flight_airplane_no_overlap;
+"""
+
+
+def create_airplane_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(AIRPLANE_OVERLAP_CONSTRAINT, params=None)
+
+
+def drop_airplane_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_AIRPLANE_OVERLAP_CONSTRAINT, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('airport', '0008_flight_crew_overlap'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.RunPython(create_airplane_overlap_constraint, drop_airplane_overlap_constraint),
+    ]
@@ -1,12 +1,18 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
 from rest_framework.serializers import ValidationError
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.validators import MinValueValidator
-from django.db import models
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
 from django.urls import reverse
+from django.utils import timezone
 
 
 class AirplaneType(models.Model):
     name = models.CharField(max_length=100, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -19,6 +25,7 @@ class Airplane(models.Model):
     airplane_type = models.ForeignKey(AirplaneType,
                                       on_delete=models.CASCADE,
                                       related_name="airplanes")
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -42,6 +49,7 @@ class Airplane(models.Model):
 
 class Country(models.Model):
     name = models.CharField(max_length=250, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -50,6 +58,7 @@ class Country(models.Model):
 class City(models.Model):
     name = models.CharField(max_length=250, unique=True)
     country = models.ForeignKey(Country, on_delete=models.CASCADE, related_name="cities")
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -63,6 +72,7 @@ class Airport(models.Model):
     closest_big_city = models.ForeignKey(
         City, on_delete=models.SET_NULL, null=True, related_name="airports"
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -71,6 +81,7 @@ class Airport(models.Model):
 class Crew(models.Model):
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.last_name} {self.first_name}"
@@ -80,6 +91,7 @@ class Route(models.Model):
     source = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name="sources")
     destination = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name="destinations")
     distance = models.IntegerField(validators=[MinValueValidator(1)])
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.source} - {self.destination} ({self.distance})"
@@ -93,17 +105,101 @@ class Route(models.Model):
         ]
 
 
+def validate_timezone(value):
+    try:
+        ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise DjangoValidationError(f"Unknown time zone {value!r}")
+
+
+class FlightSchedule(models.Model):
+    """
+    A flight repeated on some days of every week.
+
+    `days_of_week` is a bitmask with Monday as 1 and Sunday as 64, and
+    `departure_time` is local to `timezone`, so departures keep their wall
+    clock time across DST changes. `generated_until` is the last date
+    flights were materialized for.
+    """
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name="schedules")
+    airplane = models.ForeignKey(Airplane, on_delete=models.CASCADE, related_name="schedules")
+    crew = models.ManyToManyField(Crew, related_name="schedules", blank=True)
+    days_of_week = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(127)],
+        help_text="Bitmask of operating days: Monday = 1, Tuesday = 2, ... Sunday = 64",
+    )
+    departure_time = models.TimeField(help_text="Local departure time in `timezone`")
+    duration = models.DurationField()
+    timezone = models.CharField(
+        max_length=64, default=settings.TIME_ZONE, validators=[validate_timezone]
+    )
+    valid_from = models.DateField()
+    valid_until = models.DateField(null=True, blank=True)
+    generated_until = models.DateField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.route} at {self.departure_time}"
+
+    def operates_on(self, date):
+        return bool(self.days_of_week & (1 << date.weekday()))
+
+
 class Flight(models.Model):
     crew = models.ManyToManyField(Crew, related_name="flights")
     route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name="flights")
     airplane = models.ForeignKey(Airplane, on_delete=models.CASCADE, related_name="flights")
     departure_time = models.DateTimeField()
     arrival_time = models.DateTimeField()
+    tickets_sold = models.PositiveIntegerField(default=0, editable=False)
+    schedule = models.ForeignKey(
+        FlightSchedule,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="flights",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def add_tickets_sold(cls, flight_id, count):
+        cls.objects.filter(pk=flight_id).update(
+            tickets_sold=models.F("tickets_sold") + count,
+            updated_at=timezone.now(),
+        )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["schedule", "departure_time"],
+                name="unique_scheduled_flight"
+            ),
+            models.CheckConstraint(
+                condition=models.Q(arrival_time__gte=models.F("departure_time")),
+                name="flight_arrival_after_departure"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["departure_time", "id"],
+                name="flight_departure_id_idx"
+            ),
+            models.Index(
+                fields=["route", "departure_time"],
+                name="flight_route_departure_idx"
+            ),
+        ]
 
 
 class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(get_user_model(), null=True, on_delete=models.SET_NULL, related_name="orders")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "id"], name="order_user_id_idx"),
+        ]
 
 
 class Ticket(models.Model):
@@ -111,15 +207,33 @@ class Ticket(models.Model):
     flight = models.ForeignKey(Flight, null=True, on_delete=models.SET_NULL, related_name="tickets")
     row = models.IntegerField(validators=[MinValueValidator(1)])
     seat = models.IntegerField(validators=[MinValueValidator(1)])
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Flight the row was loaded with, so signal handlers can tell when a
+    # ticket is moved to another flight.
+    _loaded_flight_id = None
 
     class Meta:
         constraints = [
             models.UniqueConstraint(
-                fields=["flight", "row", "seat", "order"],
+                fields=["flight", "row", "seat"],
                 name="unique_ticket"
             ),
+            models.CheckConstraint(
+                condition=models.Q(row__gte=1, seat__gte=1),
+                name="ticket_seat_positive"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["order", "id"], name="ticket_order_id_idx"),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_flight_id = instance.__dict__.get("flight_id")
+        return instance
+
     def validate_row(self):
         if self.row > self.flight.airplane.rows:
             raise ValidationError({"row": "Invalid row number"})
@@ -134,4 +248,5 @@ class Ticket(models.Model):
 
     def save(self, *args, **kwargs):
         self.full_clean()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
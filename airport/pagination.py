@@ -0,0 +1,158 @@
+import json
+from base64 import b64decode, b64encode
+from collections import namedtuple
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+KeysetCursor = namedtuple("KeysetCursor", ["reverse", "position"])
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on the full `ordering` tuple.
+
+    The cursor stores the values of every ordering field of the boundary row,
+    so each page is fetched with a `(a, b) > (x, y)` style filter against a
+    matching index. Unlike `CursorPagination` there is no offset to walk, and
+    no page ever issues a `COUNT(*)`.
+    """
+    ordering = ("id",)
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request, queryset.model)
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        queryset = queryset.order_by(*self.get_order_by(reverse))
+        if self.cursor is not None:
+            queryset = queryset.filter(
+                self.get_keyset_filter(self.cursor.position, reverse)
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return self.page
+
+    def get_order_by(self, reverse):
+        if not reverse:
+            return self.ordering
+        return tuple(
+            name[1:] if name.startswith("-") else f"-{name}"
+            for name in self.ordering
+        )
+
+    def get_keyset_filter(self, position, reverse):
+        conditions = []
+        for index, name in enumerate(self.ordering):
+            descending = name.startswith("-")
+            lookup = "lt" if descending != reverse else "gt"
+            condition = {
+                previous.lstrip("-"): value
+                for previous, value in zip(self.ordering[:index], position)
+            }
+            condition[f"{name.lstrip('-')}__{lookup}"] = position[index]
+            conditions.append(Q(**condition))
+        return reduce(or_, conditions)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return self.encode_cursor(KeysetCursor(False, self.cursor.position))
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(KeysetCursor(False, position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return self.encode_cursor(KeysetCursor(True, self.cursor.position))
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(KeysetCursor(True, position))
+
+    def decode_cursor(self, request, model=None):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            tokens = json.loads(b64decode(encoded.encode("ascii")))
+            reverse = bool(tokens.get("r", False))
+            position = tokens["p"]
+            if len(position) != len(self.ordering):
+                raise ValueError
+            position = [
+                model._meta.get_field(name.lstrip("-")).to_python(value)
+                for name, value in zip(self.ordering, position)
+            ]
+        except (TypeError, ValueError, KeyError, AttributeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return KeysetCursor(reverse=reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        tokens = {"p": cursor.position}
+        if cursor.reverse:
+            tokens["r"] = 1
+        encoded = b64encode(json.dumps(tokens).encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for name in ordering:
+            name = name.lstrip("-")
+            if isinstance(instance, dict):
+                value = instance[name]
+            else:
+                value = getattr(instance, name)
+            position.append(None if value is None else str(value))
+        return position
+
+
+class FlightPagination(KeysetPagination):
+    ordering = ("departure_time", "id")
+
+
+class TicketPagination(KeysetPagination):
+    """
+    Staff page over every ticket on `id`. Customers only see the tickets of
+    their own orders, so their pages are keyed on `(order_id, id)`: walking
+    the user's orders in `order_user_id_idx` and each order's tickets in
+    `ticket_order_id_idx` yields rows already in that order, with no sort.
+    """
+    ordering = ("id",)
+    customer_ordering = ("order_id", "id")
+
+    def get_ordering(self, request, queryset, view):
+        user = request.user
+        if user.is_staff or user.is_superuser:
+            return super().get_ordering(request, queryset, view)
+        return self.customer_ordering
+
+
+class OrderPagination(KeysetPagination):
+    ordering = ("id",)
@@ -0,0 +1,172 @@
+from collections import defaultdict
+from functools import reduce
+from itertools import chain, groupby
+from operator import itemgetter, or_
+
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.db import connections
+from django.db.models import Func, Q, Value
+from psycopg2.extras import DateTimeTZRange
+
+from airport.models import Flight
+
+
+class TsTzRange(Func):
+    function = "TSTZRANGE"
+    output_field = DateTimeRangeField()
+
+
+def flights_in_window(queryset, start, end, prefix=""):
+    """
+    Filter `queryset` to rows whose flight (at `prefix`) is in the air at
+    some point of `[start, end)`.
+
+    On PostgreSQL this is a range overlap matching the
+    `flight_period_gist_idx` expression index; elsewhere it is the
+    equivalent pair of comparisons.
+    """
+    if connections[queryset.db].vendor == "postgresql":
+        period = TsTzRange(f"{prefix}departure_time", f"{prefix}arrival_time", Value("[]"))
+        return queryset.alias(flight_period=period).filter(
+            flight_period__overlap=DateTimeTZRange(start, end, "[)")
+        )
+    return queryset.filter(**{
+        f"{prefix}departure_time__lt": end,
+        f"{prefix}arrival_time__gte": start,
+    })
+
+
+def _overlaps(departure_time, arrival_time, other_departure_time, other_arrival_time):
+    return other_departure_time < arrival_time and other_arrival_time > departure_time
+
+
+def airplane_conflict(airplane_id, flight_id, departure_time, arrival_time):
+    """
+    Return the id of a flight of the airplane overlapping
+    `[departure_time, arrival_time)`, other than `flight_id`, or None.
+    """
+    return Flight.objects.filter(
+        airplane_id=airplane_id,
+        departure_time__lt=arrival_time,
+        arrival_time__gt=departure_time,
+    ).exclude(pk=flight_id).values_list("pk", flat=True).first()
+
+
+def airplane_conflicts(airplane_id, periods, exclude=Q()):
+    """
+    Find which new flights of one airplane overlap.
+
+    `periods` are the `(departure_time, arrival_time)` of the new flights.
+    Returns `{index: other_flight_id}` for every period overlapping a
+    flight the airplane already has (except those matching `exclude`) or
+    an earlier, non-conflicting period of the batch, whose id is None.
+    Uses one query over the whole span of the batch.
+    """
+    if not periods:
+        return {}
+
+    booked = list(Flight.objects.filter(
+        airplane_id=airplane_id,
+        departure_time__lt=max(arrival_time for _, arrival_time in periods),
+        arrival_time__gt=min(departure_time for departure_time, _ in periods),
+    ).exclude(exclude).values_list("pk", "departure_time", "arrival_time"))
+
+    conflicts = {}
+    accepted = []
+    for index, (departure_time, arrival_time) in enumerate(periods):
+        for other_flight_id, *other_period in chain(booked, accepted):
+            if _overlaps(departure_time, arrival_time, *other_period):
+                conflicts[index] = other_flight_id
+                break
+        else:
+            accepted.append((None, departure_time, arrival_time))
+    return conflicts
+
+
+def crew_conflicts(assignments, exclude=Q()):
+    """
+    Find crew members booked on overlapping flights.
+
+    `assignments` are `(crew_id, flight_id, departure_time, arrival_time)`
+    tuples, `flight_id` being None for an unsaved flight; assignments with
+    the same `flight_id` are to the same flight. Returns
+    `(crew_id, flight_id, other_flight_id)` for every assignment that
+    overlaps a flight the crew member already has (except assignments
+    matching `exclude`), or another assignment in the batch, using one
+    query. Flights that only touch (one lands as the next departs) do not
+    overlap.
+    """
+    assignments = list(assignments)
+    if not assignments:
+        return []
+
+    periods = defaultdict(set)
+    for crew_id, flight_id, departure_time, arrival_time in assignments:
+        periods[(flight_id, departure_time, arrival_time)].add(crew_id)
+    conditions = []
+    for (flight_id, departure_time, arrival_time), crew_ids in periods.items():
+        condition = Q(
+            crew_id__in=crew_ids,
+            flight__departure_time__lt=arrival_time,
+            flight__arrival_time__gt=departure_time,
+        )
+        if flight_id is not None:
+            condition &= ~Q(flight_id=flight_id)
+        conditions.append(condition)
+
+    booked = list(Flight.crew.through.objects.filter(
+        reduce(or_, conditions)
+    ).exclude(exclude).values_list(
+        "crew_id", "flight_id", "flight__departure_time", "flight__arrival_time"
+    ))
+
+    conflicts = []
+    for index, (crew_id, flight_id, departure_time, arrival_time) in enumerate(assignments):
+        for other_crew_id, other_flight_id, *other_period in chain(booked, assignments[index + 1:]):
+            if (
+                other_crew_id == crew_id
+                and other_flight_id != flight_id
+                and _overlaps(departure_time, arrival_time, *other_period)
+            ):
+                conflicts.append((crew_id, flight_id, other_flight_id))
+    return conflicts
+
+
+def crew_roster(start, end, crew_ids=None):
+    """
+    Return every crew member with flights in `[start, end)`, with those
+    flights in departure order, from one query over the crew assignments.
+    """
+    assignments = flights_in_window(Flight.crew.through.objects.all(), start, end, "flight__")
+    if crew_ids:
+        assignments = assignments.filter(crew_id__in=crew_ids)
+    rows = assignments.order_by(
+        "crew__last_name", "crew__first_name", "crew_id", "flight__departure_time", "flight_id"
+    ).values_list(
+        "crew_id",
+        "crew__first_name",
+        "crew__last_name",
+        "flight_id",
+        "flight__departure_time",
+        "flight__arrival_time",
+        "flight__route__source__name",
+        "flight__route__destination__name",
+    )
+    return [
+        {
+            "id": crew_id,
+            "first_name": first_name,
+            "last_name": last_name,
+            "flights": [
+                {
+                    "id": flight_id,
+                    "departure_time": departure_time,
+                    "arrival_time": arrival_time,
+                    "source": source,
+                    "destination": destination,
+                }
+                for *_, flight_id, departure_time, arrival_time, source, destination in flights
+            ],
+        }
+        for (crew_id, first_name, last_name), flights in groupby(rows, key=itemgetter(0, 1, 2))
+    ]
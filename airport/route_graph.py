@@ -0,0 +1,252 @@
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict, namedtuple
+from heapq import heappop, heappush
+from itertools import count
+from time import monotonic
+
+from django.conf import settings
+from django.utils import timezone
+
+from airport.models import Flight
+
+Leg = namedtuple(
+    "Leg",
+    [
+        "departure_time",
+        "flight_id",
+        "arrival_time",
+        "route_id",
+        "source_id",
+        "destination_id",
+        "distance",
+    ],
+)
+
+
+class RouteGraph:
+    """
+    Per-process adjacency lists of upcoming flights, keyed by source airport.
+
+    Each list is kept sorted by departure time, so the flights leaving an
+    airport inside a layover window are found with a bisect. Flight and
+    route saves in this process patch the graph by replacing the affected
+    list, never changing one in place, so searches run on a snapshot of
+    the lists outside the lock; changes made by other processes are
+    picked up by the periodic rebuild.
+    """
+    leg_fields = (
+        "departure_time",
+        "id",
+        "arrival_time",
+        "route_id",
+        "route__source_id",
+        "route__destination_id",
+        "route__distance",
+    )
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._departures = defaultdict(list)
+        self._legs = {}
+        self._route_flights = defaultdict(set)
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def ensure_built(self):
+        max_age = self.max_age
+        if max_age is None:
+            max_age = getattr(settings, "ROUTE_GRAPH_MAX_AGE", 300)
+        with self._lock:
+            if self._built_at is None or monotonic() - self._built_at > max_age:
+                self.build()
+
+    def build(self):
+        flights = Flight.objects.filter(
+            departure_time__gte=timezone.now()
+        ).order_by("departure_time", "id").values_list(*self.leg_fields)
+        departures = defaultdict(list)
+        legs = {}
+        route_flights = defaultdict(set)
+        for row in flights.iterator(chunk_size=10000):
+            leg = Leg(*row)
+            departures[leg.source_id].append(leg)
+            legs[leg.flight_id] = leg
+            route_flights[leg.route_id].add(leg.flight_id)
+
+        with self._lock:
+            self._departures = departures
+            self._legs = legs
+            self._route_flights = route_flights
+            self._built_at = monotonic()
+
+    def _add(self, leg):
+        self._discard(leg.flight_id)
+        departures = list(self._departures[leg.source_id])
+        insort(departures, leg)
+        self._departures[leg.source_id] = departures
+        self._legs[leg.flight_id] = leg
+        self._route_flights[leg.route_id].add(leg.flight_id)
+
+    def _discard(self, flight_id):
+        leg = self._legs.pop(flight_id, None)
+        if leg is None:
+            return
+        departures = self._departures[leg.source_id]
+        index = bisect_left(departures, leg)
+        self._departures[leg.source_id] = departures[:index] + departures[index + 1:]
+        self._route_flights[leg.route_id].discard(flight_id)
+
+    def add_flight(self, flight_id):
+        with self._lock:
+            if self._built_at is None:
+                return
+            row = Flight.objects.filter(
+                pk=flight_id, departure_time__gte=timezone.now()
+            ).values_list(*self.leg_fields).first()
+            if row is None:
+                self._discard(flight_id)
+            else:
+                self._add(Leg(*row))
+
+    def discard_flight(self, flight_id):
+        with self._lock:
+            if self._built_at is not None:
+                self._discard(flight_id)
+
+    def update_route(self, route):
+        with self._lock:
+            if self._built_at is None:
+                return
+            for flight_id in list(self._route_flights[route.pk]):
+                self._add(self._legs[flight_id]._replace(
+                    source_id=route.source_id,
+                    destination_id=route.destination_id,
+                    distance=route.distance,
+                ))
+
+    def snapshot(self):
+        """The departure lists, built if stale, as of now."""
+        self.ensure_built()
+        with self._lock:
+            return dict(self._departures)
+
+    def find_itineraries(
+            self,
+            source_id,
+            destination_id,
+            departure_from,
+            departure_to,
+            max_legs,
+            min_layover,
+            max_duration,
+            order_by="duration",
+            limit=10,
+    ):
+        """
+        Return the best `limit` itineraries of up to `max_legs` flights
+        between two airports.
+
+        The first flight departs inside `[departure_from, departure_to]`,
+        every connection leaves at least `min_layover` after the previous
+        arrival, no airport is visited twice, and the whole trip ends within
+        `max_duration` of the first departure.
+
+        Partial itineraries are extended best-first. Their duration so far
+        (or distance, for `order_by="distance"`) only grows as legs are
+        added, so complete itineraries come off the queue in order and the
+        search stops at the `limit`-th. The connections of an itinerary are
+        queued one at a time, in departure (or distance) order, each keyed
+        by a `bound` that is at most its own and every later one's key.
+        """
+        departures = self.snapshot()
+
+        if order_by == "distance":
+            def key(path):
+                return sum(leg.distance for leg in path), path[-1].arrival_time
+
+            def bound(path):
+                return sum(leg.distance for leg in path), path[-1].departure_time
+        else:
+            def key(path):
+                return path[-1].arrival_time - path[0].departure_time, len(path)
+
+            def bound(path):
+                return path[-1].departure_time - path[0].departure_time, 0
+
+        def connections(path):
+            last = path[-1]
+            visited = {source_id, *(leg.destination_id for leg in path)}
+            latest_arrival = path[0].departure_time + max_duration
+            for leg in _departures_between(
+                    departures,
+                    last.destination_id,
+                    last.arrival_time + min_layover,
+                    latest_arrival,
+            ):
+                if leg.arrival_time > latest_arrival or leg.destination_id in visited:
+                    continue
+                if len(path) + 1 == max_legs and leg.destination_id != destination_id:
+                    continue
+                yield path + (leg,)
+
+        if order_by == "distance":
+            def extensions_of(path):
+                return iter(sorted(connections(path), key=lambda extended: extended[-1].distance))
+        else:
+            extensions_of = connections
+
+        tiebreak = count()
+        queue = []
+
+        def push(path):
+            heappush(queue, (key(path), next(tiebreak), path, None))
+
+        def push_next(extensions):
+            path = next(extensions, None)
+            if path is not None:
+                heappush(queue, (bound(path), next(tiebreak), path, extensions))
+
+        for leg in _departures_between(departures, source_id, departure_from, departure_to):
+            if leg.arrival_time - leg.departure_time > max_duration:
+                continue
+            if max_legs == 1 and leg.destination_id != destination_id:
+                continue
+            push((leg,))
+
+        itineraries = []
+        while queue and len(itineraries) < limit:
+            _, _, path, extensions = heappop(queue)
+            if extensions is not None:
+                push(path)
+                push_next(extensions)
+            elif path[-1].destination_id == destination_id:
+                itineraries.append(path)
+            else:
+                push_next(extensions_of(path))
+
+        return [
+            {
+                "departure_time": path[0].departure_time,
+                "arrival_time": path[-1].arrival_time,
+                "duration": path[-1].arrival_time - path[0].departure_time,
+                "distance": sum(leg.distance for leg in path),
+                "legs": [leg._asdict() for leg in path],
+            }
+            for path in itineraries
+        ]
+
+
+def _departures_between(departures, airport_id, start, end):
+    airport_departures = departures.get(airport_id, ())
+    index = bisect_left(airport_departures, (start,))
+    while index < len(airport_departures) and airport_departures[index].departure_time <= end:
+        yield airport_departures[index]
+        index += 1
+
+
+route_graph = RouteGraph()
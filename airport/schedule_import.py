@@ -0,0 +1,489 @@
+import csv
+import json
+from itertools import chain, groupby
+from operator import itemgetter
+from tempfile import SpooledTemporaryFile
+
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from airport.models import Airplane, Airport, Crew, Flight, Route
+
+AMBIGUOUS = object()
+MAX_REPORTED_ERRORS = 20
+
+
+def read_records(stream, input_format):
+    """
+    Yield `(line, record)` pairs from a CSV or NDJSON schedule.
+
+    Records have `source`, `destination`, `airplane`, `departure_time` and
+    `arrival_time`, optionally `distance` (required for new routes),
+    `airplane_type` (to tell same-named airplanes apart) and `crew`, a list
+    of "First Last" names, `;`-separated in CSV.
+    """
+    if input_format == "csv":
+        for line, record in enumerate(csv.DictReader(stream), start=2):
+            crew = record.get("crew") or ""
+            record["crew"] = [name.strip() for name in crew.split(";") if name.strip()]
+            yield line, record
+        return
+
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except ValueError as error:
+            yield line, {"error": f"invalid JSON ({error})"}
+
+
+def _lookup(items):
+    lookup = {}
+    for key, pk in items:
+        lookup[key] = AMBIGUOUS if key in lookup else pk
+    return lookup
+
+
+class ScheduleResolver:
+    """Resolve airport, airplane and crew names with maps loaded up front."""
+    def __init__(self):
+        self.airports = dict(Airport.objects.values_list("name", "id"))
+        airplanes = list(Airplane.objects.values_list("name", "airplane_type__name", "id"))
+        self.airplanes = _lookup((name, pk) for name, _, pk in airplanes)
+        self.typed_airplanes = {(name, type_name): pk for name, type_name, pk in airplanes}
+        self.crew = _lookup(
+            (f"{first_name} {last_name}", pk)
+            for first_name, last_name, pk in Crew.objects.values_list("first_name", "last_name", "id")
+        )
+        self.routes = set(Route.objects.values_list("source_id", "destination_id"))
+        self.errors = []
+
+    def error(self, line, message):
+        self.errors.append(f"line {line}: {message}")
+
+    def _resolve_name(self, lookup, name, kind, line):
+        pk = lookup.get(name)
+        if pk is None:
+            self.error(line, f"unknown {kind} {name!r}")
+        elif pk is AMBIGUOUS:
+            self.error(line, f"ambiguous {kind} {name!r}")
+            return None
+        return pk
+
+    def _resolve_datetime(self, value, field, line):
+        moment = parse_datetime(value) if isinstance(value, str) else None
+        if moment is None:
+            self.error(line, f"invalid {field} {value!r}")
+            return None
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
+    def resolve(self, records):
+        """
+        Yield `(line, source_id, destination_id, distance, airplane_id,
+        departure_time, arrival_time)` and the crew ids of every valid
+        record. Problems are collected in `errors`, not raised, so one run
+        reports all of them.
+        """
+        for line, record in records:
+            if "error" in record:
+                self.error(line, record["error"])
+                continue
+            errors = len(self.errors)
+            source_id = self._resolve_name(self.airports, record.get("source"), "airport", line)
+            destination_id = self._resolve_name(
+                self.airports, record.get("destination"), "airport", line
+            )
+            if record.get("airplane_type"):
+                key = (record.get("airplane"), record["airplane_type"])
+                airplane_id = self.typed_airplanes.get(key)
+                if airplane_id is None:
+                    self.error(line, "unknown airplane {!r} of type {!r}".format(*key))
+            else:
+                airplane_id = self._resolve_name(
+                    self.airplanes, record.get("airplane"), "airplane", line
+                )
+            crew_ids = [
+                self._resolve_name(self.crew, name, "crew member", line)
+                for name in record.get("crew") or ()
+            ]
+            departure_time = self._resolve_datetime(record.get("departure_time"), "departure_time", line)
+            arrival_time = self._resolve_datetime(record.get("arrival_time"), "arrival_time", line)
+            if departure_time and arrival_time and arrival_time <= departure_time:
+                self.error(line, "arrival_time must be after departure_time")
+
+            distance = record.get("distance") or None
+            if distance is not None:
+                try:
+                    distance = int(distance)
+                    if distance < 1:
+                        raise ValueError
+                except ValueError:
+                    self.error(line, f"invalid distance {record['distance']!r}")
+            elif (source_id, destination_id) not in self.routes and source_id and destination_id:
+                self.error(line, "distance is required for a new route")
+
+            if len(self.errors) == errors:
+                yield (
+                    line, source_id, destination_id, distance, airplane_id, departure_time, arrival_time
+                ), crew_ids
+
+
+def conflict_message(crew_id, other_flight_id, other_line):
+    """Describe an overlap found by the import, for `ScheduleResolver.error`."""
+    if other_line is not None:
+        other = f"line {other_line}"
+    elif other_flight_id is not None:
+        other = f"flight {other_flight_id}"
+    else:
+        other = "another flight"
+    owner = "same airplane" if crew_id is None else f"same crew member {crew_id}"
+    return f"overlaps {other}, {owner}"
+
+
+def _sweep_overlaps(staged, booked):
+    """
+    Find imported flights overlapping another flight of the same airplane
+    or crew member.
+
+    `staged` are `(line, owner_id, departure_time, arrival_time)` of the
+    imported flights, `booked` `(flight_id, owner_id, departure_time,
+    arrival_time)` of flights the import leaves as they are. In departure
+    order, a flight overlaps an earlier one when it departs before the
+    latest arrival so far, so one sort finds every overlap. Returns
+    `(line, owner_id, other_flight_id, other_line)` for every imported
+    flight in an overlapping pair.
+    """
+    periods = sorted(chain(
+        ((owner_id, departure_time, arrival_time, line, None)
+         for line, owner_id, departure_time, arrival_time in staged),
+        ((owner_id, departure_time, arrival_time, None, flight_id)
+         for flight_id, owner_id, departure_time, arrival_time in booked),
+    ), key=itemgetter(0, 1))
+    conflicts = []
+    for owner_id, group in groupby(periods, key=itemgetter(0)):
+        latest = None
+        for period in group:
+            if latest is not None and period[1] < latest[2]:
+                line, flight_id = period[3:]
+                other_line, other_flight_id = latest[3:]
+                if line is not None:
+                    conflicts.append((line, owner_id, other_flight_id, other_line))
+                elif other_line is not None:
+                    conflicts.append((other_line, owner_id, flight_id, None))
+            if latest is None or period[2] > latest[2]:
+                latest = period
+    return conflicts
+
+
+def _conflict_order(conflict):
+    line, crew_id, *_ = conflict
+    return line, crew_id or 0
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _spool():
+    return SpooledTemporaryFile(max_size=64 * 1024 * 1024, mode="w+", newline="")
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def spool_schedule(resolved):
+    """Write resolved flights and crew links to CSV files ready for COPY."""
+    flight_spool, crew_spool = _spool(), _spool()
+    flight_writer, crew_writer = csv.writer(flight_spool), csv.writer(crew_spool)
+    for flight, crew_ids in resolved:
+        flight_writer.writerow(_csv_value(value) for value in flight)
+        crew_writer.writerows((flight[0], crew_id) for crew_id in crew_ids)
+    flight_spool.seek(0)
+    crew_spool.seek(0)
+    return flight_spool, crew_spool
+
+
+def copy_schedule(flight_spool, crew_spool):
+    """
+    Load spooled rows with COPY into temporary staging tables, then upsert
+    routes, flights and crew links with set-based statements. Must run
+    inside a transaction; the staging tables are dropped on commit.
+
+    Flights are matched on (route, airplane, departure_time): a matching
+    flight gets the imported arrival time, anything else is inserted.
+    Flights overlapping another flight of their airplane or of one of their
+    crew members would violate the `flight_airplane_no_overlap` constraint
+    or the crew overlap trigger, so they are returned under `conflicts` as
+    `(line, crew_id, other_flight_id, other_line)` instead, `crew_id` None
+    for the airplane, with no flight written; the caller rolls back.
+    """
+    route, flight = _table(Route), _table(Flight)
+    flight_crew = _table(Flight.crew.through)
+    stats = {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TEMPORARY TABLE import_schedule_flight ("
+            " line integer PRIMARY KEY, source_id bigint, destination_id bigint,"
+            " distance integer, airplane_id bigint, departure_time timestamptz,"
+            " arrival_time timestamptz, route_id bigint, flight_id bigint"
+            ") ON COMMIT DROP"
+        )
+        cursor.execute(
+            "CREATE TEMPORARY TABLE import_schedule_crew (line integer, crew_id bigint) ON COMMIT DROP"
+        )
+        cursor.copy_expert(
+            "COPY import_schedule_flight (line, source_id, destination_id, distance,"
+            " airplane_id, departure_time, arrival_time) FROM STDIN WITH (FORMAT csv)",
+            flight_spool,
+        )
+        cursor.copy_expert("COPY import_schedule_crew FROM STDIN WITH (FORMAT csv)", crew_spool)
+        cursor.execute("ANALYZE import_schedule_flight")
+        cursor.execute("ANALYZE import_schedule_crew")
+
+        cursor.execute(
+            f"INSERT INTO {route} (source_id, destination_id, distance, updated_at)"
+            " SELECT DISTINCT ON (source_id, destination_id) source_id, destination_id, distance, now()"
+            " FROM import_schedule_flight WHERE distance IS NOT NULL"
+            " ORDER BY source_id, destination_id, line"
+            " ON CONFLICT (source_id, destination_id) DO NOTHING"
+        )
+        stats["routes"] = cursor.rowcount
+        cursor.execute(
+            f"UPDATE import_schedule_flight s SET route_id = r.id FROM {route} r"
+            " WHERE r.source_id = s.source_id AND r.destination_id = s.destination_id"
+        )
+        cursor.execute(
+            f"UPDATE import_schedule_flight s SET flight_id = f.id FROM {flight} f"
+            " WHERE f.route_id = s.route_id AND f.airplane_id = s.airplane_id"
+            " AND f.departure_time = s.departure_time"
+        )
+        # One row per flight to write: repeated lines for a flight are the
+        # first line's, like the insert below.
+        cursor.execute(
+            "CREATE TEMPORARY TABLE import_schedule_staged ON COMMIT DROP AS"
+            " SELECT DISTINCT ON (route_id, airplane_id, departure_time)"
+            " line, airplane_id, departure_time, arrival_time, flight_id"
+            " FROM import_schedule_flight ORDER BY route_id, airplane_id, departure_time, line"
+        )
+        cursor.execute(
+            "ALTER TABLE import_schedule_staged ADD PRIMARY KEY (line)"
+        )
+        # Overlaps with flights the import leaves alone use the exclusion
+        # constraint's GiST index; overlaps within the import are a sweep in
+        # departure order: a flight departing before the latest arrival of
+        # the airplane's (or crew member's) earlier flights overlaps one of
+        # them, reported as the previous flight when that is the one.
+        cursor.execute(
+            "SELECT s.line, NULL::bigint, f.id, NULL::integer"
+            f" FROM import_schedule_staged s JOIN {flight} f ON f.airplane_id = s.airplane_id"
+            " AND tstzrange(f.departure_time, f.arrival_time, '[)')"
+            " && tstzrange(s.departure_time, s.arrival_time, '[)')"
+            " WHERE NOT EXISTS (SELECT FROM import_schedule_staged m WHERE m.flight_id = f.id)"
+            " UNION ALL"
+            " SELECT line, NULL, NULL,"
+            " CASE WHEN previous_arrival > departure_time THEN previous_line END FROM ("
+            "  SELECT line, departure_time,"
+            "  max(arrival_time) OVER earlier AS latest_arrival,"
+            "  lag(arrival_time) OVER airplane AS previous_arrival,"
+            "  lag(line) OVER airplane AS previous_line"
+            "  FROM import_schedule_staged"
+            "  WINDOW airplane AS (PARTITION BY airplane_id ORDER BY departure_time, line),"
+            "  earlier AS (airplane ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING)"
+            " ) swept WHERE latest_arrival > departure_time"
+            " ORDER BY 1"
+        )
+        conflicts = cursor.fetchall()
+        cursor.execute(
+            "WITH assignment AS ("
+            " SELECT DISTINCT c.crew_id, t.line, t.flight_id, t.departure_time, t.arrival_time"
+            " FROM import_schedule_crew c JOIN import_schedule_flight s USING (line)"
+            " JOIN import_schedule_flight f ON f.route_id = s.route_id"
+            " AND f.airplane_id = s.airplane_id AND f.departure_time = s.departure_time"
+            " JOIN import_schedule_staged t ON t.line = f.line"
+            "), period AS ("
+            " SELECT crew_id, line, flight_id, departure_time, arrival_time FROM assignment"
+            " UNION ALL"
+            " SELECT a.crew_id, NULL, a.flight_id,"
+            " coalesce(t.departure_time, f.departure_time), coalesce(t.arrival_time, f.arrival_time)"
+            f" FROM {flight_crew} a JOIN {flight} f ON f.id = a.flight_id"
+            " LEFT JOIN import_schedule_staged t ON t.flight_id = a.flight_id"
+            " WHERE a.crew_id IN (SELECT crew_id FROM import_schedule_crew)"
+            " AND f.departure_time < (SELECT max(arrival_time) FROM import_schedule_flight)"
+            " AND f.arrival_time > (SELECT min(departure_time) FROM import_schedule_flight)"
+            " AND NOT EXISTS (SELECT FROM assignment m"
+            " WHERE m.crew_id = a.crew_id AND m.flight_id = a.flight_id)"
+            "), swept AS ("
+            " SELECT *,"
+            " max(arrival_time) OVER earlier AS latest_arrival,"
+            " lag(arrival_time) OVER crew AS previous_arrival,"
+            " lag(flight_id) OVER crew AS previous_flight_id,"
+            " lag(line) OVER crew AS previous_line,"
+            " lead(departure_time) OVER crew AS next_departure,"
+            " lead(flight_id) OVER crew AS next_flight_id,"
+            " lead(line) OVER crew AS next_line"
+            " FROM period"
+            " WINDOW crew AS (PARTITION BY crew_id ORDER BY departure_time, line),"
+            " earlier AS (crew ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING)"
+            ") SELECT line, crew_id,"
+            " CASE WHEN latest_arrival > departure_time"
+            " THEN CASE WHEN previous_arrival > departure_time THEN previous_flight_id END"
+            " ELSE next_flight_id END,"
+            " CASE WHEN latest_arrival > departure_time"
+            " THEN CASE WHEN previous_arrival > departure_time THEN previous_line END"
+            " ELSE next_line END"
+            " FROM swept WHERE line IS NOT NULL"
+            " AND (latest_arrival > departure_time OR next_departure < arrival_time)"
+            " ORDER BY 1, 2"
+        )
+        conflicts += cursor.fetchall()
+        if conflicts:
+            return {"conflicts": sorted(conflicts, key=_conflict_order)}
+        cursor.execute(
+            f"UPDATE {flight} f SET arrival_time = s.arrival_time, updated_at = now()"
+            " FROM import_schedule_flight s"
+            " WHERE f.id = s.flight_id AND f.arrival_time <> s.arrival_time"
+        )
+        stats["updated"] = cursor.rowcount
+        cursor.execute(
+            f"WITH inserted AS ("
+            f" INSERT INTO {flight}"
+            " (route_id, airplane_id, departure_time, arrival_time, tickets_sold, updated_at)"
+            " SELECT DISTINCT ON (route_id, airplane_id, departure_time)"
+            " route_id, airplane_id, departure_time, arrival_time, 0, now()"
+            " FROM import_schedule_flight WHERE flight_id IS NULL"
+            " ORDER BY route_id, airplane_id, departure_time, line"
+            " RETURNING id, route_id, airplane_id, departure_time"
+            "), linked AS ("
+            " UPDATE import_schedule_flight s SET flight_id = i.id FROM inserted i"
+            " WHERE s.flight_id IS NULL AND i.route_id = s.route_id"
+            " AND i.airplane_id = s.airplane_id AND i.departure_time = s.departure_time"
+            ") SELECT count(*) FROM inserted"
+        )
+        stats["created"] = cursor.fetchone()[0]
+        cursor.execute(
+            f"INSERT INTO {flight_crew} (flight_id, crew_id)"
+            " SELECT DISTINCT s.flight_id, c.crew_id"
+            " FROM import_schedule_crew c JOIN import_schedule_flight s USING (line)"
+            " ON CONFLICT DO NOTHING"
+        )
+        stats["crew"] = cursor.rowcount
+    stats["conflicts"] = []
+    return stats
+
+
+def bulk_create_schedule(resolved, batch_size=5000):
+    """Same upserts as `copy_schedule` through the ORM, for other backends."""
+    flights, crew_links = [], []
+    for flight, crew_ids in resolved:
+        flights.append(flight)
+        crew_links.extend((flight[0], crew_id) for crew_id in crew_ids)
+
+    routes = {
+        (source_id, destination_id): pk
+        for source_id, destination_id, pk
+        in Route.objects.values_list("source_id", "destination_id", "id")
+    }
+    new_routes = {}
+    for _, source_id, destination_id, distance, *_ in flights:
+        key = (source_id, destination_id)
+        if key not in routes and key not in new_routes:
+            new_routes[key] = Route(source_id=source_id, destination_id=destination_id, distance=distance)
+    Route.objects.bulk_create(new_routes.values(), batch_size=batch_size)
+    routes.update((key, route.pk) for key, route in new_routes.items())
+
+    existing = {
+        (route_id, airplane_id, departure_time): (pk, arrival_time)
+        for route_id, airplane_id, departure_time, pk, arrival_time in Flight.objects.filter(
+            route_id__in={routes[(flight[1], flight[2])] for flight in flights}
+        ).values_list("route_id", "airplane_id", "departure_time", "id", "arrival_time")
+    }
+    new_flights, changed_flights, flight_ids = {}, {}, {}
+    now = timezone.now()
+    for line, source_id, destination_id, _, airplane_id, departure_time, arrival_time in flights:
+        key = (routes[(source_id, destination_id)], airplane_id, departure_time)
+        if key in existing:
+            pk, current_arrival_time = existing[key]
+            if current_arrival_time != arrival_time:
+                changed_flights[pk] = Flight(pk=pk, arrival_time=arrival_time, updated_at=now)
+        elif key not in new_flights:
+            new_flights[key] = Flight(
+                route_id=key[0],
+                airplane_id=airplane_id,
+                departure_time=departure_time,
+                arrival_time=arrival_time,
+            )
+        flight_ids[line] = key
+
+    staged = {}
+    for line, _, _, _, airplane_id, departure_time, arrival_time in flights:
+        staged.setdefault(flight_ids[line], (line, airplane_id, departure_time, arrival_time))
+    conflicts = []
+    if staged:
+        earliest = min(departure_time for *_, departure_time, _ in staged.values())
+        latest = max(arrival_time for *_, arrival_time in staged.values())
+        matched = {existing[key][0]: key for key in staged if key in existing}
+        conflicts += [
+            (line, None, other_flight_id, other_line)
+            for line, _, other_flight_id, other_line in _sweep_overlaps(staged.values(), (
+                booked for booked in Flight.objects.filter(
+                    airplane_id__in={airplane_id for _, airplane_id, _, _ in staged.values()},
+                    departure_time__lt=latest,
+                    arrival_time__gt=earliest,
+                ).values_list("id", "airplane_id", "departure_time", "arrival_time")
+                if booked[0] not in matched
+            ))
+        ]
+
+        # Crew links are inserted in bulk, bypassing the m2m_changed check.
+        crew_lines = {}
+        for line, crew_id in crew_links:
+            crew_lines.setdefault((crew_id, flight_ids[line]), staged[flight_ids[line]][0])
+        if crew_lines:
+            booked_crew = Flight.crew.through.objects.filter(
+                crew_id__in={crew_id for crew_id, _ in crew_lines},
+                flight__departure_time__lt=latest,
+                flight__arrival_time__gt=earliest,
+            ).values_list("flight_id", "crew_id", "flight__departure_time", "flight__arrival_time")
+            # Matched flights get the imported period.
+            periods = {flight_id: staged[key][2:] for flight_id, key in matched.items()}
+            conflicts += _sweep_overlaps(
+                ((line, crew_id, *staged[key][2:]) for (crew_id, key), line in crew_lines.items()),
+                (
+                    (flight_id, crew_id, *periods.get(flight_id, period))
+                    for flight_id, crew_id, *period in booked_crew
+                    if (crew_id, matched.get(flight_id)) not in crew_lines
+                ),
+            )
+    if conflicts:
+        return {"conflicts": sorted(conflicts, key=_conflict_order)}
+
+    Flight.objects.bulk_create(new_flights.values(), batch_size=batch_size)
+    Flight.objects.bulk_update(
+        changed_flights.values(), ["arrival_time", "updated_at"], batch_size=batch_size
+    )
+    existing.update((key, (flight.pk, None)) for key, flight in new_flights.items())
+
+    Through = Flight.crew.through
+    links = {(existing[flight_ids[line]][0], crew_id) for line, crew_id in crew_links}
+    linked = Through.objects.count()
+    Through.objects.bulk_create(
+        (Through(flight_id=flight_id, crew_id=crew_id) for flight_id, crew_id in links),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    return {
+        "routes": len(new_routes),
+        "created": len(new_flights),
+        "updated": len(changed_flights),
+        "crew": Through.objects.count() - linked,
+        "conflicts": [],
+    }
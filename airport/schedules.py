@@ -0,0 +1,190 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from airport.models import Flight, FlightSchedule
+from airport.rosters import airplane_conflict, airplane_conflicts, crew_conflicts
+
+# Days ahead `generate_flights` fills by default, and that new or changed
+# schedules are checked for overlapping flights over.
+GENERATION_DAYS = 90
+
+
+def schedule_departures(schedule, start, end):
+    """Yield the aware departure datetimes of `schedule` from `start` to `end` inclusive."""
+    zone = ZoneInfo(schedule.timezone)
+    date = start
+    while date <= end:
+        if schedule.operates_on(date):
+            yield datetime.combine(date, schedule.departure_time, tzinfo=zone)
+        date += timedelta(days=1)
+
+
+def schedule_conflicts(schedule, crew_ids, periods, today, until):
+    """
+    Find other schedules whose departures up to `until`, not generated yet,
+    overlap `periods`, the `(departure_time, arrival_time)` of `schedule`.
+
+    Returns `(index, other_schedule_id, crew_id)` for every period sharing
+    the airplane (`crew_id` None) or one of `crew_ids` with another
+    schedule's departure. Already generated departures are flights, which
+    `airplane_conflicts` and `crew_conflicts` check.
+    """
+    if not periods:
+        return []
+    others = FlightSchedule.objects.filter(
+        Q(airplane_id=schedule.airplane_id) | Q(crew__in=crew_ids),
+        Q(valid_until__isnull=True) | Q(valid_until__gte=today),
+        Q(generated_until__isnull=True) | Q(generated_until__lt=until),
+        valid_from__lte=until,
+    ).exclude(pk=schedule.pk).distinct().prefetch_related("crew")
+
+    conflicts = []
+    for other in others:
+        shared = [None] if other.airplane_id == schedule.airplane_id else []
+        shared += sorted(set(crew_ids) & {member.pk for member in other.crew.all()})
+        start = max(other.valid_from, today)
+        if other.generated_until is not None:
+            start = max(start, other.generated_until + timedelta(days=1))
+        end = min(until, other.valid_until) if other.valid_until else until
+        other_periods = [
+            (departure_time, departure_time + other.duration)
+            for departure_time in schedule_departures(other, start, end)
+        ]
+        for index, (departure_time, arrival_time) in enumerate(periods):
+            if any(
+                other_departure_time < arrival_time and other_arrival_time > departure_time
+                for other_departure_time, other_arrival_time in other_periods
+            ):
+                conflicts.extend((index, other.pk, crew_id) for crew_id in shared)
+    return conflicts
+
+
+def generate_schedule_flights(schedule, until, today, batch_size=1000):
+    """
+    Materialize the flights of `schedule` up to `until` and return how many
+    were created, with the `(departure_time, other_flight_id, crew_id)` of
+    every departure skipped because its airplane (`crew_id` None) or a crew
+    member has an overlapping flight.
+
+    Dates up to `generated_until` are skipped, so each run only extends the
+    horizon; the (schedule, departure_time) constraint guards against
+    duplicates from overlapping runs. Must run inside a transaction.
+    """
+    start = max(
+        schedule.valid_from,
+        today,
+        schedule.generated_until + timedelta(days=1) if schedule.generated_until else today,
+    )
+    end = min(until, schedule.valid_until) if schedule.valid_until else until
+    if start > end:
+        return 0, []
+
+    flights = [
+        Flight(
+            schedule=schedule,
+            route_id=schedule.route_id,
+            airplane_id=schedule.airplane_id,
+            departure_time=departure_time,
+            arrival_time=departure_time + schedule.duration,
+        )
+        for departure_time in schedule_departures(schedule, start, end)
+    ]
+    created, rejected = 0, []
+    if flights:
+        generated = Flight.objects.filter(
+            schedule=schedule,
+            departure_time__in=[flight.departure_time for flight in flights],
+        )
+        existing = set(generated.values_list("departure_time", flat=True))
+        flights = [flight for flight in flights if flight.departure_time not in existing]
+        conflicts = airplane_conflicts(
+            schedule.airplane_id, [(flight.departure_time, flight.arrival_time) for flight in flights]
+        )
+        rejected = [
+            (flights[index].departure_time, other, None) for index, other in conflicts.items()
+        ]
+        flights = [flight for index, flight in enumerate(flights) if index not in conflicts]
+
+        # On PostgreSQL ON CONFLICT DO NOTHING also skips rows violating the
+        # airplane overlap constraint, so flights missing after the insert
+        # lost a race with a concurrent booking and are reported as well.
+        Flight.objects.bulk_create(flights, batch_size=batch_size, ignore_conflicts=True)
+        saved = dict(generated.values_list("departure_time", "pk"))
+        rejected += [
+            (flight.departure_time, airplane_conflict(
+                schedule.airplane_id, None, flight.departure_time, flight.arrival_time
+            ), None)
+            for flight in flights
+            if flight.departure_time not in saved
+        ]
+
+        # Crew links are inserted in bulk, bypassing the m2m_changed check,
+        # so new flights whose crew is booked elsewhere are dropped here.
+        crew_ids = list(schedule.crew.values_list("pk", flat=True))
+        departures = {pk: departure_time for departure_time, pk in saved.items()}
+        crew_rejected = {}
+        for crew_id, flight_id, other_flight_id in crew_conflicts(
+            (crew_id, flight_id, departure_time, departure_time + schedule.duration)
+            for departure_time, flight_id in saved.items()
+            if departure_time not in existing
+            for crew_id in crew_ids
+        ):
+            crew_rejected.setdefault(flight_id, (departures[flight_id], other_flight_id, crew_id))
+        if crew_rejected:
+            Flight.objects.filter(pk__in=crew_rejected).delete()
+            rejected += crew_rejected.values()
+            for departure_time, _, _ in crew_rejected.values():
+                del saved[departure_time]
+        created = len(saved) - len(existing)
+
+        Through = Flight.crew.through
+        Through.objects.bulk_create(
+            (
+                Through(flight_id=flight_id, crew_id=crew_id)
+                for departure_time, flight_id in saved.items()
+                if departure_time not in existing
+                for crew_id in crew_ids
+            ),
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+
+    schedule.generated_until = end
+    schedule.save(update_fields=["generated_until", "updated_at"])
+    return created, sorted(rejected)
+
+
+def generate_flights(days, today=None, batch_size=1000):
+    """
+    Extend every active schedule `days` ahead of `today`. Return the number
+    of flights created and the `(schedule_id, departure_time,
+    other_flight_id, crew_id)` of every departure skipped because it
+    overlaps another flight of its airplane (`crew_id` None) or of a crew
+    member. Each schedule is generated in its own
+    transaction and row-locked, so concurrent runs skip each other's work.
+    """
+    today = today or timezone.localdate()
+    until = today + timedelta(days=days)
+    pending = FlightSchedule.objects.filter(
+        Q(valid_until__isnull=True) | Q(valid_until__gte=today),
+        Q(generated_until__isnull=True) | Q(generated_until__lt=until),
+        valid_from__lte=until,
+    ).values_list("pk", flat=True)
+
+    created, rejected = 0, []
+    for pk in pending:
+        with transaction.atomic():
+            schedule = FlightSchedule.objects.select_for_update(
+                skip_locked=True
+            ).filter(pk=pk).first()
+            if schedule is not None:
+                schedule_created, schedule_rejected = generate_schedule_flights(
+                    schedule, until, today, batch_size
+                )
+                created += schedule_created
+                rejected += [(schedule.pk, *skipped) for skipped in schedule_rejected]
+    return created, rejected
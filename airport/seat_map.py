@@ -0,0 +1,54 @@
+from base64 import b64encode
+
+from django.core.cache import cache
+
+from airport.models import Ticket
+
+SEAT_MAP_CACHE_TIMEOUT = 60 * 60
+
+
+def seat_map_cache_key(flight_id):
+    return f"airport:seat-map:{flight_id}"
+
+
+def build_seat_map(flight):
+    """
+    Pack the sold seats of a flight into a bitmap.
+
+    Seat `(row, seat)` maps to bit `(row - 1) * seats_per_row + (seat - 1)`,
+    most significant bit first within each byte.
+    """
+    rows = flight.airplane.rows
+    seats_per_row = flight.airplane.seats_per_row
+    capacity = rows * seats_per_row
+    occupied = bytearray((capacity + 7) // 8)
+
+    for row, seat in Ticket.objects.filter(flight=flight).values_list("row", "seat"):
+        index = (row - 1) * seats_per_row + seat - 1
+        if 0 <= index < capacity:
+            occupied[index // 8] |= 0x80 >> (index % 8)
+
+    return {
+        "flight": flight.pk,
+        "rows": rows,
+        "seats_per_row": seats_per_row,
+        "occupied": b64encode(occupied).decode("ascii"),
+    }
+
+
+def get_cached_seat_map(flight_id):
+    return cache.get(seat_map_cache_key(flight_id))
+
+
+def cache_seat_map(flight):
+    seat_map = build_seat_map(flight)
+    cache.set(seat_map_cache_key(flight.pk), seat_map, SEAT_MAP_CACHE_TIMEOUT)
+    return seat_map
+
+
+def invalidate_seat_maps(flight_ids):
+    cache.delete_many([
+        seat_map_cache_key(flight_id)
+        for flight_id in flight_ids
+        if flight_id is not None
+    ])
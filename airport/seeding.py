@@ -0,0 +1,200 @@
+import random
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from airport.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    City,
+    Country,
+    Crew,
+    Flight,
+    FlightSchedule,
+    Order,
+    Route,
+    Ticket,
+)
+from core.caching import bump_model_version
+
+# Rows created per unit of `scale`.
+ROWS_PER_SCALE = {
+    "countries": 5,
+    "cities": 20,
+    "airports": 40,
+    "routes": 100,
+    "airplanes": 20,
+    "crew": 80,
+    "flights": 1000,
+    "schedules": 5,
+    "users": 50,
+    "orders": 500,
+}
+AIRPLANE_TYPES = ("Narrow-body", "Wide-body", "Regional", "Turboprop", "Cargo")
+CREW_PER_FLIGHT = 4
+AIRPLANE_ROWS = 30
+AIRPLANE_SEATS_PER_ROW = 6
+MAX_TICKETS_PER_ORDER = 3
+
+BENCH_ADMIN = "bench_admin"
+BENCH_USER = "bench_user"
+BENCH_PASSWORD = "bench"
+
+
+def _names(prefix, count):
+    return [f"{prefix} {number}" for number in range(1, count + 1)]
+
+
+def seed_bench(scale, seed=0, start=None, batch_size=5000):
+    """
+    Bulk-create a deterministic dataset `scale` times the size of
+    `ROWS_PER_SCALE` and return the number of rows created per model.
+
+    Every airplane flies its own rotation of consecutive flights and its
+    crew stay with it, so neither airplanes nor crew are double-booked.
+    Flights start the day after `start` (today by default). Two accounts
+    are added for benchmarks: `bench_admin`, a staff user, and
+    `bench_user`, a customer who owns some of the orders. Both use the
+    password `bench`.
+    """
+    rng = random.Random(seed)
+    counts = {name: rows * scale for name, rows in ROWS_PER_SCALE.items()}
+    start = start or timezone.localdate()
+    first_departure = datetime.combine(
+        start + timedelta(days=1), time(6), tzinfo=timezone.get_current_timezone()
+    )
+
+    def create(model, objects):
+        return model.objects.bulk_create(objects, batch_size=batch_size)
+
+    with transaction.atomic():
+        countries = create(Country, [Country(name=name) for name in _names("Country", counts["countries"])])
+        cities = create(City, [
+            City(name=name, country=rng.choice(countries))
+            for name in _names("City", counts["cities"])
+        ])
+        airports = create(Airport, [
+            Airport(name=name, closest_big_city=rng.choice(cities))
+            for name in _names("Airport", counts["airports"])
+        ])
+        pairs = set()
+        while len(pairs) < counts["routes"]:
+            source, destination = rng.sample(airports, 2)
+            pairs.add((source.pk, destination.pk))
+        routes = create(Route, [
+            Route(source_id=source_id, destination_id=destination_id, distance=rng.randint(200, 9000))
+            for source_id, destination_id in sorted(pairs)
+        ])
+
+        airplane_types = create(AirplaneType, [AirplaneType(name=name) for name in AIRPLANE_TYPES])
+        airplanes = create(Airplane, [
+            Airplane(
+                name=name,
+                airplane_type=rng.choice(airplane_types),
+                rows=AIRPLANE_ROWS,
+                seats_per_row=AIRPLANE_SEATS_PER_ROW,
+            )
+            for name in _names("Airplane", counts["airplanes"])
+        ])
+        crew = create(Crew, [
+            Crew(first_name=f"Crew {number}", last_name=rng.choice(("Smith", "Jones", "Brown", "Lee")))
+            for number in range(1, counts["crew"] + 1)
+        ])
+
+        # Each airplane gets consecutive flights with a turnaround gap.
+        flights = []
+        next_departure = {airplane.pk: first_departure for airplane in airplanes}
+        for number in range(counts["flights"]):
+            airplane = airplanes[number % len(airplanes)]
+            departure_time = next_departure[airplane.pk]
+            duration = timedelta(minutes=rng.randrange(45, 720, 15))
+            flights.append(Flight(
+                route=rng.choice(routes),
+                airplane=airplane,
+                departure_time=departure_time,
+                arrival_time=departure_time + duration,
+            ))
+            turnaround = timedelta(minutes=rng.randrange(45, 240, 15))
+            next_departure[airplane.pk] = departure_time + duration + turnaround
+
+        # Schedules start after the last seeded flight and are not
+        # generated yet, so they never overlap the flights above.
+        valid_from = max(next_departure.values()).date() + timedelta(days=1)
+        schedules = create(FlightSchedule, [
+            FlightSchedule(
+                route=rng.choice(routes),
+                airplane=airplanes[number % len(airplanes)],
+                days_of_week=rng.randint(1, 127),
+                departure_time=time(rng.randrange(6, 22)),
+                duration=timedelta(minutes=rng.randrange(45, 720, 15)),
+                valid_from=valid_from,
+            )
+            for number in range(counts["schedules"])
+        ])
+
+        password = make_password(BENCH_PASSWORD)
+        User = get_user_model()
+        users = create(User, [
+            User(username=BENCH_ADMIN, email=f"{BENCH_ADMIN}@example.com", password=password, is_staff=True),
+            User(username=BENCH_USER, email=f"{BENCH_USER}@example.com", password=password),
+            *(
+                User(username=f"user{number}", email=f"user{number}@example.com", password=password)
+                for number in range(1, counts["users"] + 1)
+            ),
+        ])
+        customers = users[1:]
+
+        seats = Counter()
+        tickets = []
+        orders = []
+        capacity = AIRPLANE_ROWS * AIRPLANE_SEATS_PER_ROW
+        for number in range(counts["orders"]):
+            orders.append(Order(user=customers[0] if number % 10 == 0 else rng.choice(customers)))
+            flight = rng.randrange(len(flights))
+            for _ in range(rng.randint(1, MAX_TICKETS_PER_ORDER)):
+                if seats[flight] == capacity:
+                    break
+                row, seat = divmod(seats[flight], AIRPLANE_SEATS_PER_ROW)
+                seats[flight] += 1
+                tickets.append((number, flight, row + 1, seat + 1))
+        for index, flight in enumerate(flights):
+            flight.tickets_sold = seats[index]
+
+        create(Flight, flights)
+        per_airplane = len(crew) // len(airplanes)
+        airplane_crew = {
+            airplane.pk: crew[index * per_airplane:(index + 1) * per_airplane][:CREW_PER_FLIGHT]
+            for index, airplane in enumerate(airplanes)
+        }
+        Through = Flight.crew.through
+        create(Through, [
+            Through(flight_id=flight.pk, crew_id=member.pk)
+            for flight in flights
+            for member in airplane_crew[flight.airplane_id]
+        ])
+        orders = create(Order, orders)
+        create(Ticket, [
+            Ticket(order=orders[number], flight=flights[flight], row=row, seat=seat)
+            for number, flight, row, seat in tickets
+        ])
+
+    for model in (Country, City, AirplaneType, Airplane, Airport, Route):
+        bump_model_version(model)
+    return {
+        "countries": len(countries),
+        "cities": len(cities),
+        "airports": len(airports),
+        "routes": len(routes),
+        "airplanes": len(airplanes),
+        "crew": len(crew),
+        "flights": len(flights),
+        "schedules": len(schedules),
+        "users": len(users),
+        "orders": len(orders),
+        "tickets": len(tickets),
+    }
@@ -1,5 +1,15 @@
+from collections import Counter
+from copy import copy
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework import serializers
 
+from core.fields import BulkPrimaryKeyRelatedField, TemplatedHyperlinkedIdentityField
 from .models import (
     City,
     Country,
@@ -9,9 +19,13 @@ from .models import (
     Crew,
     Airport,
     Flight,
+    FlightSchedule,
     Ticket,
     Order,
 )
+from .rosters import airplane_conflict, airplane_conflicts, crew_conflicts
+from .schedules import GENERATION_DAYS, schedule_conflicts, schedule_departures
+from .seat_map import invalidate_seat_maps
 
 
 class CountrySerializer(serializers.ModelSerializer):
@@ -59,9 +73,9 @@ class AirplaneListSerializer(serializers.ModelSerializer):
         slug_field="name",
         read_only=True
     )
-    airplane_type_url = serializers.HyperlinkedIdentityField(
+    airplane_type_url = TemplatedHyperlinkedIdentityField(
         view_name="airport:airplane-type-detail",
-        lookup_field="get_airplane_type_pk",
+        lookup_field="airplane_type_id",
         lookup_url_kwarg="pk",
         read_only=True
     )
@@ -72,7 +86,7 @@ class AirplaneListSerializer(serializers.ModelSerializer):
 
 
 class AirplaneNestedSerializer(serializers.ModelSerializer):
-    url = serializers.HyperlinkedIdentityField(
+    url = TemplatedHyperlinkedIdentityField(
         view_name="airport:airplane-detail",
         lookup_field="pk",
         read_only=True
@@ -139,7 +153,7 @@ class CrewSerializer(serializers.ModelSerializer):
 
 
 class RouteNestedSerializer(serializers.ModelSerializer):
-    url = serializers.HyperlinkedIdentityField(
+    url = TemplatedHyperlinkedIdentityField(
         view_name="airport:route-detail",
         lookup_field="pk",
         read_only=True
@@ -153,7 +167,7 @@ class RouteNestedSerializer(serializers.ModelSerializer):
 
 
 class FlightNestedSerializer(serializers.ModelSerializer):
-    url = serializers.HyperlinkedIdentityField(
+    url = TemplatedHyperlinkedIdentityField(
         view_name="airport:flight-detail",
         lookup_field="pk",
         read_only=True
@@ -170,14 +184,56 @@ class CrewDetailSerializer(CrewSerializer):
 
 
 class FlightSerializer(serializers.ModelSerializer):
+    serializer_related_field = BulkPrimaryKeyRelatedField
 
     class Meta:
         model = Flight
         fields = "__all__"
+        read_only_fields = ("schedule",)
+
+    def validate(self, attrs):
+        departure_time = attrs.get("departure_time", getattr(self.instance, "departure_time", None))
+        arrival_time = attrs.get("arrival_time", getattr(self.instance, "arrival_time", None))
+        if arrival_time < departure_time:
+            raise serializers.ValidationError({"arrival_time": "Arrival can't be before departure"})
+
+        if "crew" in attrs:
+            crew_ids = [member.pk for member in attrs["crew"]]
+        elif self.instance is not None and ("departure_time" in attrs or "arrival_time" in attrs):
+            crew_ids = list(self.instance.crew.values_list("pk", flat=True))
+        else:
+            crew_ids = []
+        flight_id = getattr(self.instance, "pk", None)
+        if self.instance is None or attrs.keys() & {"airplane", "departure_time", "arrival_time"}:
+            airplane_id = attrs["airplane"].pk if "airplane" in attrs else self.instance.airplane_id
+            other_flight_id = airplane_conflict(airplane_id, flight_id, departure_time, arrival_time)
+            if other_flight_id is not None:
+                raise serializers.ValidationError({"airplane": (
+                    f"Airplane {airplane_id} is already assigned to overlapping flight {other_flight_id}"
+                )})
+
+        conflicts = crew_conflicts(
+            (crew_id, flight_id, departure_time, arrival_time) for crew_id in crew_ids
+        )
+        if conflicts:
+            raise serializers.ValidationError({"crew": [
+                f"Crew member {crew_id} is already assigned to overlapping flight {other_flight_id}"
+                for crew_id, _, other_flight_id in conflicts
+            ]})
+        return attrs
+
+    def save(self, **kwargs):
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                "Flight conflicts with another flight of its airplane or crew"
+            )
 
 
 class CrewNestedSerializer(serializers.ModelSerializer):
-    url = serializers.HyperlinkedIdentityField(
+    url = TemplatedHyperlinkedIdentityField(
         view_name="airport:crew-detail",
         lookup_field="pk",
         read_only=True
@@ -192,14 +248,96 @@ class FlightDetailSerializer(FlightSerializer):
     crew = CrewNestedSerializer(many=True, read_only=True)
     route = RouteNestedSerializer(read_only=True)
     airplane = AirplaneNestedSerializer(read_only=True)
+    tickets_available = serializers.IntegerField(read_only=True)
 
 
 class FlightListSerializer(FlightSerializer):
     route = RouteNestedSerializer(read_only=True)
+    tickets_available = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Flight
-        fields = ("departure_time", "arrival_time", "route")
+        fields = ("departure_time", "arrival_time", "route", "tickets_available")
+        expandable_fields = {
+            "crew": (CrewNestedSerializer, {"many": True, "read_only": True}),
+            "airplane": (AirplaneNestedSerializer, {"read_only": True}),
+        }
+
+
+class FlightScheduleSerializer(serializers.ModelSerializer):
+    serializer_related_field = BulkPrimaryKeyRelatedField
+
+    class Meta:
+        model = FlightSchedule
+        fields = "__all__"
+
+    def validate(self, attrs):
+        if self.instance is not None and not attrs.keys() - {"route"}:
+            return attrs
+
+        # Departures the next generation run would create, checked against
+        # booked flights and the departures of other schedules not
+        # generated yet.
+        schedule = copy(self.instance) if self.instance is not None else FlightSchedule()
+        for field, value in attrs.items():
+            if field != "crew":
+                setattr(schedule, field, value)
+        if "crew" in attrs:
+            crew_ids = [member.pk for member in attrs["crew"]]
+        elif self.instance is not None:
+            crew_ids = list(self.instance.crew.values_list("pk", flat=True))
+        else:
+            crew_ids = []
+        today = timezone.localdate()
+        until = today + timedelta(days=GENERATION_DAYS)
+        end = min(until, schedule.valid_until) if schedule.valid_until else until
+        departures = list(schedule_departures(schedule, max(schedule.valid_from, today), end))
+        periods = [(departure_time, departure_time + schedule.duration) for departure_time in departures]
+
+        conflicts = airplane_conflicts(
+            schedule.airplane.pk,
+            periods,
+            exclude=Q(schedule_id=schedule.pk) if schedule.pk else Q(),
+        )
+        if None in conflicts.values():
+            raise serializers.ValidationError({"duration": "Flights of the schedule would overlap each other"})
+        errors = {"airplane": [
+            f"Airplane {schedule.airplane.pk} is already assigned to flight {other_flight_id}, "
+            f"overlapping the departure at {departures[index].isoformat()}"
+            for index, other_flight_id in sorted(conflicts.items())
+        ]}
+
+        errors["crew"] = [
+            f"Crew member {crew_id} is already assigned to flight {other_flight_id}, "
+            f"overlapping a departure of the schedule"
+            for crew_id, _, other_flight_id in sorted(set(crew_conflicts(
+                (
+                    (crew_id, None, departure_time, arrival_time)
+                    for departure_time, arrival_time in periods
+                    for crew_id in crew_ids
+                ),
+                exclude=Q(flight__schedule_id=schedule.pk) if schedule.pk else Q(),
+            )))
+        ]
+
+        reported = set()
+        for index, other_schedule_id, crew_id in schedule_conflicts(schedule, crew_ids, periods, today, until):
+            if (other_schedule_id, crew_id) in reported:
+                continue
+            reported.add((other_schedule_id, crew_id))
+            if crew_id is None:
+                field, subject = "airplane", f"Airplane {schedule.airplane.pk}"
+            else:
+                field, subject = "crew", f"Crew member {crew_id}"
+            errors[field].append(
+                f"{subject} is already on schedule {other_schedule_id}, "
+                f"overlapping the departure at {departures[index].isoformat()}"
+            )
+
+        errors = {field: messages for field, messages in errors.items() if messages}
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
 
 
 class TicketSerializer(serializers.ModelSerializer):
@@ -207,11 +345,132 @@ class TicketSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ticket
         fields = "__all__"
+        expandable_fields = {
+            "flight": (FlightNestedSerializer, {"read_only": True}),
+        }
 
 
 class TicketDetailSerializer(TicketSerializer):
     flight = FlightNestedSerializer(read_only=True)
 
+    class Meta(TicketSerializer.Meta):
+        expandable_fields = {}
+
+
+class FlightSeatMapSerializer(serializers.Serializer):
+    flight = serializers.IntegerField(read_only=True)
+    rows = serializers.IntegerField(read_only=True)
+    seats_per_row = serializers.IntegerField(read_only=True)
+    occupied = serializers.CharField(
+        read_only=True,
+        help_text="Base64 bitmap of sold seats, row-major, most significant bit first"
+    )
+
+
+class ConnectionSearchSerializer(serializers.Serializer):
+    ORDER_BY_CHOICES = ("duration", "distance")
+
+    source = serializers.IntegerField(help_text="Source airport id")
+    destination = serializers.IntegerField(help_text="Destination airport id")
+    departure_date = serializers.DateField(help_text="Date of the first departure")
+    max_legs = serializers.IntegerField(min_value=1, max_value=4, default=2)
+    min_layover = serializers.IntegerField(
+        min_value=0, default=60, help_text="Minimum layover in minutes"
+    )
+    max_duration = serializers.IntegerField(
+        min_value=1, max_value=72, default=24, help_text="Maximum trip duration in hours"
+    )
+    order_by = serializers.ChoiceField(choices=ORDER_BY_CHOICES, default="duration")
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+
+class ItineraryLegSerializer(serializers.Serializer):
+    flight = serializers.IntegerField(source="flight_id")
+    route = serializers.IntegerField(source="route_id")
+    source = serializers.IntegerField(source="source_id")
+    destination = serializers.IntegerField(source="destination_id")
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    distance = serializers.IntegerField()
+
+
+class ItinerarySerializer(serializers.Serializer):
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    duration = serializers.DurationField()
+    distance = serializers.IntegerField()
+    legs = ItineraryLegSerializer(many=True)
+
+
+def parse_ids(value):
+    try:
+        return [int(pk) for pk in value.split(",") if pk.strip()]
+    except ValueError:
+        raise serializers.ValidationError("Expected comma-separated ids")
+
+
+class DateWindowSerializer(serializers.Serializer):
+    MAX_DAYS = 31
+
+    start = serializers.DateField(help_text="First day of the window")
+    end = serializers.DateField(help_text="Last day of the window (inclusive)")
+
+    def validate(self, attrs):
+        days = (attrs["end"] - attrs["start"]).days + 1
+        if days < 1:
+            raise serializers.ValidationError({"end": "End can't be before start"})
+        if days > self.MAX_DAYS:
+            raise serializers.ValidationError({"end": f"Window can't exceed {self.MAX_DAYS} days"})
+        return attrs
+
+
+class CrewRosterSearchSerializer(DateWindowSerializer):
+    crew = serializers.CharField(
+        required=False, help_text="Comma-separated crew ids (ex. ?crew=1,4)"
+    )
+
+    def validate_crew(self, value):
+        return parse_ids(value)
+
+
+class CrewRosterFlightSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    source = serializers.CharField()
+    destination = serializers.CharField()
+
+
+class CrewRosterSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    first_name = serializers.CharField()
+    last_name = serializers.CharField()
+    flights = CrewRosterFlightSerializer(many=True)
+
+
+class FleetUtilizationSearchSerializer(DateWindowSerializer):
+    MAX_DAYS = 366
+
+    airplane = serializers.CharField(
+        required=False, help_text="Comma-separated airplane ids (ex. ?airplane=1,4)"
+    )
+
+    def validate_airplane(self, value):
+        return parse_ids(value)
+
+
+class FleetUtilizationSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    flights = serializers.IntegerField()
+    block_hours = serializers.FloatField()
+    idle_hours = serializers.FloatField(
+        help_text="Hours on the ground between the first departure and the last arrival"
+    )
+    average_gap_hours = serializers.FloatField(allow_null=True)
+    flights_per_day = serializers.FloatField()
+    utilization = serializers.FloatField(help_text="Share of the window spent flying")
+
 
 class TicketUnableToBuySerializer(serializers.ModelSerializer):
     class Meta:
@@ -231,5 +490,86 @@ class OrderUserSerializer(OrderAdminSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
 
+class OrderTicketSerializer(serializers.ModelSerializer):
+    flight = serializers.IntegerField(source="flight_id")
+
+    class Meta:
+        model = Ticket
+        fields = ("id", "flight", "row", "seat")
+
+
+class OrderAdminCreateSerializer(OrderAdminSerializer):
+    tickets = OrderTicketSerializer(many=True, required=False)
+
+    def validate_tickets(self, tickets):
+        seats = [(ticket["flight_id"], ticket["row"], ticket["seat"]) for ticket in tickets]
+        if len(set(seats)) != len(seats):
+            raise serializers.ValidationError("The same seat is booked more than once")
+        return tickets
+
+    def validate_seats(self, tickets):
+        """
+        Check every seat against the booked airplanes in two queries.
+
+        This only produces readable errors: seat uniqueness and bounds are
+        enforced by the database, so concurrent bookings that slip past this
+        check fail on insert instead of overselling the flight.
+        """
+        flights = Flight.objects.select_related("airplane").in_bulk(
+            {ticket["flight_id"] for ticket in tickets}
+        )
+        sold = set(
+            Ticket.objects.filter(reduce(or_, (
+                Q(flight_id=ticket["flight_id"], row=ticket["row"], seat=ticket["seat"])
+                for ticket in tickets
+            ))).values_list("flight_id", "row", "seat")
+        )
+
+        errors = []
+        for ticket in tickets:
+            error = {}
+            flight = flights.get(ticket["flight_id"])
+            if flight is None:
+                error["flight"] = "Invalid flight"
+            else:
+                if ticket["row"] > flight.airplane.rows:
+                    error["row"] = "Invalid row number"
+                if ticket["seat"] > flight.airplane.seats_per_row:
+                    error["seat"] = "Invalid seat number"
+                if (ticket["flight_id"], ticket["row"], ticket["seat"]) in sold:
+                    error["seat"] = "This seat is already taken"
+            errors.append(error)
+
+        if any(errors):
+            raise serializers.ValidationError({"tickets": errors})
+
+    def create(self, validated_data):
+        tickets = validated_data.pop("tickets", [])
+        with transaction.atomic():
+            if tickets:
+                self.validate_seats(tickets)
+            order = super().create(validated_data)
+            try:
+                Ticket.objects.bulk_create(
+                    Ticket(order=order, **ticket) for ticket in tickets
+                )
+            except IntegrityError:
+                raise serializers.ValidationError(
+                    {"tickets": "One or more seats are already taken"}
+                )
+            for flight_id, count in Counter(
+                    ticket["flight_id"] for ticket in tickets
+            ).items():
+                Flight.add_tickets_sold(flight_id, count)
+            transaction.on_commit(lambda: invalidate_seat_maps(
+                {ticket["flight_id"] for ticket in tickets}
+            ))
+        return order
+
+
+class OrderUserCreateSerializer(OrderAdminCreateSerializer):
+    user = serializers.HiddenField(default=serializers.CurrentUserDefault())
+
+
 class OrderDetailSerializer(OrderUserSerializer):
     tickets = TicketDetailSerializer(many=True, read_only=True)
@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.serializers import ValidationError
+
+from airport.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    City,
+    Country,
+    Flight,
+    Route,
+    Ticket,
+)
+from airport.rosters import crew_conflicts
+from airport.route_graph import route_graph
+from airport.seat_map import invalidate_seat_maps
+from core.caching import register_cached_models
+
+register_cached_models(Country, City, AirplaneType, Airplane, Airport, Route)
+
+
+@receiver(post_save, sender=Ticket)
+def update_flight_on_ticket_save(sender, instance, created, **kwargs):
+    previous_flight_id = None if created else instance._loaded_flight_id
+    if previous_flight_id != instance.flight_id:
+        if previous_flight_id is not None:
+            Flight.add_tickets_sold(previous_flight_id, -1)
+        if instance.flight_id is not None:
+            Flight.add_tickets_sold(instance.flight_id, 1)
+    invalidate_seat_maps({instance.flight_id, previous_flight_id})
+    instance._loaded_flight_id = instance.flight_id
+
+
+@receiver(post_delete, sender=Ticket)
+def update_flight_on_ticket_delete(sender, instance, **kwargs):
+    if instance.flight_id is not None:
+        Flight.add_tickets_sold(instance.flight_id, -1)
+    invalidate_seat_maps([instance.flight_id])
+
+
+@receiver(post_save, sender=Flight)
+@receiver(post_delete, sender=Flight)
+def invalidate_flight_seat_map(sender, instance, **kwargs):
+    invalidate_seat_maps([instance.pk])
+
+
+@receiver(post_save, sender=Airplane)
+def invalidate_airplane_seat_maps(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_seat_maps(instance.flights.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Flight)
+def add_flight_to_route_graph(sender, instance, **kwargs):
+    flight_id = instance.pk
+    transaction.on_commit(lambda: route_graph.add_flight(flight_id))
+
+
+@receiver(post_delete, sender=Flight)
+def discard_flight_from_route_graph(sender, instance, **kwargs):
+    flight_id = instance.pk
+    transaction.on_commit(lambda: route_graph.discard_flight(flight_id))
+
+
+@receiver(post_save, sender=Route)
+def update_route_in_route_graph(sender, instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(lambda: route_graph.update_route(instance))
+
+
+@receiver(m2m_changed, sender=Flight.crew.through)
+def touch_flight_crew(sender, instance, action, model, pk_set, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        now = timezone.now()
+        type(instance).objects.filter(pk=instance.pk).update(updated_at=now)
+        if pk_set:
+            model.objects.filter(pk__in=pk_set).update(updated_at=now)
+
+
+@receiver(m2m_changed, sender=Flight.crew.through)
+def check_crew_overlap(sender, instance, action, reverse, pk_set, **kwargs):
+    if action != "pre_add" or not pk_set:
+        return
+    crew_ids, flight_ids = ([instance.pk], pk_set) if reverse else (pk_set, [instance.pk])
+    assignments = [
+        (crew_id, flight_id, departure_time, arrival_time)
+        for flight_id, departure_time, arrival_time in Flight.objects.filter(
+            pk__in=flight_ids
+        ).values_list("pk", "departure_time", "arrival_time")
+        for crew_id in crew_ids
+    ]
+    conflicts = crew_conflicts(assignments)
+    if conflicts:
+        raise ValidationError({"crew": [
+            f"Crew member {crew_id} is already assigned to overlapping flight {other_flight_id}"
+            for crew_id, _, other_flight_id in conflicts
+        ]})
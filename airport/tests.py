@@ -1,13 +1,52 @@
+import csv
+import json
+import pstats
+import threading
+from base64 import b64decode
+from decimal import Decimal
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from itertools import count
+from unittest import mock
+from tempfile import TemporaryDirectory
+
 from django.contrib.auth import get_user_model
-from rest_framework.test import APITestCase
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Sum
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from airport.route_graph import route_graph
+from core.fields import TemplatedHyperlinkedIdentityField
+from core.metrics import registry
+from core.nplusone import RepeatedQueriesError, RepeatedQueryDetector, query_shape
+from core.profiling import StackSampler
+from core.slow_queries import seq_scans
+from airport.rosters import airplane_conflict, crew_conflicts
+from core.renderers import FastJSONRenderer
+from core.planner import QueryPlan
+from core.values import ValuesPlan
+from airport.schedules import generate_flights
+from airport.views import AirportViewSet, FlightViewSet, RouteViewSet
 from airport.serializers import (
+    CrewDetailSerializer,
     CountrySerializer,
     CityWithSlugSerializer,
     AirplaneTypeDetailSerializer,
     AirplaneRetrieveSerializer,
     AirportDetailSerializer,
     RouteWithSlugSerializer,
+    AirplaneNestedSerializer,
+    FlightListSerializer,
+    TicketDetailSerializer,
 )
 from airport.models import (
     Country,
@@ -18,6 +57,7 @@ from airport.models import (
     Route,
     Crew,
     Flight,
+    FlightSchedule,
     Ticket,
     Order,
 )
@@ -30,6 +70,7 @@ AIRPORT = "airport"
 ROUTE = "route"
 CREW = "crew"
 FLIGHT = "flight"
+FLIGHT_SCHEDULE = "flight-schedule"
 TICKET = "ticket"
 ORDER = "order"
 
@@ -552,6 +593,268 @@ class TestRouteAuth(APITestCase):
         self.assertEqual(Route.objects.get(pk=route.pk).source.name, "test2")
 
 
+class TestReferenceDataCache(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_repeated_list_served_from_cache(self):
+        create_and_return_country("test")
+        url = reverse(f"airport:{COUNTRY}-list")
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+
+    def test_save_invalidates_cached_detail(self):
+        country = create_and_return_country("test")
+        url = reverse(f"airport:{COUNTRY}-detail", kwargs={"pk": country.pk})
+        self.client.get(url)
+        country.name = "renamed"
+        country.save()
+        response = self.client.get(url)
+        self.assertEqual(response.json()["name"], "renamed")
+
+    def test_delete_invalidates_cached_list(self):
+        country = create_and_return_country("test")
+        url = reverse(f"airport:{COUNTRY}-list")
+        self.assertEqual(len(self.client.get(url).json()), 1)
+        country.delete()
+        self.assertEqual(self.client.get(url).json(), [])
+
+    def test_dependency_write_invalidates_cached_list(self):
+        city = create_and_return_city("test", "test")
+        url = reverse(f"airport:{CITY}-list")
+        self.client.get(url)
+        city.country.name = "renamed"
+        city.country.save()
+        response = self.client.get(url)
+        self.assertEqual(response.json()[0]["country"], "renamed")
+
+    def test_new_route_invalidates_cached_airport_detail(self):
+        source = create_and_return_airport("source", "source_city", "source_country")
+        destination = create_and_return_airport("destination", "destination_city", "destination_country")
+        url = reverse(f"airport:{AIRPORT}-detail", kwargs={"pk": source.pk})
+        self.assertEqual(self.client.get(url).json()["sources"], [])
+        Route.objects.create(source=source, destination=destination, distance=100)
+        self.assertEqual(len(self.client.get(url).json()["sources"]), 1)
+
+    def test_missing_object_not_cached(self):
+        url = reverse(f"airport:{COUNTRY}-detail", kwargs={"pk": 1})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_authenticate(create_and_return_user())
+        self.client.post(reverse(f"airport:{COUNTRY}-list"), {"name": "test"})
+        country = Country.objects.get()
+        url = reverse(f"airport:{COUNTRY}-detail", kwargs={"pk": country.pk})
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_file_based_backend(self):
+        with TemporaryDirectory() as location, override_settings(CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": location,
+            }
+        }):
+            airplane = create_and_return_airplane("test", "test")
+            url = reverse(
+                f"airport:{AIRPLANE_TYPE}-detail",
+                kwargs={"pk": airplane.airplane_type_id},
+            )
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(second.json(), first.json())
+
+            airplane.name = "renamed"
+            airplane.save()
+            response = self.client.get(url)
+            self.assertEqual(response.json()["airplanes"][0]["name"], "renamed")
+
+    def test_stats(self):
+        create_and_return_country("test")
+        url = reverse(f"airport:{COUNTRY}-list")
+        before = self.client.get(reverse("cache-stats"))
+        self.assertEqual(before.status_code, 401)
+
+        self.client.force_authenticate(create_and_return_user())
+        before = self.client.get(reverse("cache-stats")).json().get(
+            COUNTRY, {"hits": 0, "misses": 0}
+        )
+        self.client.get(url)
+        self.client.get(url)
+        after = self.client.get(reverse("cache-stats")).json()[COUNTRY]
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+
+    def test_stats_admin_only(self):
+        self.client.force_authenticate(create_and_return_user(is_staff=False))
+        response = self.client.get(reverse("cache-stats"))
+        self.assertEqual(response.status_code, 403)
+
+
+class TestMetrics(APITestCase):
+    def setUp(self):
+        registry.clear()
+        create_and_return_country("test")
+
+    def get_metrics(self, **headers):
+        response = self.client.get(reverse("metrics"), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return response.content.decode()
+
+    def test_records_view_and_action(self):
+        self.client.force_authenticate(create_and_return_user())
+        url = reverse(f"airport:{COUNTRY}-list")
+        self.client.get(url)
+        self.client.post(url, {"name": ""})
+        metrics = self.get_metrics()
+        labels = 'view="airport:country-list",action="list"'
+        self.assertIn(f'http_responses_total{{{labels},status="2xx"}} 1', metrics)
+        self.assertIn(
+            'http_responses_total{view="airport:country-list",action="create",status="4xx"} 1', metrics
+        )
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}} 1', metrics)
+        self.assertIn(f'http_request_db_queries_bucket{{{labels},le="+Inf"}} 1', metrics)
+        self.assertNotIn(f'http_request_db_queries_bucket{{{labels},le="0"}} 1', metrics)
+        self.assertIn(f'http_response_render_seconds_count{{{labels}}} 1', metrics)
+        self.assertIn(f'http_response_size_bytes_bucket{{{labels},le="256"}} 1', metrics)
+
+    def test_series_bounded(self):
+        with mock.patch.object(registry, "max_series", 1):
+            self.client.get(reverse(f"airport:{COUNTRY}-list"))
+            self.client.get(reverse(f"airport:{CITY}-list"))
+            self.client.get("/missing/")
+        self.client.force_authenticate(create_and_return_user())
+        metrics = self.get_metrics()
+        self.assertIn('http_responses_total{view="airport:country-list",action="list",status="2xx"} 1', metrics)
+        self.assertIn('http_responses_total{view="<other>",action="<other>",status="2xx"} 1', metrics)
+        self.assertIn('http_responses_total{view="<other>",action="<other>",status="4xx"} 1', metrics)
+        self.assertNotIn("city", metrics)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+        self.assertEqual(
+            self.client.get(reverse("metrics"), headers={"Authorization": "Bearer wrong"}).status_code,
+            401,
+        )
+        self.get_metrics(Authorization="Bearer secret")
+
+    def test_admin_only(self):
+        self.client.force_authenticate(create_and_return_user(is_staff=False))
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+
+
+class TestProfiling(APITestCase):
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings = override_settings(PROFILE_DIR=self.directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client.force_authenticate(create_and_return_user())
+        self.url = reverse(f"airport:{COUNTRY}-list")
+
+    def profiled_get(self):
+        token = self.client.post(reverse("profile-token")).data["token"]
+        return self.client.get(self.url, headers={"X-Profile": token})
+
+    def test_signed_header(self):
+        self.assertNotIn("X-Profile-Id", self.client.get(self.url))
+        self.assertNotIn("X-Profile-Id", self.client.get(self.url, headers={"X-Profile": "forged"}))
+        profile_id = self.profiled_get()["X-Profile-Id"]
+
+        profiles = self.client.get(reverse("profile-list")).data
+        self.assertEqual([profile["id"] for profile in profiles], [profile_id])
+        self.assertEqual(profiles[0]["view"], "airport:country-list")
+
+        response = self.client.get(reverse("profile-download", args=[profile_id, "pstats"]))
+        self.assertEqual(response.status_code, 200)
+        path = f"{self.directory.name}/stats.prof"
+        with open(path, "wb") as stats:
+            stats.write(b"".join(response.streaming_content))
+        functions = pstats.Stats(path).stats
+        self.assertTrue(any(filename.endswith("core/caching.py") for filename, _, _ in functions))
+
+        response = self.client.get(reverse("profile-download", args=[profile_id, "collapsed"]))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse("profile-download", args=[profile_id, "svg"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_sample_rate_and_pruning(self):
+        with override_settings(PROFILE_SAMPLE_RATE=1, PROFILE_MAX_FILES=2):
+            ids = [self.client.get(self.url)["X-Profile-Id"] for _ in range(3)]
+        profiles = self.client.get(reverse("profile-list")).data
+        self.assertEqual([profile["id"] for profile in profiles], ids[:0:-1])
+        response = self.client.get(reverse("profile-download", args=[ids[0], "collapsed"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_stack_sampler(self):
+        sampler = StackSampler(threading.get_ident(), 0.001)
+        sampler.start()
+        deadline = timezone.now() + timedelta(seconds=1)
+        while not sampler.stacks and timezone.now() < deadline:
+            pass
+        sampler.stop()
+        stack, count = sampler.collapsed().splitlines()[0].rsplit(" ", 1)
+        self.assertTrue(any(
+            frame.startswith("test_stack_sampler (airport/tests.py:") for frame in stack.split(";")
+        ))
+        self.assertGreater(int(count), 0)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(
+            create_and_return_user(username="user", email="user@example.com", is_staff=False)
+        )
+        self.assertEqual(self.client.get(reverse("profile-list")).status_code, 403)
+        self.assertEqual(self.client.post(reverse("profile-token")).status_code, 403)
+
+
+class TestSlowQueryLog(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(create_and_return_user())
+        self.flight = create_and_return_flight(
+            ["first_name", "last_name"],
+            [
+                ["source_airport_name", "source_city_name", "source_country_name"],
+                ["destination_airport_name", "destination_city_name", "destination_country_name"]
+            ],
+            ["airplane_name", "airplane_type_name"]
+        )
+
+    def test_records_slow_queries(self):
+        with self.assertNoLogs("core.slow_queries"):
+            self.client.get(reverse(f"airport:{FLIGHT}-list"))
+
+        with override_settings(SLOW_QUERY_THRESHOLD=1e-9), self.assertLogs("core.slow_queries") as logs:
+            self.client.get(reverse(f"airport:{FLIGHT}-list"), {"source": self.flight.route.source_id})
+        entries = [json.loads(record.getMessage()) for record in logs.records]
+        entry = next(entry for entry in entries if "airport_flight" in entry["sql"])
+        self.assertEqual(entry["view"], "airport:flight-list")
+        self.assertEqual(entry["action"], "list")
+        self.assertIn(self.flight.route.source_id, entry["params"])
+        self.assertFalse(entry["frame"].startswith("core/slow_queries.py"))
+        self.assertIsNone(entry["plan"])
+
+    def test_outside_requests(self):
+        with override_settings(SLOW_QUERY_THRESHOLD=1e-9), self.assertLogs("core.slow_queries") as logs:
+            Flight.objects.count()
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertIsNone(entry["view"])
+        self.assertTrue(entry["frame"].startswith("airport/tests.py:"))
+
+    def test_seq_scans(self):
+        plan = [{"Plan": {
+            "Node Type": "Hash Join",
+            "Plans": [
+                {"Node Type": "Seq Scan", "Relation Name": "airport_ticket"},
+                {"Node Type": "Index Scan", "Relation Name": "airport_order"},
+            ],
+        }}]
+        self.assertEqual(seq_scans(plan), ["airport_ticket"])
+
+
 class TestCrew(APITestCase):
     def test_list(self):
         create_and_return_crew("test", "test")
@@ -714,6 +1017,1755 @@ class TestFlightAuth(APITestCase):
         self.assertEqual(response.status_code, 200)
 
 
+class TestFlightPagination(APITestCase):
+    def setUp(self):
+        flight = create_and_return_flight(
+            ["first_name", "last_name"],
+            [
+                ["source_airport_name", "source_city_name", "source_country_name"],
+                ["destination_airport_name", "destination_city_name", "destination_country_name"]
+            ],
+            ["airplane_name", "airplane_type_name"]
+        )
+        for day in (3, 2, 2, 2, 1):
+            Flight.objects.create(
+                route=flight.route,
+                airplane=flight.airplane,
+                departure_time=f"2021-01-0{day}T00:00:00Z",
+                arrival_time=f"2021-01-0{day}T00:00:00Z",
+            )
+        self.expected = [
+            departure_time.isoformat().replace("+00:00", "Z")
+            for departure_time in Flight.objects.order_by(
+                "departure_time", "id"
+            ).values_list("departure_time", flat=True)
+        ]
+
+    def test_pages_follow_departure_time_and_id(self):
+        url = reverse(f"airport:{FLIGHT}-list") + "?page_size=2"
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            seen.extend(result["departure_time"] for result in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_link_returns_previous_page(self):
+        url = reverse(f"airport:{FLIGHT}-list") + "?page_size=2"
+        first_page = self.client.get(url).data
+        second_page = self.client.get(first_page["next"]).data
+        self.assertIsNone(first_page["previous"])
+        self.assertEqual(
+            self.client.get(second_page["previous"]).data["results"],
+            first_page["results"],
+        )
+
+    def test_invalid_cursor(self):
+        url = reverse(f"airport:{FLIGHT}-list") + "?cursor=invalid"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_no_count_query(self):
+        url = reverse(f"airport:{FLIGHT}-list") + "?page_size=2"
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse(
+            any("COUNT(" in query["sql"].upper() for query in queries.captured_queries)
+        )
+
+
+class TestTicketPagination(APITestCase):
+    def setUp(self):
+        self.user = create_and_return_user(is_staff=False)
+        ticket = create_and_return_ticket(
+            user=self.user,
+            flight=[
+                ["first_name", "last_name"],
+                [
+                    ["source_airport_name", "source_city_name", "source_country_name"],
+                    ["destination_airport_name", "destination_city_name", "destination_country_name"],
+                ],
+                ["airplane_name", "airplane_type_name"]
+            ]
+        )
+        later_order = Order.objects.create(user=self.user)
+        # Interleave the two orders' tickets, so (order_id, id) differs from id order.
+        for order, seat in ((later_order, 2), (later_order, 3), (ticket.order, 4)):
+            Ticket.objects.create(flight=ticket.flight, order=order, row=1, seat=seat)
+        Ticket.objects.create(flight=ticket.flight, order=ticket.order, row=2, seat=1)
+
+    def collect(self):
+        url = reverse(f"airport:{TICKET}-list") + "?page_size=2"
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(result["id"] for result in response.data["results"])
+            url = response.data["next"]
+        return seen
+
+    def test_customer_pages_follow_order_and_id(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(
+            self.collect(),
+            list(Ticket.objects.order_by("order_id", "id").values_list("id", flat=True)),
+        )
+
+    def test_staff_pages_follow_id(self):
+        self.client.force_authenticate(create_and_return_user(username="staff", email="staff@example.com"))
+        self.assertEqual(
+            self.collect(),
+            list(Ticket.objects.order_by("id").values_list("id", flat=True)),
+        )
+
+
+class TestFlightSearch(APITestCase):
+    def setUp(self):
+        self.flight = create_and_return_flight(
+            ["first_name", "last_name"],
+            [
+                ["source_airport_name", "source_city_name", "source_country_name"],
+                ["destination_airport_name", "destination_city_name", "destination_country_name"]
+            ],
+            ["airplane_name", "airplane_type_name"]
+        )
+        self.other_flight = create_and_return_flight(
+            ["first_name1", "last_name1"],
+            [
+                ["source_airport_name1", "source_city_name1", "source_country_name1"],
+                ["destination_airport_name1", "destination_city_name1", "destination_country_name1"]
+            ],
+            ["airplane_name1", "airplane_type_name1"]
+        )
+        self.other_flight.departure_time = "2021-01-05T12:00:00Z"
+        self.other_flight.arrival_time = "2021-01-05T14:00:00Z"
+        self.other_flight.save()
+        self.url = reverse(f"airport:{FLIGHT}-list")
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [result["route"]["source"] for result in response.data["results"]]
+
+    def test_filter_by_airport(self):
+        route = self.flight.route
+        self.assertEqual(self.search(source=route.source_id), ["source_airport_name"])
+        self.assertEqual(
+            self.search(destination=f"{route.destination_id},{self.other_flight.route.destination_id}"),
+            ["source_airport_name", "source_airport_name1"],
+        )
+
+    def test_filter_by_city_and_country(self):
+        source = self.flight.route.source
+        destination = self.other_flight.route.destination
+        self.assertEqual(
+            self.search(source_city=source.closest_big_city_id),
+            ["source_airport_name"],
+        )
+        self.assertEqual(
+            self.search(destination_country=destination.closest_big_city.country_id),
+            ["source_airport_name1"],
+        )
+
+    def test_filter_by_departure_date(self):
+        self.assertEqual(self.search(departure_from="2021-01-02"), ["source_airport_name1"])
+        self.assertEqual(self.search(departure_to="2021-01-01"), ["source_airport_name"])
+        self.assertEqual(
+            self.search(departure_from="2021-01-05", departure_to="2021-01-05"),
+            ["source_airport_name1"],
+        )
+
+    def test_invalid_filters(self):
+        self.assertEqual(self.client.get(self.url, {"source": "a"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"departure_from": "01.01.2021"}).status_code, 400)
+
+
+class TestFlightConnections(APITestCase):
+    def setUp(self):
+        route_graph.invalidate()
+        self.airports = {
+            name: create_and_return_airport(name, f"{name}_city", f"{name}_country")
+            for name in ("A", "B", "C")
+        }
+        self.airplane_type = create_and_return_airplane_type("airplane_type_name")
+        self.date = timezone.now().date() + timedelta(days=2)
+        self.direct = self.create_flight("A", "C", 150, "09:00", "15:00")
+        self.first_leg = self.create_flight("A", "B", 100, "08:00", "10:00")
+        self.second_leg = self.create_flight("B", "C", 100, "11:30", "13:00")
+        self.short_layover = self.create_flight("B", "C", 100, "10:15", "12:00")
+        self.url = reverse(f"airport:{FLIGHT}-connections")
+
+    def create_flight(self, source, destination, distance, departure, arrival):
+        route, _ = Route.objects.get_or_create(
+            source=self.airports[source],
+            destination=self.airports[destination],
+            defaults={"distance": distance},
+        )
+        return Flight.objects.create(
+            route=route,
+            airplane=Airplane.objects.create(
+                airplane_type=self.airplane_type,
+                name=f"{source}{destination}{departure}",
+                rows=2,
+                seats_per_row=4,
+            ),
+            departure_time=f"{self.date}T{departure}:00Z",
+            arrival_time=f"{self.date}T{arrival}:00Z",
+        )
+
+    def search(self, **params):
+        params = {
+            "source": self.airports["A"].pk,
+            "destination": self.airports["C"].pk,
+            "departure_date": self.date,
+            **params,
+        }
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [[leg["flight"] for leg in itinerary["legs"]] for itinerary in response.data]
+
+    def test_connections_ordered_by_duration(self):
+        self.assertEqual(
+            self.search(),
+            [[self.first_leg.pk, self.second_leg.pk], [self.direct.pk]],
+        )
+
+    def test_connections_ordered_by_distance(self):
+        self.assertEqual(
+            self.search(order_by="distance"),
+            [[self.direct.pk], [self.first_leg.pk, self.second_leg.pk]],
+        )
+
+    def test_max_legs_and_layover(self):
+        self.assertEqual(self.search(max_legs=1), [[self.direct.pk]])
+        self.assertEqual(
+            self.search(min_layover=15),
+            [
+                [self.first_leg.pk, self.short_layover.pk],
+                [self.first_leg.pk, self.second_leg.pk],
+                [self.direct.pk],
+            ],
+        )
+
+    def test_graph_is_updated_on_flight_changes(self):
+        self.search()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.direct.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            faster = self.create_flight("A", "C", 150, "12:00", "13:00")
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.search(),
+                [[faster.pk], [self.first_leg.pk, self.second_leg.pk]],
+            )
+
+    def test_limit_keeps_best(self):
+        self.assertEqual(self.search(limit=1), [[self.first_leg.pk, self.second_leg.pk]])
+        self.assertEqual(self.search(order_by="distance", limit=1), [[self.direct.pk]])
+
+    def test_snapshot_unchanged_by_later_updates(self):
+        self.search()
+        snapshot = route_graph.snapshot()
+        departures = list(snapshot[self.airports["A"].pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_flight("A", "C", 150, "12:00", "13:00")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.direct.delete()
+        self.assertEqual(snapshot[self.airports["A"].pk], departures)
+        self.assertEqual(len(route_graph.snapshot()[self.airports["A"].pk]), len(departures))
+
+    def test_invalid_search(self):
+        response = self.client.get(self.url, {"source": self.airports["A"].pk})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestImportSchedule(APITestCase):
+    header = "source,destination,distance,airplane,departure_time,arrival_time,crew\n"
+    rows = (
+        "first,second,500,airplane_name,2030-01-01T08:00:00Z,2030-01-01T10:00:00Z,John Smith\n"
+        "second,third,700,airplane_name,2030-01-01T12:00:00Z,2030-01-01T14:00:00Z,"
+        "John Smith;Jane Doe\n"
+    )
+
+    def setUp(self):
+        for index, name in enumerate(("first", "second", "third")):
+            create_and_return_airport(name, f"city{index}", f"country{index}")
+        create_and_return_airplane("airplane_name", "airplane_type_name")
+        create_and_return_crew("John", "Smith")
+        create_and_return_crew("Jane", "Doe")
+        self.directory = TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def import_schedule(self, content, name="schedule.csv"):
+        path = f"{self.directory.name}/{name}"
+        with open(path, "w") as schedule:
+            schedule.write(content)
+        call_command("import_schedule", path, stdout=StringIO())
+
+    def test_import_csv(self):
+        self.import_schedule(self.header + self.rows)
+        self.assertEqual(Route.objects.count(), 2)
+        self.assertEqual(Flight.objects.count(), 2)
+        flight = Flight.objects.get(route__source__name="second")
+        self.assertEqual(flight.route.distance, 700)
+        self.assertEqual(flight.departure_time.hour, 12)
+        self.assertEqual(flight.tickets_sold, 0)
+        self.assertEqual(
+            sorted(flight.crew.values_list("last_name", flat=True)), ["Doe", "Smith"]
+        )
+
+    def test_import_ndjson(self):
+        self.import_schedule(
+            json.dumps({
+                "source": "first",
+                "destination": "third",
+                "distance": 900,
+                "airplane": "airplane_name",
+                "departure_time": "2030-01-01T08:00:00Z",
+                "arrival_time": "2030-01-01T11:00:00Z",
+                "crew": ["Jane Doe"],
+            }) + "\n",
+            name="schedule.ndjson",
+        )
+        flight = Flight.objects.get()
+        self.assertEqual(flight.route.destination.name, "third")
+        self.assertEqual(list(flight.crew.values_list("first_name", flat=True)), ["Jane"])
+
+    def test_reimport_updates_existing_flights(self):
+        self.import_schedule(self.header + self.rows)
+        self.import_schedule(self.header + self.rows.replace("T10:00", "T10:30"))
+        self.assertEqual(Flight.objects.count(), 2)
+        self.assertEqual(Flight.crew.through.objects.count(), 3)
+        flight = Flight.objects.get(route__source__name="first")
+        self.assertEqual(flight.arrival_time.minute, 30)
+
+    def test_invalid_rows_abort_import(self):
+        rows = self.rows + (
+            "first,unknown,500,airplane_name,2030-01-02T08:00:00Z,2030-01-02T10:00:00Z,\n"
+            "third,first,,airplane_name,2030-01-02T08:00:00Z,2030-01-02T10:00:00Z,\n"
+        )
+        with self.assertRaisesMessage(CommandError, "line 4: unknown airport 'unknown'"):
+            self.import_schedule(self.header + rows)
+        self.assertEqual(Flight.objects.count(), 0)
+        self.assertEqual(Route.objects.count(), 0)
+
+        with self.assertRaisesMessage(CommandError, "line 5: distance is required for a new route"):
+            self.import_schedule(self.header + rows)
+
+    def test_overlapping_flights_abort_import(self):
+        rows = self.rows + (
+            "third,first,600,airplane_name,2030-01-01T13:00:00Z,2030-01-01T15:00:00Z,\n"
+        )
+        with self.assertRaisesMessage(CommandError, "line 4: overlaps line 3, same airplane"):
+            self.import_schedule(self.header + rows)
+        self.assertEqual(Flight.objects.count(), 0)
+        self.assertEqual(Route.objects.count(), 0)
+
+        self.import_schedule(self.header + self.rows)
+        flight = Flight.objects.get(route__source__name="second")
+        with self.assertRaisesMessage(
+            CommandError, f"line 2: overlaps flight {flight.pk}, same airplane"
+        ):
+            self.import_schedule(self.header + rows.splitlines(keepends=True)[-1])
+        self.assertEqual(Flight.objects.count(), 2)
+
+    def test_crew_double_booking_aborts_import(self):
+        create_and_return_airplane("other_airplane", "other_airplane_type")
+        crew_id = Crew.objects.get(last_name="Smith").pk
+        rows = (
+            "first,second,500,airplane_name,2030-01-01T10:00:00Z,2030-01-01T12:00:00Z,John Smith\n"
+            "second,third,700,other_airplane,2030-01-01T11:00:00Z,2030-01-01T13:00:00Z,John Smith\n"
+        )
+        with self.assertRaisesMessage(
+            CommandError, f"line 3: overlaps line 2, same crew member {crew_id}"
+        ):
+            self.import_schedule(self.header + rows)
+        self.assertEqual(Flight.objects.count(), 0)
+
+        self.import_schedule(self.header + rows.splitlines(keepends=True)[0])
+        flight = Flight.objects.get()
+        with self.assertRaisesMessage(
+            CommandError, f"line 2: overlaps flight {flight.pk}, same crew member {crew_id}"
+        ):
+            self.import_schedule(self.header + rows.splitlines(keepends=True)[1])
+        self.assertEqual(Flight.crew.through.objects.count(), 1)
+
+
+class TestSeedBench(APITestCase):
+    def test_seed(self):
+        out = StringIO()
+        call_command("seed_bench", "--scale", "1", stdout=out)
+        self.assertIn("1000 flights", out.getvalue())
+        self.assertEqual(Flight.objects.count(), 1000)
+        self.assertEqual(Flight.crew.through.objects.count(), 4000)
+        self.assertEqual(
+            Flight.objects.aggregate(sold=Sum("tickets_sold"))["sold"], Ticket.objects.count()
+        )
+        self.assertTrue(Order.objects.filter(user__username="bench_user").exists())
+        last_arrival = Flight.objects.order_by("-arrival_time").first().arrival_time
+        self.assertFalse(FlightSchedule.objects.filter(valid_from__lte=last_arrival.date()).exists())
+
+        flight = Flight.objects.order_by("departure_time").first()
+        self.assertFalse(crew_conflicts(
+            (member.pk, flight.pk, flight.departure_time, flight.arrival_time)
+            for member in flight.crew.all()
+        ))
+        self.assertIsNone(airplane_conflict(
+            flight.airplane_id, flight.pk, flight.departure_time, flight.arrival_time
+        ))
+
+        with self.assertRaisesMessage(CommandError, "already has data"):
+            call_command("seed_bench", stdout=StringIO())
+
+
+class TestFlightSchedule(APITestCase):
+    def setUp(self):
+        self.route = create_and_return_route(
+            ["source_airport_name", "source_city_name", "source_country_name"],
+            ["destination_airport_name", "destination_city_name", "destination_country_name"]
+        )
+        self.airplane = create_and_return_airplane("airplane_name", "airplane_type_name")
+        self.crew = create_and_return_crew("first_name", "last_name")
+
+    def create_schedule(self, **kwargs):
+        fields = {
+            "route": self.route,
+            "airplane": self.airplane,
+            "days_of_week": 1 | 4,
+            "departure_time": time(8),
+            "duration": timedelta(hours=2),
+            "timezone": "Europe/Kyiv",
+            "valid_from": date(2030, 1, 7),
+        }
+        fields.update(kwargs)
+        schedule = FlightSchedule.objects.create(**fields)
+        schedule.crew.add(self.crew)
+        return schedule
+
+    def test_generate(self):
+        schedule = self.create_schedule()
+        self.assertEqual(generate_flights(13, today=date(2030, 1, 7)), (4, []))
+        flights = Flight.objects.filter(schedule=schedule).order_by("departure_time")
+        self.assertEqual(
+            [flight.departure_time.date() for flight in flights],
+            [date(2030, 1, 7), date(2030, 1, 9), date(2030, 1, 14), date(2030, 1, 16)],
+        )
+        self.assertEqual(flights[0].departure_time.hour, 6)
+        self.assertEqual(flights[0].arrival_time - flights[0].departure_time, timedelta(hours=2))
+        self.assertEqual(list(flights[0].crew.all()), [self.crew])
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.generated_until, date(2030, 1, 20))
+
+    def test_rerun_extends_horizon(self):
+        self.create_schedule()
+        generate_flights(6, today=date(2030, 1, 7))
+        self.assertEqual(generate_flights(6, today=date(2030, 1, 7)), (0, []))
+        self.assertEqual(generate_flights(13, today=date(2030, 1, 7)), (2, []))
+        self.assertEqual(Flight.objects.count(), 4)
+        self.assertEqual(Flight.crew.through.objects.count(), 4)
+
+    def test_existing_flights_not_counted(self):
+        schedule = self.create_schedule()
+        generate_flights(6, today=date(2030, 1, 7))
+        FlightSchedule.objects.filter(pk=schedule.pk).update(generated_until=None)
+        self.assertEqual(generate_flights(13, today=date(2030, 1, 7)), (2, []))
+        self.assertEqual(Flight.objects.count(), 4)
+
+    def test_overlapping_departures_skipped(self):
+        schedule = self.create_schedule()
+        flight = Flight.objects.create(
+            route=self.route,
+            airplane=self.airplane,
+            departure_time="2030-01-09T07:00:00Z",
+            arrival_time="2030-01-09T09:00:00Z",
+        )
+        created, rejected = generate_flights(13, today=date(2030, 1, 7))
+        self.assertEqual(created, 3)
+        self.assertEqual(
+            rejected, [(schedule.pk, datetime.fromisoformat("2030-01-09T06:00:00+00:00"), flight.pk, None)]
+        )
+        self.assertEqual(Flight.objects.filter(schedule=schedule).count(), 3)
+
+    def test_crew_double_booking_skipped(self):
+        first = self.create_schedule()
+        second = self.create_schedule(
+            airplane=create_and_return_airplane("other_airplane", "other_airplane_type"),
+            departure_time=time(9),
+        )
+        created, rejected = generate_flights(13, today=date(2030, 1, 7))
+        self.assertEqual(created, 4)
+        self.assertEqual(len(rejected), 4)
+        self.assertEqual({skipped[0] for skipped in rejected}, {second.pk})
+        self.assertEqual({skipped[3] for skipped in rejected}, {self.crew.pk})
+        self.assertFalse(Flight.objects.filter(schedule=second).exists())
+        self.assertEqual(
+            Flight.crew.through.objects.filter(flight__schedule=first).count(), 4
+        )
+
+    def test_validity_range(self):
+        self.create_schedule(valid_from=date(2030, 1, 9), valid_until=date(2030, 1, 14))
+        generate_flights(30, today=date(2030, 1, 7))
+        self.assertEqual(
+            sorted(Flight.objects.values_list("departure_time__day", flat=True)), [9, 14]
+        )
+
+    def test_local_time_kept_across_dst(self):
+        self.create_schedule(days_of_week=127, valid_until=date(2030, 4, 1))
+        generate_flights(2, today=date(2030, 3, 30))
+        self.assertEqual(
+            list(Flight.objects.order_by("departure_time").values_list(
+                "departure_time__hour", flat=True
+            )),
+            [6, 5, 5],
+        )
+
+    def test_create_via_api(self):
+        self.client.force_authenticate(create_and_return_user())
+        data = {
+            "route": self.route.pk,
+            "airplane": self.airplane.pk,
+            "crew": [self.crew.pk],
+            "days_of_week": 127,
+            "departure_time": "08:00",
+            "duration": "02:00:00",
+            "timezone": "Europe/Kyiv",
+            "valid_from": "2030-01-07",
+        }
+        url = reverse(f"airport:{FLIGHT_SCHEDULE}-list")
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(response.data["generated_until"])
+
+        response = self.client.post(url, {**data, "timezone": "Mars/Olympus"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, {**data, "days_of_week": 128}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_overlapping_schedule_rejected(self):
+        self.client.force_authenticate(create_and_return_user())
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        flight = Flight.objects.create(
+            route=self.route,
+            airplane=self.airplane,
+            departure_time=f"{tomorrow}T09:00:00Z",
+            arrival_time=f"{tomorrow}T11:00:00Z",
+        )
+        data = {
+            "route": self.route.pk,
+            "airplane": self.airplane.pk,
+            "days_of_week": 127,
+            "departure_time": "08:00",
+            "duration": "02:00:00",
+            "timezone": "UTC",
+            "valid_from": tomorrow.isoformat(),
+        }
+        url = reverse(f"airport:{FLIGHT_SCHEDULE}-list")
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f"flight {flight.pk}", response.data["airplane"][0])
+
+        response = self.client.post(
+            url, {**data, "departure_time": "12:00", "duration": "1 01:00:00"}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("duration", response.data)
+
+        response = self.client.post(url, {**data, "departure_time": "11:00"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(generate_flights(3)[0], 3)
+        response = self.client.patch(
+            reverse(f"airport:{FLIGHT_SCHEDULE}-detail", args=[response.data["id"]]),
+            {"departure_time": "11:30"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_crew_overlap_rejected(self):
+        self.client.force_authenticate(create_and_return_user())
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        other_airplane = create_and_return_airplane("other_airplane", "other_airplane_type")
+        data = {
+            "route": self.route.pk,
+            "airplane": self.airplane.pk,
+            "crew": [self.crew.pk],
+            "days_of_week": 127,
+            "departure_time": "10:00",
+            "duration": "02:00:00",
+            "timezone": "UTC",
+            "valid_from": tomorrow.isoformat(),
+        }
+        url = reverse(f"airport:{FLIGHT_SCHEDULE}-list")
+        first = self.client.post(url, data, format="json")
+        self.assertEqual(first.status_code, 201)
+
+        response = self.client.post(url, {**data, "airplane": other_airplane.pk}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f"schedule {first.data['id']}", response.data["crew"][0])
+        response = self.client.post(url, {**data, "crew": []}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f"schedule {first.data['id']}", response.data["airplane"][0])
+
+        generate_flights(3)
+        response = self.client.post(url, {**data, "airplane": other_airplane.pk}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("already assigned to flight", response.data["crew"][0])
+        response = self.client.post(
+            url, {**data, "airplane": other_airplane.pk, "departure_time": "12:00"}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+
+
+class TestFlightTicketsSold(APITestCase):
+    def setUp(self):
+        self.flight = create_and_return_flight(
+            ["first_name", "last_name"],
+            [
+                ["source_airport_name", "source_city_name", "source_country_name"],
+                ["destination_airport_name", "destination_city_name", "destination_country_name"]
+            ],
+            ["airplane_name", "airplane_type_name"]
+        )
+        self.other_flight = create_and_return_flight(
+            ["first_name1", "last_name1"],
+            [
+                ["source_airport_name1", "source_city_name1", "source_country_name1"],
+                ["destination_airport_name1", "destination_city_name1", "destination_country_name1"]
+            ],
+            ["airplane_name1", "airplane_type_name1"]
+        )
+
+    def assertTicketsSold(self, flight, count):
+        flight.refresh_from_db()
+        self.assertEqual(flight.tickets_sold, count)
+
+    def test_counter_follows_tickets(self):
+        ticket = Ticket.objects.create(flight=self.flight, row=1, seat=1, order=Order.objects.create())
+        self.assertTicketsSold(self.flight, 1)
+
+        ticket = Ticket.objects.get(pk=ticket.pk)
+        ticket.flight = self.other_flight
+        ticket.save()
+        self.assertTicketsSold(self.flight, 0)
+        self.assertTicketsSold(self.other_flight, 1)
+
+        ticket.delete()
+        self.assertTicketsSold(self.other_flight, 0)
+
+    def test_counter_follows_order_tickets(self):
+        self.client.force_authenticate(create_and_return_user())
+        data = {"tickets": [{"flight": self.flight.pk, "row": 1, "seat": seat} for seat in (1, 2, 3)]}
+        self.client.post(reverse(f"airport:{ORDER}-list"), data, format="json")
+        self.assertTicketsSold(self.flight, 3)
+
+    def test_recount_command(self):
+        Ticket.objects.create(flight=self.flight, row=1, seat=1, order=Order.objects.create())
+        Flight.objects.update(tickets_sold=5)
+        call_command("recount_tickets_sold", stdout=StringIO())
+        self.assertTicketsSold(self.flight, 1)
+        self.assertTicketsSold(self.other_flight, 0)
+
+    def test_tickets_available(self):
+        Ticket.objects.create(flight=self.flight, row=1, seat=1, order=Order.objects.create())
+        url = reverse(f"airport:{FLIGHT}-detail", kwargs={"pk": self.flight.pk})
+        self.assertEqual(self.client.get(url).data["tickets_available"], 7)
+        results = self.client.get(reverse(f"airport:{FLIGHT}-list")).data["results"]
+        self.assertEqual(sorted(result["tickets_available"] for result in results), [7, 8])
+
+    def test_only_available_filter(self):
+        Flight.objects.filter(pk=self.flight.pk).update(tickets_sold=8)
+        response = self.client.get(reverse(f"airport:{FLIGHT}-list"), {"only_available": "true"})
+        self.assertEqual(
+            [result["route"]["source"] for result in response.data["results"]],
+            ["source_airport_name1"],
+        )
+
+
+class TestConditionalGet(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.flight = create_and_return_flight(
+            ["first_name", "last_name"],
+            [
+                ["source_airport_name", "source_city_name", "source_country_name"],
+                ["destination_airport_name", "destination_city_name", "destination_country_name"]
+            ],
+            ["airplane_name", "airplane_type_name"]
+        )
+        self.url = reverse(f"airport:{FLIGHT}-detail", kwargs={"pk": self.flight.pk})
+
+    def test_validators_set(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header("ETag"))
+        self.assertTrue(response.has_header("Last-Modified"))
+
+    def test_non_numeric_pk(self):
+        for basename in (FLIGHT, COUNTRY, ROUTE, AIRPLANE, AIRPORT, CREW):
+            with self.subTest(basename):
+                response = self.client.get(reverse(f"airport:{basename}-detail", kwargs={"pk": "abc"}))
+                self.assertEqual(response.status_code, 404)
+
+    def test_if_none_match(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.url)["Last-Modified"]
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_ticket_sale_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        Ticket.objects.create(flight=self.flight, row=1, seat=1, order=Order.objects.create())
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["tickets_available"], 7)
+
+    def test_nested_change_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        source = self.flight.route.source
+        source.name = "renamed"
+        source.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_crew_removal_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.flight.crew.clear()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["crew"], [])
+
+    def test_list_deletion_changes_etag(self):
+        user = create_and_return_user()
+        self.client.force_authenticate(user)
+        create_and_return_order(user)
+        order = create_and_return_order(user)
+        url = reverse(f"airport:{ORDER}-list")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        order.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_paginated_list(self):
+        url = reverse(f"airport:{FLIGHT}-list")
+        etag = self.client.get(url)["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 2)
+
+    def test_cached_response_not_modified_without_queries(self):
+        url = reverse(f"airport:{ROUTE}-list")
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_object(self):
+        url = reverse(f"airport:{FLIGHT}-detail", kwargs={"pk": self.flight.pk + 1})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header("ETag"))
+
+
+class TestFastJSON(APITestCase):
+    def test_matches_stock_renderer(self):
+        data = {
+            "text": "line\u2028separator \u00e9",
+            "decimal": Decimal("1.50"),
+            "datetime": timezone.datetime(2030, 1, 1, 8, 0, 0, 123456, tzinfo=timezone.get_fixed_timezone(0)),
+            "nested": [{"id": 1}, (2, 3)],
+            1: None,
+        }
+        for media_type in ("application/json", "application/json; indent=2", "application/json; indent=4"):
+            self.assertEqual(
+                FastJSONRenderer().render(data, media_type),
+                JSONRenderer().render(data, media_type),
+            )
+
+    def test_flight_list_response(self):
+        create_and_return_flight(
+            ["first_name", "last_name"],
+            [
+                ["source_airport_name", "source_city_name", "source_country_name"],
+                ["destination_airport_name", "destination_city_name", "destination_country_name"]
+            ],
+            ["airplane_name", "airplane_type_name"]
+        )
+        response = self.client.get(reverse(f"airport:{FLIGHT}-list"))
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_parse(self):
+        self.client.force_authenticate(create_and_return_user())
+        url = reverse(f"airport:{COUNTRY}-list")
+        response = self.client.post(url, '{"name": "caf\u00e9"}', content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Country.objects.get().name, "caf\u00e9")
+
+        response = self.client.post(url, '{"name": ', content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("JSON parse error", response.data["detail"])
+
+
+class TestTemplatedHyperlinks(APITestCase):
+    class LinkSerializer(serializers.Serializer):
+        stock = serializers.HyperlinkedIdentityField(view_name="airport:flight-detail")
+        templated = TemplatedHyperlinkedIdentityField(view_name="airport:flight-detail")
+
+    def setUp(self):
+        self.flights = [
+            create_and_return_flight(
+                [f"first_name_{i}", f"last_name_{i}"],
+                [
+                    [f"source_airport_{i}", f"source_city_{i}", f"source_country_{i}"],
+                    [f"destination_airport_{i}", f"destination_city_{i}", f"destination_country_{i}"]
+                ],
+                [f"airplane_{i}", f"airplane_type_{i}"]
+            )
+            for i in range(3)
+        ]
+
+    def links(self, path, **kwargs):
+        request = Request(APIRequestFactory().get(path))
+        data = self.LinkSerializer(
+            self.flights, many=True, context={"request": request, **kwargs}
+        ).data
+        return [(item["stock"], item["templated"]) for item in data]
+
+    def test_matches_stock_field(self):
+        for stock, templated in self.links("/flight/"):
+            self.assertEqual(templated, stock)
+        self.assertEqual(
+            self.links("/flight/")[0][1], f"http://testserver/flight/{self.flights[0].pk}/"
+        )
+
+    def test_format_override_and_suffix(self):
+        for stock, templated in self.links("/flight/?format=json"):
+            self.assertTrue(stock.endswith("?format=json"))
+            self.assertEqual(templated, stock)
+        for stock, templated in self.links("/flight.json", format="json"):
+            self.assertTrue(stock.endswith(".json"))
+            self.assertEqual(templated, stock)
+
+    def test_flight_list_response(self):
+        response = self.client.get(reverse(f"airport:{FLIGHT}-list"))
+        self.assertEqual(
+            {flight["route"]["url"] for flight in response.data["results"]},
+            {f"http://testserver/route/{flight.route_id}/" for flight in self.flights},
+        )
+
+
+class TestQueryPlan(APITestCase):
+    def setUp(self):
+        self.user = create_and_return_user()
+        self.client.force_authenticate(self.user)
+        self.flight = create_and_return_flight(
+            ["first_name", "last_name"],
+            [
+                ["source_airport_name", "source_city_name", "source_country_name"],
+                ["destination_airport_name", "destination_city_name", "destination_country_name"]
+            ],
+            ["airplane_name", "airplane_type_name"]
+        )
+
+    def add_flights(self, count):
+        for i in range(count):
+            Flight.objects.create(
+                route=Route.objects.create(
+                    source=self.flight.route.source,
+                    destination=Airport.objects.create(name=f"airport_{i}"),
+                    distance=100,
+                ),
+                airplane=self.flight.airplane,
+                departure_time=f"2030-01-{i + 1:02}T00:00:00Z",
+                arrival_time=f"2030-01-{i + 1:02}T02:00:00Z",
+            ).crew.set(self.flight.crew.all())
+
+    def assert_constant_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.add_flights(3)
+        cache.clear()
+        with self.assertNumQueries(len(queries)):
+            self.client.get(url)
+
+    def test_nested_serializer_is_joined(self):
+        plan = QueryPlan(FlightListSerializer())
+        self.assertEqual(plan.select_related, ["route", "route__source", "route__destination"])
+        self.assertEqual(plan.prefetch_related, [])
+        self.assertNotIn("airplane", plan.only)
+        self.assertIn("route__source__name", plan.only)
+
+    def test_only_loads_serialized_columns(self):
+        ticket = Ticket.objects.create(flight=self.flight, row=1, seat=1, order=create_and_return_order(self.user))
+        instance = QueryPlan(TicketDetailSerializer()).apply(Ticket.objects.all()).get(pk=ticket.pk)
+        self.assertEqual(instance.flight.get_deferred_fields(), {
+            "airplane_id", "departure_time", "arrival_time", "tickets_sold", "schedule_id", "updated_at"
+        })
+
+    def test_property_loads_all_columns(self):
+        plan = QueryPlan(AirplaneNestedSerializer())
+        instance = plan.apply(Airplane.objects.all()).get(pk=self.flight.airplane_id)
+        self.assertEqual(instance.get_deferred_fields(), set())
+
+    def test_ticket_list_has_no_joins(self):
+        Ticket.objects.create(flight=self.flight, row=1, seat=1, order=create_and_return_order(self.user))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse(f"airport:{TICKET}-list"))
+        self.assertFalse([query for query in queries.captured_queries if "JOIN" in query["sql"]])
+
+    def test_airport_detail_prefetches_routes(self):
+        self.assert_constant_queries(
+            reverse(f"airport:{AIRPORT}-detail", kwargs={"pk": self.flight.route.source_id})
+        )
+
+    def test_crew_detail_prefetches_flights(self):
+        self.assert_constant_queries(
+            reverse(f"airport:{CREW}-detail", kwargs={"pk": self.flight.crew.get().pk})
+        )
+
+    def test_order_detail_prefetches_tickets(self):
+        order = create_and_return_order(self.user)
+        Ticket.objects.create(flight=self.flight, row=1, seat=1, order=order)
+        url = reverse(f"airport:{ORDER}-detail", kwargs={"pk": order.pk})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        Ticket.objects.create(flight=self.flight, row=2, seat=1, order=order)
+        with self.assertNumQueries(len(queries)):
+            self.client.get(url)
+
+
+ROW_COUNTS = (1, 100)
+
+
+@override_settings(NPLUSONE_MAX_REPEATS=1)
+class TestQueryCounts(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.names = count()
+        self.user = create_and_return_user()
+        self.customer = create_and_return_user("customer", "customer@example.com", is_staff=False)
+        self.client.force_authenticate(self.user)
+        self.route = create_and_return_route(
+            ["source_airport_name", "source_city_name", "source_country_name"],
+            ["destination_airport_name", "destination_city_name", "destination_country_name"]
+        )
+        self.airplane_type = create_and_return_airplane_type("airplane_type_name")
+        self.airplane = self.add_airplanes(1)[0]
+        self.next_departure = timezone.make_aware(datetime(2030, 1, 1))
+
+    def assert_constant_queries(self, prepare):
+        """
+        Call `prepare(rows)` for every count in `ROW_COUNTS` to create that
+        many related rows and return the request to measure, and check the
+        request runs the same number of queries each time.
+        """
+        counts = []
+        for rows in ROW_COUNTS:
+            request = prepare(rows)
+            cache.clear()
+            route_graph.invalidate()
+            with CaptureQueriesContext(connection) as queries:
+                response = request()
+                if response.streaming:
+                    b"".join(response.streaming_content)
+            self.assertLess(response.status_code, 300, getattr(response, "data", None))
+            counts.append(len(queries))
+        self.assertEqual(len(set(counts)), 1, f"Queries for {ROW_COUNTS} related rows: {counts}")
+
+    def name(self, prefix):
+        return f"{prefix}_{next(self.names)}"
+
+    def add_airplanes(self, rows):
+        return Airplane.objects.bulk_create(
+            Airplane(airplane_type=self.airplane_type, name=self.name("airplane"), rows=20, seats_per_row=10)
+            for _ in range(rows)
+        )
+
+    def add_airports(self, rows):
+        city = create_and_return_city(self.name("city"), self.name("country"))
+        return Airport.objects.bulk_create(
+            Airport(name=self.name("airport"), closest_big_city=city) for _ in range(rows)
+        )
+
+    def add_crew(self, rows):
+        return Crew.objects.bulk_create(
+            Crew(first_name=self.name("first_name"), last_name="last_name") for _ in range(rows)
+        )
+
+    def add_flights(self, rows, route=None, crew=()):
+        """`rows` consecutive 10 minute flights of one airplane, staffed by `crew`."""
+        start = self.next_departure
+        self.next_departure += timedelta(minutes=15 * rows)
+        flights = Flight.objects.bulk_create(
+            Flight(
+                route=route or self.route,
+                airplane=self.airplane,
+                departure_time=start + timedelta(minutes=15 * number),
+                arrival_time=start + timedelta(minutes=15 * number + 10),
+            )
+            for number in range(rows)
+        )
+        Flight.crew.through.objects.bulk_create(
+            Flight.crew.through(flight=flight, crew=member) for flight in flights for member in crew
+        )
+        return flights
+
+    def add_tickets(self, rows, flight=None, order=None):
+        flight = flight or self.add_flights(1)[0]
+        order = order or Order.objects.create(user=self.customer)
+        return Ticket.objects.bulk_create(
+            Ticket(order=order, flight=flight, row=number // 10 + 1, seat=number % 10 + 1)
+            for number in range(rows)
+        )
+
+    def test_country(self):
+        Country.objects.create(name="country")
+
+        def prepare(rows):
+            Country.objects.bulk_create(Country(name=self.name("country")) for _ in range(rows))
+            return lambda: self.client.get(reverse(f"airport:{COUNTRY}-list"))
+
+        self.assert_constant_queries(prepare)
+
+    def test_city_list(self):
+        def prepare(rows):
+            for _ in range(rows):
+                create_and_return_city(self.name("city"), self.name("country"))
+            return lambda: self.client.get(reverse(f"airport:{CITY}-list"))
+
+        self.assert_constant_queries(prepare)
+
+    def test_airplane_type_retrieve(self):
+        def prepare(rows):
+            self.airplane_type = create_and_return_airplane_type(self.name("airplane_type"))
+            self.add_airplanes(rows)
+            url = reverse(f"airport:{AIRPLANE_TYPE}-detail", kwargs={"pk": self.airplane_type.pk})
+            return lambda: self.client.get(url)
+
+        self.assert_constant_queries(prepare)
+
+    def test_airplane_list(self):
+        def prepare(rows):
+            self.airplane_type = create_and_return_airplane_type(self.name("airplane_type"))
+            self.add_airplanes(rows)
+            return lambda: self.client.get(reverse(f"airport:{AIRPLANE}-list"))
+
+        self.assert_constant_queries(prepare)
+
+    def test_airplane_retrieve(self):
+        def prepare(rows):
+            self.add_flights(rows)
+            url = reverse(f"airport:{AIRPLANE}-detail", kwargs={"pk": self.airplane.pk})
+            return lambda: self.client.get(url)
+
+        self.assert_constant_queries(prepare)
+
+    def test_airplane_utilization(self):
+        def prepare(rows):
+            self.airplane = self.add_airplanes(1)[0]
+            self.add_flights(rows)
+            url = reverse(f"airport:{AIRPLANE}-utilization")
+            return lambda: self.client.get(url, {"start": "2030-01-01", "end": "2030-01-31"})
+
+        self.assert_constant_queries(prepare)
+
+    def test_airport_list(self):
+        def prepare(rows):
+            self.add_airports(rows)
+            return lambda: self.client.get(reverse(f"airport:{AIRPORT}-list"))
+
+        self.assert_constant_queries(prepare)
+
+    def test_airport_retrieve(self):
+        def prepare(rows):
+            airport, *others = self.add_airports(rows + 1)
+            Route.objects.bulk_create(
+                Route(source=source, destination=destination, distance=100)
+                for other in others
+                for source, destination in ((airport, other), (other, airport))
+            )
+            url = reverse(f"airport:{AIRPORT}-detail", kwargs={"pk": airport.pk})
+            return lambda: self.client.get(url)
+
+        self.assert_constant_queries(prepare)
+
+    def test_route_list(self):
+        def prepare(rows):
+            source, *destinations = self.add_airports(rows + 1)
+            Route.objects.bulk_create(
+                Route(source=source, destination=destination, distance=100) for destination in destinations
+            )
+            return lambda: self.client.get(reverse(f"airport:{ROUTE}-list"))
+
+        self.assert_constant_queries(prepare)
+
+    def test_route_retrieve(self):
+        def prepare(rows):
+            self.add_flights(rows)
+            url = reverse(f"airport:{ROUTE}-detail", kwargs={"pk": self.route.pk})
+            return lambda: self.client.get(url)
+
+        self.assert_constant_queries(prepare)
+
+    def test_crew_list(self):
+        def prepare(rows):
+            self.add_crew(rows)
+            return lambda: self.client.get(reverse(f"airport:{CREW}-list"))
+
+        self.assert_constant_queries(prepare)
+
+    def test_crew_retrieve(self):
+        def prepare(rows):
+            crew = self.add_crew(1)
+            self.add_flights(rows, crew=crew)
+            url = reverse(f"airport:{CREW}-detail", kwargs={"pk": crew[0].pk})
+            return lambda: self.client.get(url)
+
+        self.assert_constant_queries(prepare)
+
+    def test_crew_roster(self):
+        def prepare(rows):
+            self.add_flights(rows, crew=self.add_crew(2))
+            url = reverse(f"airport:{CREW}-roster")
+            return lambda: self.client.get(url, {"start": "2030-01-01", "end": "2030-01-31"})
+
+        self.assert_constant_queries(prepare)
+
+    def test_flight_list(self):
+        def prepare(rows):
+            self.add_flights(rows, crew=self.add_crew(2))
+            url = reverse(f"airport:{FLIGHT}-list")
+            return lambda: self.client.get(url, {"expand": "crew,airplane"})
+
+        self.assert_constant_queries(prepare)
+
+    def test_flight_retrieve(self):
+        def prepare(rows):
+            flight = self.add_flights(1, crew=self.add_crew(rows))[0]
+            url = reverse(f"airport:{FLIGHT}-detail", kwargs={"pk": flight.pk})
+            return lambda: self.client.get(url)
+
+        self.assert_constant_queries(prepare)
+
+    def test_flight_tickets(self):
+        def prepare(rows):
+            flight = self.add_tickets(rows)[0].flight
+            url = reverse(f"airport:{FLIGHT}-tickets", kwargs={"pk": flight.pk})
+            return lambda: self.client.get(url)
+
+        self.assert_constant_queries(prepare)
+
+    def test_flight_seat_map(self):
+        def prepare(rows):
+            flight = self.add_tickets(rows)[0].flight
+            url = reverse(f"airport:{FLIGHT}-seat-map", kwargs={"pk": flight.pk})
+            return lambda: self.client.get(url)
+
+        self.assert_constant_queries(prepare)
+
+    def test_flight_connections(self):
+        def prepare(rows):
+            departure_date = date(2030, 2, 1) + timedelta(days=rows)
+            self.next_departure = timezone.make_aware(datetime.combine(departure_date, time.min))
+            self.add_flights(rows)
+            url = reverse(f"airport:{FLIGHT}-connections")
+            return lambda: self.client.get(url, {
+                "source": self.route.source_id,
+                "destination": self.route.destination_id,
+                "departure_date": departure_date,
+            })
+
+        self.assert_constant_queries(prepare)
+
+    def test_flight_create(self):
+        def prepare(rows):
+            departure_time = self.next_departure
+            self.next_departure += timedelta(hours=1)
+            data = {
+                "route": self.route.pk,
+                "airplane": self.airplane.pk,
+                "crew": [member.pk for member in self.add_crew(rows)],
+                "departure_time": departure_time.isoformat(),
+                "arrival_time": (departure_time + timedelta(minutes=30)).isoformat(),
+            }
+            return lambda: self.client.post(reverse(f"airport:{FLIGHT}-list"), data, format="json")
+
+        self.assert_constant_queries(prepare)
+
+    def test_flight_create_invalid_crew(self):
+        crew = self.add_crew(1)[0]
+        url = reverse(f"airport:{FLIGHT}-list")
+        for value, error in (
+            ([crew.pk, "x"], "Incorrect type. Expected pk value, received str."),
+            ([crew.pk, crew.pk + 1], f'Invalid pk "{crew.pk + 1}" - object does not exist.'),
+            ([], "This list may not be empty."),
+            (crew.pk, 'Expected a list of items but got type "int".'),
+        ):
+            with self.subTest(value=value):
+                response = self.client.post(url, {"crew": value}, format="json")
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data["crew"], [error])
+
+    # The serializer and the crew m2m_changed receiver both check overlaps.
+    @override_settings(NPLUSONE_MAX_REPEATS=2)
+    def test_flight_update_crew(self):
+        def prepare(rows):
+            flight = self.add_flights(1, crew=self.add_crew(1))[0]
+            data = {"crew": [member.pk for member in self.add_crew(rows)]}
+            url = reverse(f"airport:{FLIGHT}-detail", kwargs={"pk": flight.pk})
+            return lambda: self.client.patch(url, data, format="json")
+
+        self.assert_constant_queries(prepare)
+
+    def test_flight_destroy(self):
+        def prepare(rows):
+            flight = self.add_tickets(rows)[0].flight
+            url = reverse(f"airport:{FLIGHT}-detail", kwargs={"pk": flight.pk})
+            return lambda: self.client.delete(url)
+
+        self.assert_constant_queries(prepare)
+
+    def test_flight_schedule(self):
+        def prepare(rows):
+            schedule = FlightSchedule.objects.create(
+                route=self.route,
+                airplane=self.airplane,
+                days_of_week=1,
+                departure_time=time(8),
+                duration=timedelta(hours=2),
+                valid_from=date(2031, 1, 1),
+            )
+            schedule.crew.set(self.add_crew(rows))
+            url = reverse(f"airport:{FLIGHT_SCHEDULE}-detail", kwargs={"pk": schedule.pk})
+            return lambda: self.client.get(url)
+
+        self.assert_constant_queries(prepare)
+
+    def test_flight_schedule_create(self):
+        def prepare(rows):
+            data = {
+                "route": self.route.pk,
+                "airplane": self.airplane.pk,
+                "crew": [member.pk for member in self.add_crew(rows)],
+                "days_of_week": 1,
+                "departure_time": "08:00",
+                "duration": "02:00:00",
+                "valid_from": "2031-01-01",
+            }
+            return lambda: self.client.post(reverse(f"airport:{FLIGHT_SCHEDULE}-list"), data, format="json")
+
+        self.assert_constant_queries(prepare)
+
+    def test_ticket_list(self):
+        def prepare(rows):
+            self.add_tickets(rows)
+            return lambda: self.client.get(reverse(f"airport:{TICKET}-list"), {"expand": "flight"})
+
+        self.assert_constant_queries(prepare)
+
+    def test_ticket_retrieve(self):
+        def prepare(rows):
+            ticket = self.add_tickets(rows)[0]
+            url = reverse(f"airport:{TICKET}-detail", kwargs={"pk": ticket.pk})
+            return lambda: self.client.get(url)
+
+        self.assert_constant_queries(prepare)
+
+    def test_ticket_export(self):
+        def prepare(rows):
+            self.add_tickets(rows)
+            return lambda: self.client.get(reverse(f"airport:{TICKET}-export"))
+
+        self.assert_constant_queries(prepare)
+
+    def test_order_export(self):
+        def prepare(rows):
+            self.add_tickets(rows)
+            return lambda: self.client.get(reverse(f"airport:{ORDER}-export"))
+
+        self.assert_constant_queries(prepare)
+
+    def test_order_list(self):
+        self.client.force_authenticate(self.customer)
+
+        def prepare(rows):
+            for _ in range(rows):
+                self.add_tickets(1)
+            return lambda: self.client.get(reverse(f"airport:{ORDER}-list"))
+
+        self.assert_constant_queries(prepare)
+
+    def test_order_retrieve(self):
+        self.client.force_authenticate(self.customer)
+
+        def prepare(rows):
+            order = Order.objects.create(user=self.customer)
+            for _ in range(rows):
+                self.add_tickets(1, order=order)
+            url = reverse(f"airport:{ORDER}-detail", kwargs={"pk": order.pk})
+            return lambda: self.client.get(url)
+
+        self.assert_constant_queries(prepare)
+
+    def test_order_create(self):
+        self.client.force_authenticate(self.customer)
+
+        def prepare(rows):
+            flight = self.add_flights(1)[0]
+            data = {"tickets": [
+                {"flight": flight.pk, "row": number // 10 + 1, "seat": number % 10 + 1}
+                for number in range(rows)
+            ]}
+            return lambda: self.client.post(reverse(f"airport:{ORDER}-list"), data, format="json")
+
+        self.assert_constant_queries(prepare)
+
+    def test_order_destroy(self):
+        def prepare(rows):
+            order = self.add_tickets(rows)[0].order
+            url = reverse(f"airport:{ORDER}-detail", kwargs={"pk": order.pk})
+            return lambda: self.client.delete(url)
+
+        self.assert_constant_queries(prepare)
+
+
+class TestNPlusOneDetector(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(create_and_return_user())
+        self.airports = [
+            create_and_return_airport(f"airport_{number}", f"city_{number}", f"country_{number}")
+            for number in range(3)
+        ]
+
+    def test_query_shape(self):
+        self.assertEqual(
+            query_shape("SELECT * FROM t WHERE a = 'x' AND b IN (%s, %s, %s) LIMIT 21"),
+            "SELECT * FROM t WHERE a = ? AND b IN (...) LIMIT ?",
+        )
+        self.assertEqual(
+            query_shape('SELECT "t"."id" FROM "t" WHERE "t"."id" IN (%s)'),
+            query_shape('SELECT "t"."id" FROM "t" WHERE "t"."id" IN (%s, %s)'),
+        )
+
+    def test_detector(self):
+        detector = RepeatedQueryDetector()
+        with connection.execute_wrapper(detector):
+            list(Airport.objects.filter(pk__in=[airport.pk for airport in self.airports]))
+            for airport in self.airports:
+                Airport.objects.get(pk=airport.pk)
+        self.assertEqual([count for _, count, _ in detector.repeated(1)], [3])
+        self.assertIn("airport/tests.py", detector.repeated(1)[0][2])
+        detector.check(3)
+        with self.assertRaisesMessage(RepeatedQueriesError, "3x from airport/tests.py"):
+            detector.check(2)
+
+    def test_middleware(self):
+        url = reverse(f"airport:{ROUTE}-list")
+        source, first, second = (airport.pk for airport in self.airports)
+        # Each primary key field loads its own airport.
+        with override_settings(NPLUSONE_MAX_REPEATS=1), self.assertRaises(RepeatedQueriesError):
+            self.client.post(url, {"source": source, "destination": first, "distance": 100})
+        with override_settings(NPLUSONE_MAX_REPEATS=2):
+            response = self.client.post(url, {"source": source, "destination": second, "distance": 100})
+        self.assertEqual(response.status_code, 201)
+
+
+class TestSparseFieldsets(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_and_return_user()
+        self.client.force_authenticate(self.user)
+        self.flight = create_and_return_flight(
+            ["first_name", "last_name"],
+            [
+                ["source_airport_name", "source_city_name", "source_country_name"],
+                ["destination_airport_name", "destination_city_name", "destination_country_name"]
+            ],
+            ["airplane_name", "airplane_type_name"]
+        )
+        self.url = reverse(f"airport:{FLIGHT}-list")
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, [query["sql"] for query in queries.captured_queries if "MAX(" not in query["sql"]]
+
+    def test_fields(self):
+        response, queries = self.get(f"{self.url}?fields=departure_time,route.source")
+        self.assertEqual(
+            response.data["results"],
+            [{"departure_time": "2021-01-01T00:00:00Z", "route": {"source": "source_airport_name"}}],
+        )
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("arrival_time", queries[0])
+        self.assertNotIn("airport_airplane", queries[0])
+
+    def test_expand(self):
+        response, queries = self.get(f"{self.url}?expand=crew,airplane&fields=route.source")
+        flight = response.data["results"][0]
+        self.assertEqual(list(flight), ["route", "crew", "airplane"])
+        self.assertEqual(flight["crew"][0]["first_name"], "first_name")
+        self.assertEqual(flight["airplane"]["capacity"], 8)
+
+        Flight.objects.create(
+            route=self.flight.route,
+            airplane=self.flight.airplane,
+            departure_time="2030-01-01T00:00:00Z",
+            arrival_time="2030-01-01T02:00:00Z",
+        ).crew.set(self.flight.crew.all())
+        response, more_queries = self.get(f"{self.url}?expand=crew,airplane&fields=route.source")
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertEqual(len(more_queries), len(queries))
+
+    def test_expand_changes_etag_on_crew_update(self):
+        url = f"{self.url}?expand=crew"
+        etag = self.client.get(url)["ETag"]
+        Crew.objects.update(first_name="renamed", updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertNotEqual(self.client.get(url)["ETag"], etag)
+
+    def test_nested_fields_on_expanded_relation(self):
+        Ticket.objects.create(flight=self.flight, row=1, seat=1, order=create_and_return_order(self.user))
+        response, queries = self.get(f"{reverse(f'airport:{TICKET}-list')}?expand=flight&fields=id,flight.url")
+        self.assertEqual(
+            response.data["results"][0]["flight"],
+            {"url": f"http://testserver/flight/{self.flight.pk}/"},
+        )
+        self.assertNotIn("airport_route", queries[0])
+
+    def test_detail_fields_skip_prefetch(self):
+        url = reverse(f"airport:{AIRPORT}-detail", kwargs={"pk": self.flight.route.source_id})
+        response, queries = self.get(f"{url}?fields=name")
+        self.assertEqual(response.data, {"name": "source_airport_name"})
+        self.assertEqual(len(queries), 1)
+
+    def test_invalid(self):
+        for query in ("fields=nope", "fields=departure_time.x", "expand=route"):
+            response = self.client.get(f"{self.url}?{query}")
+            self.assertEqual(response.status_code, 400)
+
+    def test_ignored_on_write(self):
+        response = self.client.post(
+            reverse(f"airport:{COUNTRY}-list") + "?fields=id", {"name": "test"}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["name"], "test")
+
+
+class TestCrewSchedule(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(create_and_return_user())
+        self.route = create_and_return_route(
+            ["source_airport_name", "source_city_name", "source_country_name"],
+            ["destination_airport_name", "destination_city_name", "destination_country_name"]
+        )
+        self.airplane = create_and_return_airplane("airplane_name", "airplane_type_name")
+        self.crew = create_and_return_crew("first_name", "last_name")
+        self.other_crew = create_and_return_crew("other_first_name", "other_last_name")
+        self.flight = self.create_flight("08:00", "10:00", self.crew)
+        self.url = reverse(f"airport:{FLIGHT}-list")
+
+    def create_flight(self, departure, arrival, *crew):
+        flight = Flight.objects.create(
+            route=self.route,
+            airplane=Airplane.objects.create(
+                airplane_type=self.airplane.airplane_type,
+                name=f"airplane_{departure}",
+                rows=2,
+                seats_per_row=4,
+            ),
+            departure_time=f"2030-01-01T{departure}:00Z",
+            arrival_time=f"2030-01-01T{arrival}:00Z",
+        )
+        flight.crew.add(*crew)
+        return flight
+
+    def post_flight(self, departure, arrival, *crew):
+        return self.client.post(self.url, {
+            "route": self.route.pk,
+            "airplane": self.airplane.pk,
+            "departure_time": f"2030-01-01T{departure}:00Z",
+            "arrival_time": f"2030-01-01T{arrival}:00Z",
+            "crew": [member.pk for member in crew],
+        })
+
+    def test_overlapping_flight_rejected(self):
+        response = self.post_flight("09:00", "11:00", self.other_crew, self.crew)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["crew"], [
+            f"Crew member {self.crew.pk} is already assigned to overlapping flight {self.flight.pk}"
+        ])
+        self.assertEqual(Flight.objects.count(), 1)
+
+    def test_touching_flights_allowed(self):
+        response = self.post_flight("10:00", "12:00", self.crew)
+        self.assertEqual(response.status_code, 201)
+
+    def test_moving_flight_onto_crew_schedule_rejected(self):
+        flight = self.create_flight("12:00", "14:00", self.crew)
+        url = reverse(f"airport:{FLIGHT}-detail", kwargs={"pk": flight.pk})
+        response = self.client.patch(url, {"departure_time": "2030-01-01T09:30:00Z"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("crew", response.data)
+        response = self.client.patch(url, {"departure_time": "2030-01-01T11:00:00Z"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_arrival_before_departure_rejected(self):
+        response = self.post_flight("10:00", "09:00", self.other_crew)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("arrival_time", response.data)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.create_flight("10:00", "09:00")
+
+    def test_assignment_checked_in_both_directions(self):
+        flight = self.create_flight("09:00", "11:00")
+        with self.assertRaises(serializers.ValidationError), transaction.atomic():
+            flight.crew.add(self.crew)
+        with self.assertRaises(serializers.ValidationError), transaction.atomic():
+            self.crew.flights.add(flight)
+        self.other_crew.flights.add(self.flight, self.create_flight("10:00", "12:00"))
+        self.assertEqual(self.other_crew.flights.count(), 2)
+
+    def test_roster(self):
+        self.create_flight("12:00", "14:00", self.crew, self.other_crew)
+        self.create_flight("23:00", "23:59", self.other_crew)
+        Flight.objects.filter(arrival_time__hour=23).update(
+            departure_time="2030-01-03T08:00:00Z", arrival_time="2030-01-03T10:00:00Z"
+        )
+        url = reverse(f"airport:{CREW}-roster")
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"start": "2030-01-01", "end": "2030-01-02"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(member["id"], len(member["flights"])) for member in response.data],
+            [(self.crew.pk, 2), (self.other_crew.pk, 1)],
+        )
+        self.assertEqual(response.data[0]["flights"][0]["id"], self.flight.pk)
+        self.assertEqual(response.data[0]["flights"][0]["source"], "source_airport_name")
+
+        response = self.client.get(
+            url, {"start": "2030-01-01", "end": "2030-01-03", "crew": str(self.other_crew.pk)}
+        )
+        self.assertEqual([member["id"] for member in response.data], [self.other_crew.pk])
+        self.assertEqual(len(response.data[0]["flights"]), 2)
+
+    def test_roster_invalid_window(self):
+        url = reverse(f"airport:{CREW}-roster")
+        response = self.client.get(url, {"start": "2030-01-02", "end": "2030-01-01"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(url, {"start": "2030-01-01", "end": "2030-03-01"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(url, {"start": "2030-01-01", "end": "2030-01-01", "crew": "a"})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestFleetUtilization(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(create_and_return_user())
+        self.route = create_and_return_route(
+            ["source_airport_name", "source_city_name", "source_country_name"],
+            ["destination_airport_name", "destination_city_name", "destination_country_name"]
+        )
+        self.airplane = create_and_return_airplane("airplane_name", "airplane_type_name")
+        self.idle_airplane = Airplane.objects.create(
+            airplane_type=self.airplane.airplane_type, name="idle_airplane", rows=2, seats_per_row=4
+        )
+        for departure, arrival in (
+            ("2030-01-01T08:00", "2030-01-01T10:00"),
+            ("2030-01-01T12:00", "2030-01-01T15:00"),
+            ("2030-01-02T09:00", "2030-01-02T10:00"),
+            ("2030-01-05T09:00", "2030-01-05T10:00"),
+        ):
+            Flight.objects.create(
+                route=self.route,
+                airplane=self.airplane,
+                departure_time=f"{departure}:00Z",
+                arrival_time=f"{arrival}:00Z",
+            )
+        self.url = reverse(f"airport:{FLIGHT}-list")
+
+    def post_flight(self, departure, arrival):
+        return self.client.post(self.url, {
+            "route": self.route.pk,
+            "airplane": self.airplane.pk,
+            "departure_time": f"2030-01-01T{departure}:00Z",
+            "arrival_time": f"2030-01-01T{arrival}:00Z",
+            "crew": [create_and_return_crew("first_name", "last_name").pk],
+        })
+
+    def test_overlapping_flight_rejected(self):
+        response = self.post_flight("09:00", "11:00")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("airplane", response.data)
+        response = self.post_flight("10:00", "12:00")
+        self.assertEqual(response.status_code, 201)
+
+    def test_moving_flight_onto_airplane_schedule_rejected(self):
+        flight = Flight.objects.get(departure_time__day=2)
+        url = reverse(f"airport:{FLIGHT}-detail", kwargs={"pk": flight.pk})
+        response = self.client.patch(url, {
+            "departure_time": "2030-01-01T14:00:00Z", "arrival_time": "2030-01-01T16:00:00Z"
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("airplane", response.data)
+        response = self.client.patch(url, {"airplane": self.idle_airplane.pk})
+        self.assertEqual(response.status_code, 200)
+
+    def test_utilization(self):
+        url = reverse(f"airport:{AIRPLANE}-utilization")
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"start": "2030-01-01", "end": "2030-01-02"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [
+            {
+                "id": self.airplane.pk,
+                "name": "airplane_name",
+                "flights": 3,
+                "block_hours": 6.0,
+                "idle_hours": 20.0,
+                "average_gap_hours": 10.0,
+                "flights_per_day": 1.5,
+                "utilization": 0.125,
+            },
+            {
+                "id": self.idle_airplane.pk,
+                "name": "idle_airplane",
+                "flights": 0,
+                "block_hours": 0.0,
+                "idle_hours": 0.0,
+                "average_gap_hours": None,
+                "flights_per_day": 0.0,
+                "utilization": 0.0,
+            },
+        ])
+
+        response = self.client.get(
+            url, {"start": "2030-01-01", "end": "2030-01-10", "airplane": str(self.airplane.pk)}
+        )
+        self.assertEqual([row["flights"] for row in response.data], [4])
+
+    def test_utilization_admin_only(self):
+        self.client.force_authenticate(
+            create_and_return_user(username="user", email="user@example.com", is_staff=False)
+        )
+        url = reverse(f"airport:{AIRPLANE}-utilization")
+        response = self.client.get(url, {"start": "2030-01-01", "end": "2030-01-02"})
+        self.assertEqual(response.status_code, 403)
+
+
+class TestValuesFastPath(APITestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(3):
+            flight = create_and_return_flight(
+                [f"first_name_{i}", f"last_name_{i}"],
+                [
+                    [f"source_airport_{i}", f"source_city_{i}", f"source_country_{i}"],
+                    [f"destination_airport_{i}", f"destination_city_{i}", f"destination_country_{i}"]
+                ],
+                [f"airplane_{i}", f"airplane_type_{i}"]
+            )
+            Flight.objects.filter(pk=flight.pk).update(
+                departure_time=timezone.datetime(2030, 1, 1, 8, i, 30, 250, tzinfo=timezone.get_fixed_timezone(0)),
+                arrival_time=timezone.datetime(2030, 1, 1, 10, i, tzinfo=timezone.get_fixed_timezone(0)),
+            )
+        Airport.objects.create(name="no_city_airport")
+
+    def assert_identical(self, viewset, url):
+        values_response = self.client.get(url)
+        cache.clear()
+        with mock.patch.object(viewset, "values_actions", ()):
+            model_response = self.client.get(url)
+        cache.clear()
+        self.assertEqual(values_response.status_code, 200)
+        self.assertEqual(values_response.content, model_response.content)
+        self.assertEqual(values_response["ETag"], model_response["ETag"])
+        return values_response
+
+    def test_flight_list(self):
+        url = reverse(f"airport:{FLIGHT}-list")
+        response = self.assert_identical(FlightViewSet, f"{url}?page_size=2")
+        self.assertEqual(len(response.data["results"]), 2)
+        response = self.assert_identical(FlightViewSet, response.data["next"])
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_route_list(self):
+        self.assert_identical(RouteViewSet, reverse(f"airport:{ROUTE}-list"))
+
+    def test_airport_list(self):
+        response = self.assert_identical(AirportViewSet, reverse(f"airport:{AIRPORT}-list"))
+        self.assertIn(None, [airport["closest_big_city"] for airport in response.data])
+
+    def test_flight_list_single_query(self):
+        url = reverse(f"airport:{FLIGHT}-list")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        flight_queries = [
+            query for query in queries.captured_queries
+            if query["sql"].startswith("SELECT") and "MAX(" not in query["sql"]
+        ]
+        self.assertEqual(len(flight_queries), 1)
+
+    def test_unsupported_serializer(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ValuesPlan(CrewDetailSerializer())
+
+
+class TestFlightSeatMap(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.flight = create_and_return_flight(
+            ["first_name", "last_name"],
+            [
+                ["source_airport_name", "source_city_name", "source_country_name"],
+                ["destination_airport_name", "destination_city_name", "destination_country_name"]
+            ],
+            ["airplane_name", "airplane_type_name"]
+        )
+        self.url = reverse(f"airport:{FLIGHT}-seat-map", kwargs={"pk": self.flight.pk})
+
+    def test_seat_map(self):
+        Ticket.objects.create(flight=self.flight, row=1, seat=1, order=Order.objects.create())
+        Ticket.objects.create(flight=self.flight, row=2, seat=4, order=Order.objects.create())
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["rows"], 2)
+        self.assertEqual(response.data["seats_per_row"], 4)
+        self.assertEqual(b64decode(response.data["occupied"]), bytes([0b10000001]))
+
+    def test_seat_map_is_cached(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_seat_map_invalidated_on_ticket_change(self):
+        self.client.get(self.url)
+        ticket = Ticket.objects.create(
+            flight=self.flight, row=1, seat=2, order=Order.objects.create()
+        )
+        self.assertEqual(b64decode(self.client.get(self.url).data["occupied"]), bytes([0b01000000]))
+        ticket.delete()
+        self.assertEqual(b64decode(self.client.get(self.url).data["occupied"]), bytes([0]))
+
+    def test_seat_map_not_found(self):
+        url = reverse(f"airport:{FLIGHT}-seat-map", kwargs={"pk": self.flight.pk + 1})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+
 class TestOrder(APITestCase):
     def test_list(self):
         url = reverse(f"airport:{ORDER}-list")
@@ -755,7 +2807,7 @@ class TestOrderUserAuth(APITestCase):
         url = reverse(f"airport:{ORDER}-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data["results"]), 3)
 
     def test_list_other_user(self):
         other_user = create_and_return_user(
@@ -767,7 +2819,7 @@ class TestOrderUserAuth(APITestCase):
         url = reverse(f"airport:{ORDER}-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(response.data["results"]), 0)
 
     def test_detail(self):
         order = create_and_return_order(self.user)
@@ -804,6 +2856,106 @@ class TestOrderUserAuth(APITestCase):
         self.assertEqual(response.status_code, 403)
 
 
+class TestOrderWithTickets(APITestCase):
+    def setUp(self):
+        self.user = create_and_return_user(is_staff=False)
+        self.client.force_authenticate(self.user)
+        self.flight = create_and_return_flight(
+            ["first_name", "last_name"],
+            [
+                ["source_airport_name", "source_city_name", "source_country_name"],
+                ["destination_airport_name", "destination_city_name", "destination_country_name"]
+            ],
+            ["airplane_name", "airplane_type_name"]
+        )
+        self.url = reverse(f"airport:{ORDER}-list")
+
+    def get_data(self, seats):
+        return {
+            "tickets": [
+                {"flight": self.flight.pk, "row": row, "seat": seat}
+                for row, seat in seats
+            ]
+        }
+
+    def test_create(self):
+        response = self.client.post(self.url, self.get_data([(1, 1), (1, 2)]), format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data["tickets"]), 2)
+        order = Order.objects.get(pk=response.data["id"])
+        self.assertEqual(order.user, self.user)
+        self.assertEqual(order.tickets.count(), 2)
+
+    def test_query_count_does_not_grow_with_tickets(self):
+        with CaptureQueriesContext(connection) as single:
+            self.client.post(self.url, self.get_data([(1, 1)]), format="json")
+        with CaptureQueriesContext(connection) as group:
+            self.client.post(self.url, self.get_data([(2, 1), (2, 2), (2, 3), (2, 4)]), format="json")
+        self.assertEqual(len(single), len(group))
+        self.assertEqual(Ticket.objects.count(), 5)
+
+    def test_invalid_seat(self):
+        response = self.client.post(self.url, self.get_data([(1, 1), (3, 5)]), format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["tickets"][0], {})
+        self.assertIn("row", response.data["tickets"][1])
+        self.assertIn("seat", response.data["tickets"][1])
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_taken_seat(self):
+        Ticket.objects.create(flight=self.flight, row=1, seat=1, order=Order.objects.create())
+        response = self.client.post(self.url, self.get_data([(1, 1)]), format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_duplicate_seat(self):
+        response = self.client.post(self.url, self.get_data([(1, 1), (1, 1)]), format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Ticket.objects.count(), 0)
+
+
+class TestTicketSeatConstraints(APITestCase):
+    def setUp(self):
+        self.flight = create_and_return_flight(
+            ["first_name", "last_name"],
+            [
+                ["source_airport_name", "source_city_name", "source_country_name"],
+                ["destination_airport_name", "destination_city_name", "destination_country_name"]
+            ],
+            ["airplane_name", "airplane_type_name"]
+        )
+
+    def test_seat_is_unique_per_flight(self):
+        Ticket.objects.bulk_create([
+            Ticket(flight=self.flight, row=1, seat=1, order=Order.objects.create())
+        ])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Ticket.objects.bulk_create([
+                Ticket(flight=self.flight, row=1, seat=1, order=Order.objects.create())
+            ])
+
+    def test_seat_is_positive(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Ticket.objects.bulk_create([
+                Ticket(flight=self.flight, row=0, seat=1, order=Order.objects.create())
+            ])
+
+    def test_same_seat_in_other_order(self):
+        user = create_and_return_user()
+        self.client.force_authenticate(user)
+        Ticket.objects.create(
+            flight=self.flight, row=1, seat=1, order=create_and_return_order(user)
+        )
+        data = {
+            "order": create_and_return_order(user).pk,
+            "flight": self.flight.pk,
+            "row": 1,
+            "seat": 1
+        }
+        response = self.client.post(reverse(f"airport:{TICKET}-list"), data)
+        self.assertEqual(response.status_code, 400)
+
+
 class TestOrderStaffAuth(APITestCase):
     def setUp(self):
         self.user = create_and_return_user()
@@ -821,7 +2973,7 @@ class TestOrderStaffAuth(APITestCase):
         url = reverse(f"airport:{ORDER}-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data["results"]), 3)
 
     def test_detail(self):
         order = create_and_return_order(self.user)
@@ -925,7 +3077,7 @@ class TestTicketStaffAuth(APITestCase):
         url = reverse(f"airport:{TICKET}-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_detail(self):
         url = reverse(f"airport:{TICKET}-detail", kwargs={"pk": self.ticket.pk})
@@ -966,6 +3118,119 @@ class TestTicketStaffAuth(APITestCase):
         self.assertEqual(response.status_code, 200)
 
 
+class TestTicketExport(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(create_and_return_user())
+        user = create_and_return_user(
+            username="other_user",
+            email="other_user@example.com",
+            is_staff=False
+        )
+        self.ticket = create_and_return_ticket(
+            user=user,
+            flight=[
+                ["first_name", "last_name"],
+                [
+                    ["source_airport_name", "source_city_name", "source_country_name"],
+                    ["destination_airport_name", "destination_city_name", "destination_country_name"],
+                ],
+                ["airplane_name", "airplane_type_name"]
+            ]
+        )
+        Ticket.objects.create(flight=self.ticket.flight, order=self.ticket.order, row=1, seat=2)
+        self.url = reverse(f"airport:{TICKET}-export")
+
+    def test_ndjson(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["seat"] for row in rows], [1, 2])
+        self.assertEqual(rows[0]["ticket_id"], self.ticket.pk)
+        self.assertEqual(rows[0]["user_email"], "other_user@example.com")
+        self.assertEqual(rows[0]["source"], "source_airport_name")
+        self.assertEqual(rows[0]["departure_time"], "2021-01-01T00:00:00Z")
+
+    def test_csv(self):
+        response = self.client.get(self.url, {"output": "csv"})
+        self.assertEqual(response["Content-Type"], "text/csv")
+        content = b"".join(response.streaming_content).decode()
+        header, *rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(header[:3], ["ticket_id", "row", "seat"])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][header.index("destination")], "destination_airport_name")
+
+    def test_invalid_output(self):
+        response = self.client.get(self.url, {"output": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(self.ticket.order.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+
+class TestOrderExport(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(create_and_return_user())
+        user = create_and_return_user(
+            username="other_user",
+            email="other_user@example.com",
+            is_staff=False
+        )
+        self.ticket = create_and_return_ticket(
+            user=user,
+            flight=[
+                ["first_name", "last_name"],
+                [
+                    ["source_airport_name", "source_city_name", "source_country_name"],
+                    ["destination_airport_name", "destination_city_name", "destination_country_name"],
+                ],
+                ["airplane_name", "airplane_type_name"]
+            ]
+        )
+        Ticket.objects.create(flight=self.ticket.flight, order=self.ticket.order, row=1, seat=2)
+        self.empty_order = Order.objects.create(user=user)
+        self.url = reverse(f"airport:{ORDER}-export")
+
+    def test_ndjson(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(
+            [(row["order_id"], row["seat"]) for row in rows],
+            [(self.ticket.order_id, 1), (self.ticket.order_id, 2), (self.empty_order.pk, None)],
+        )
+        self.assertEqual(rows[0]["ticket_id"], self.ticket.pk)
+        self.assertEqual(rows[0]["source"], "source_airport_name")
+        self.assertEqual(rows[2]["user_email"], "other_user@example.com")
+        self.assertIsNone(rows[2]["ticket_id"])
+        self.assertIsNone(rows[2]["departure_time"])
+
+    def test_csv(self):
+        response = self.client.get(self.url, {"output": "csv"})
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn('filename="orders.csv"', response["Content-Disposition"])
+        content = b"".join(response.streaming_content).decode()
+        header, *rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(header[:2], ["order_id", "order_created_at"])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[2][header.index("order_id")], str(self.empty_order.pk))
+        self.assertEqual(rows[2][header.index("ticket_id")], "")
+
+    def test_invalid_output(self):
+        response = self.client.get(self.url, {"output": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(self.ticket.order.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+
 class TestTicketUserAuth(APITestCase):
     def setUp(self):
         self.user = create_and_return_user(is_staff=False)
@@ -1002,7 +3267,7 @@ class TestTicketUserAuth(APITestCase):
         url = reverse(f"airport:{TICKET}-list")
         request = self.client.get(url)
         self.assertEqual(request.status_code, 200)
-        self.assertEqual(len(request.data), 1)
+        self.assertEqual(len(request.data["results"]), 1)
 
     def test_invalid_detail(self):
         url = reverse(f"airport:{TICKET}-detail", kwargs={"pk": self.other_ticket.pk})
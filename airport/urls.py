@@ -9,6 +9,7 @@ from airport.views import (
     RouteViewSet,
     CrewViewSet,
     FlightViewSet,
+    FlightScheduleViewSet,
     TicketViewSet,
     OrderViewSet,
 )
@@ -21,6 +22,7 @@ router.register("airport", AirportViewSet, basename="airport")
 router.register("route", RouteViewSet, basename="route")
 router.register("crew", CrewViewSet, basename="crew")
 router.register("flight", FlightViewSet, basename="flight")
+router.register("flight-schedule", FlightScheduleViewSet, basename="flight-schedule")
 router.register("order", OrderViewSet, basename="order")
 router.register("ticket", TicketViewSet, basename="ticket")
 
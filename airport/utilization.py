@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Max, Min, Q, Sum
+
+from airport.models import Airplane
+
+HOUR = timedelta(hours=1)
+
+
+def _hours(duration):
+    return round(duration / HOUR, 2)
+
+
+def fleet_utilization(start, end, airplane_ids=None):
+    """
+    Return the utilization of every airplane over the flights departing in
+    `[start, end)`, aggregated per airplane in one query: block hours, idle
+    hours between its first departure and last arrival, the average gap
+    between consecutive flights, flights per day and the share of the
+    window spent flying. Airplanes without flights are included.
+    """
+    in_window = Q(flights__departure_time__gte=start, flights__departure_time__lt=end)
+    block_time = ExpressionWrapper(
+        F("flights__arrival_time") - F("flights__departure_time"), output_field=DurationField()
+    )
+    airplanes = Airplane.objects.all()
+    if airplane_ids:
+        airplanes = airplanes.filter(pk__in=airplane_ids)
+    rows = airplanes.annotate(
+        flight_count=Count("flights", filter=in_window),
+        block_time=Sum(block_time, filter=in_window),
+        first_departure=Min("flights__departure_time", filter=in_window),
+        last_arrival=Max("flights__arrival_time", filter=in_window),
+    ).order_by("name", "pk").values_list(
+        "pk", "name", "flight_count", "block_time", "first_departure", "last_arrival"
+    )
+
+    window = end - start
+    days = window / timedelta(days=1)
+    report = []
+    for airplane_id, name, flights, block, first_departure, last_arrival in rows:
+        block = block or timedelta()
+        idle = (last_arrival - first_departure - block) if flights else timedelta()
+        report.append({
+            "id": airplane_id,
+            "name": name,
+            "flights": flights,
+            "block_hours": _hours(block),
+            "idle_hours": _hours(idle),
+            "average_gap_hours": _hours(idle / (flights - 1)) if flights > 1 else None,
+            "flights_per_day": round(flights / days, 2),
+            "utilization": round(block / window, 4),
+        })
+    return report
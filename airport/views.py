@@ -1,14 +1,22 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.mixins import (
     ListModelMixin,
     RetrieveModelMixin,
     CreateModelMixin,
     DestroyModelMixin
 )
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.views import Response
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from airport.models import (
     City,
@@ -20,8 +28,25 @@ from airport.models import (
     Airport,
     Order,
     Flight,
+    FlightSchedule,
     Ticket,
 )
+from airport.export import (
+    EXPORT_FORMATS,
+    ORDER_EXPORT_COLUMNS,
+    TICKET_EXPORT_COLUMNS,
+    order_export_rows,
+    ticket_export_rows,
+)
+from airport.pagination import (
+    FlightPagination,
+    OrderPagination,
+    TicketPagination,
+)
+from airport.rosters import crew_roster
+from airport.route_graph import route_graph
+from airport.seat_map import cache_seat_map, get_cached_seat_map
+from airport.utilization import fleet_utilization
 from airport.serializers import (
     CitySerializer,
     CityWithSlugSerializer,
@@ -38,30 +63,95 @@ from airport.serializers import (
     RouteWithSlugSerializer,
     CrewSerializer,
     CrewDetailSerializer,
+    CrewRosterSearchSerializer,
+    CrewRosterSerializer,
+    FleetUtilizationSearchSerializer,
+    FleetUtilizationSerializer,
     OrderAdminSerializer,
+    OrderAdminCreateSerializer,
     OrderUserSerializer,
+    OrderUserCreateSerializer,
     OrderDetailSerializer,
     FlightSerializer,
     FlightDetailSerializer,
     FlightListSerializer,
+    FlightSeatMapSerializer,
+    FlightScheduleSerializer,
+    ConnectionSearchSerializer,
+    ItinerarySerializer,
     TicketSerializer,
     TicketDetailSerializer,
     TicketUnableToBuySerializer,
 )
+from core.authentication import ClaimsJWTAuthentication
+from core.caching import CachedResponseMixin
+from core.conditional import ConditionalGetMixin
+from core.fieldsets import EXPAND_PARAM, SparseFieldsetMixin
+from core.planner import QueryPlanMixin
+from core.values import ValuesListMixin
 from core.permissions import IsAdminOrReadOnly, UserCantUpdateAndDeletePermission
 
 
-class CountryViewSet(ModelViewSet):
+def day_window(params):
+    """The `[start, end)` datetimes covering the validated `start`..`end` days."""
+    tz = timezone.get_current_timezone()
+    return (
+        datetime.combine(params["start"], time.min, tzinfo=tz),
+        datetime.combine(params["end"] + timedelta(days=1), time.min, tzinfo=tz),
+    )
+
+
+export_schema = extend_schema(
+    parameters=[
+        OpenApiParameter(
+            "output",
+            enum=tuple(EXPORT_FORMATS),
+            default="ndjson",
+            description="Export format (ex. ?output=csv)",
+        ),
+    ],
+    responses={200: OpenApiTypes.STR},
+)
+
+
+def export_response(request, columns, rows, name):
+    """Stream `rows` in the format of the `output` query parameter."""
+    output = request.query_params.get("output", "ndjson")
+    if output not in EXPORT_FORMATS:
+        raise ValidationError({"output": f"Expected one of: {', '.join(EXPORT_FORMATS)}"})
+
+    stream, content_type = EXPORT_FORMATS[output]
+    response = StreamingHttpResponse(stream(list(columns), rows), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{name}.{output}"'
+    return response
+
+
+class CountryViewSet(
+    CachedResponseMixin,
+    ConditionalGetMixin,
+    SparseFieldsetMixin,
+    QueryPlanMixin,
+    ModelViewSet
+):
     serializer_class = CountrySerializer
     queryset = Country.objects.all()
     permission_classes = (IsAdminOrReadOnly,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (ClaimsJWTAuthentication,)
+    cache_dependencies = (Country,)
 
 
-class CityViewSet(ModelViewSet):
-    queryset = City.objects.select_related("country")
+class CityViewSet(
+    CachedResponseMixin,
+    ConditionalGetMixin,
+    SparseFieldsetMixin,
+    QueryPlanMixin,
+    ModelViewSet
+):
+    queryset = City.objects.all()
     permission_classes = (IsAdminOrReadOnly,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (ClaimsJWTAuthentication,)
+    cache_dependencies = (City, Country)
+    conditional_relations = ("country",)
 
     def get_serializer_class(self):
         if self.action in ("retrieve", "list"):
@@ -69,26 +159,34 @@ class CityViewSet(ModelViewSet):
         return CitySerializer
 
 
-class AirplaneTypeViewSet(ModelViewSet):
+class AirplaneTypeViewSet(
+    CachedResponseMixin,
+    ConditionalGetMixin,
+    SparseFieldsetMixin,
+    QueryPlanMixin,
+    ModelViewSet
+):
+    queryset = AirplaneType.objects.all()
     permission_classes = (IsAdminOrReadOnly,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (ClaimsJWTAuthentication,)
+    cache_dependencies = (AirplaneType, Airplane)
 
     def get_serializer_class(self):
         if self.action == "retrieve":
             return AirplaneTypeDetailSerializer
         return AirplaneTypeSerializer
 
-    def get_queryset(self):
-        queryset = AirplaneType.objects.all()
+    def get_conditional_relations(self):
         if self.action == "retrieve":
-            return queryset.prefetch_related("airplanes")
-        return queryset
+            return ("airplanes",)
+        return ()
 
 
-class AirplaneViewSet(ModelViewSet):
-    queryset = Airplane.objects.select_related("airplane_type")
+class AirplaneViewSet(ConditionalGetMixin, SparseFieldsetMixin, QueryPlanMixin, ModelViewSet):
+    queryset = Airplane.objects.all()
     permission_classes = (IsAdminOrReadOnly,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (ClaimsJWTAuthentication,)
+    conditional_relations = ("airplane_type",)
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -97,11 +195,37 @@ class AirplaneViewSet(ModelViewSet):
             return AirplaneRetrieveSerializer
         return AirplaneSerializer
 
-
-class AirportViewSet(ModelViewSet):
-    queryset = Airport.objects.select_related("closest_big_city")
+    @extend_schema(
+        parameters=[FleetUtilizationSearchSerializer],
+        responses=FleetUtilizationSerializer(many=True),
+    )
+    @action(detail=False, methods=["get"], permission_classes=(IsAdminUser,))
+    def utilization(self, request):
+        """Block hours, idle time and flights per day of every airplane over a window of days."""
+        search = FleetUtilizationSearchSerializer(data=request.query_params)
+        search.is_valid(raise_exception=True)
+        params = search.validated_data
+        report = fleet_utilization(*day_window(params), airplane_ids=params.get("airplane"))
+        return Response(FleetUtilizationSerializer(report, many=True).data)
+
+
+class AirportViewSet(
+    CachedResponseMixin,
+    ConditionalGetMixin,
+    SparseFieldsetMixin,
+    ValuesListMixin,
+    QueryPlanMixin,
+    ModelViewSet
+):
+    queryset = Airport.objects.all()
     permission_classes = (IsAdminOrReadOnly,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (ClaimsJWTAuthentication,)
+    cache_dependencies = (Airport, City, Route)
+
+    def get_conditional_relations(self):
+        if self.action == "retrieve":
+            return ("sources", "sources__destination", "destinations", "destinations__source")
+        return ("closest_big_city",)
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -111,10 +235,19 @@ class AirportViewSet(ModelViewSet):
         return AirportSerializer
 
 
-class RouteViewSet(ModelViewSet):
-    queryset = Route.objects.select_related("source", "destination")
+class RouteViewSet(
+    CachedResponseMixin,
+    ConditionalGetMixin,
+    SparseFieldsetMixin,
+    ValuesListMixin,
+    QueryPlanMixin,
+    ModelViewSet
+):
+    queryset = Route.objects.all()
     permission_classes = (IsAdminOrReadOnly,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (ClaimsJWTAuthentication,)
+    cache_dependencies = (Route, Airport)
+    conditional_relations = ("source", "destination")
 
     def get_serializer_class(self):
         if self.action in ("retrieve", "list"):
@@ -122,59 +255,254 @@ class RouteViewSet(ModelViewSet):
         return RouteSerializer
 
 
-class CrewViewSet(ModelViewSet):
+class CrewViewSet(ConditionalGetMixin, SparseFieldsetMixin, QueryPlanMixin, ModelViewSet):
+    queryset = Crew.objects.all()
     permission_classes = (IsAdminOrReadOnly,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (ClaimsJWTAuthentication,)
 
     def get_serializer_class(self):
         if self.action == "retrieve":
             return CrewDetailSerializer
         return CrewSerializer
 
-    def get_queryset(self):
-        queryset = Crew.objects.all()
+    def get_conditional_relations(self):
         if self.action == "retrieve":
-            queryset = queryset.prefetch_related(
+            return (
+                "flights",
+                "flights__route",
                 "flights__route__source",
                 "flights__route__destination",
             )
-        return queryset
-
-
-class FlightViewSet(ModelViewSet):
+        return ()
+
+    @extend_schema(
+        parameters=[CrewRosterSearchSerializer],
+        responses=CrewRosterSerializer(many=True),
+    )
+    @action(detail=False, methods=["get"], permission_classes=(IsAdminUser,))
+    def roster(self, request):
+        """Every crew member's flights in a window of days, in departure order."""
+        search = CrewRosterSearchSerializer(data=request.query_params)
+        search.is_valid(raise_exception=True)
+        params = search.validated_data
+        roster = crew_roster(*day_window(params), crew_ids=params.get("crew"))
+        return Response(CrewRosterSerializer(roster, many=True).data)
+
+
+class FlightViewSet(
+    ConditionalGetMixin,
+    SparseFieldsetMixin,
+    ValuesListMixin,
+    QueryPlanMixin,
+    ModelViewSet
+):
     permission_classes = (IsAdminOrReadOnly,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (ClaimsJWTAuthentication,)
+    pagination_class = FlightPagination
 
     def get_serializer_class(self):
         if self.action == "list":
             return FlightListSerializer
         if self.action == "retrieve":
             return FlightDetailSerializer
+        if self.action == "seat_map":
+            return FlightSeatMapSerializer
+        if self.action == "connections":
+            return ItinerarySerializer
         return FlightSerializer
 
+    def get_conditional_relations(self):
+        relations = ("route", "route__source", "route__destination", "airplane")
+        if self.action == "retrieve" or "crew" in self.get_fieldset(EXPAND_PARAM):
+            return relations + ("crew",)
+        return relations
+
+    @staticmethod
+    def _params_to_ints(query_string, param):
+        try:
+            return [int(str_id) for str_id in query_string.split(",")]
+        except ValueError:
+            raise ValidationError({param: "Expected a comma-separated list of ids"})
+
+    @staticmethod
+    def _param_to_datetime(query_string, param):
+        date = parse_date(query_string) if query_string else None
+        if date is None:
+            raise ValidationError({param: "Expected a date in YYYY-MM-DD format"})
+        return datetime.combine(date, time.min, tzinfo=timezone.get_current_timezone())
+
+    def filter_flights(self, queryset):
+        """
+        Filter flights by route endpoints, free seats and departure window.
+
+        Airport, city and country filters all narrow `route` so the planner
+        can drive the search from the (route, departure_time) index, and the
+        date bounds are turned into a half-open datetime range to keep
+        `departure_time` sargable.
+        """
+        filters = {
+            "source": "route__source_id__in",
+            "destination": "route__destination_id__in",
+            "source_city": "route__source__closest_big_city_id__in",
+            "destination_city": "route__destination__closest_big_city_id__in",
+            "source_country": "route__source__closest_big_city__country_id__in",
+            "destination_country": "route__destination__closest_big_city__country_id__in",
+        }
+        for param, lookup in filters.items():
+            value = self.request.query_params.get(param)
+            if value:
+                queryset = queryset.filter(**{lookup: self._params_to_ints(value, param)})
+
+        if self.request.query_params.get("only_available") in ("true", "1"):
+            queryset = queryset.filter(
+                tickets_sold__lt=F("airplane__rows") * F("airplane__seats_per_row")
+            )
+
+        departure_from = self.request.query_params.get("departure_from")
+        if departure_from is not None:
+            queryset = queryset.filter(
+                departure_time__gte=self._param_to_datetime(departure_from, "departure_from")
+            )
+        departure_to = self.request.query_params.get("departure_to")
+        if departure_to is not None:
+            queryset = queryset.filter(
+                departure_time__lt=self._param_to_datetime(departure_to, "departure_to")
+                + timedelta(days=1)
+            )
+        return queryset
+
     def get_queryset(self):
         queryset = Flight.objects.all()
+        if self.action in ("list", "retrieve") and "tickets_available" in self.get_serializer().fields:
+            queryset = queryset.annotate(
+                tickets_available=F("airplane__rows") * F("airplane__seats_per_row")
+                - F("tickets_sold")
+            )
         if self.action == "list":
-            queryset = queryset.select_related()
-        if self.action == "retrieve":
-            queryset = queryset.prefetch_related("crew")
-            queryset = queryset.select_related()
+            queryset = self.filter_flights(queryset)
+        if self.action == "seat_map":
+            queryset = queryset.select_related("airplane")
         return queryset
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "source",
+                type={"type": "array", "items": {"type": "number"}},
+                description="Filter by source airport ids (ex. ?source=1,2)",
+            ),
+            OpenApiParameter(
+                "destination",
+                type={"type": "array", "items": {"type": "number"}},
+                description="Filter by destination airport ids (ex. ?destination=3)",
+            ),
+            OpenApiParameter(
+                "source_city",
+                type={"type": "array", "items": {"type": "number"}},
+                description="Filter by city ids closest to the source airport",
+            ),
+            OpenApiParameter(
+                "destination_city",
+                type={"type": "array", "items": {"type": "number"}},
+                description="Filter by city ids closest to the destination airport",
+            ),
+            OpenApiParameter(
+                "source_country",
+                type={"type": "array", "items": {"type": "number"}},
+                description="Filter by country ids of the source airport",
+            ),
+            OpenApiParameter(
+                "destination_country",
+                type={"type": "array", "items": {"type": "number"}},
+                description="Filter by country ids of the destination airport",
+            ),
+            OpenApiParameter(
+                "only_available",
+                type=OpenApiTypes.BOOL,
+                description="Only flights with unsold seats (ex. ?only_available=true)",
+            ),
+            OpenApiParameter(
+                "departure_from",
+                type=OpenApiTypes.DATE,
+                description="Flights departing on or after this date (ex. ?departure_from=2024-06-01)",
+            ),
+            OpenApiParameter(
+                "departure_to",
+                type=OpenApiTypes.DATE,
+                description="Flights departing on or before this date (ex. ?departure_to=2024-06-30)",
+            ),
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     @action(detail=True, methods=["get"])
     def tickets(self, request, pk):
         tickets = self.get_object().tickets.all()
         serializer = TicketUnableToBuySerializer(tickets, many=True)
         return Response(serializer.data)
 
+    @extend_schema(parameters=[ConnectionSearchSerializer])
+    @action(detail=False, methods=["get"])
+    def connections(self, request):
+        search = ConnectionSearchSerializer(data=request.query_params)
+        search.is_valid(raise_exception=True)
+        params = search.validated_data
+        departure_from = datetime.combine(
+            params["departure_date"], time.min, tzinfo=timezone.get_current_timezone()
+        )
+        itineraries = route_graph.find_itineraries(
+            source_id=params["source"],
+            destination_id=params["destination"],
+            departure_from=departure_from,
+            departure_to=departure_from + timedelta(days=1),
+            max_legs=params["max_legs"],
+            min_layover=timedelta(minutes=params["min_layover"]),
+            max_duration=timedelta(hours=params["max_duration"]),
+            order_by=params["order_by"],
+            limit=params["limit"],
+        )
+        return Response(ItinerarySerializer(itineraries, many=True).data)
+
+    @action(detail=True, methods=["get"], url_path="seat-map")
+    def seat_map(self, request, pk):
+        seat_map = get_cached_seat_map(pk)
+        if seat_map is None:
+            seat_map = cache_seat_map(self.get_object())
+        return Response(seat_map)
+
+
+class FlightScheduleViewSet(
+    ConditionalGetMixin,
+    SparseFieldsetMixin,
+    QueryPlanMixin,
+    ModelViewSet
+):
+    queryset = FlightSchedule.objects.all()
+    serializer_class = FlightScheduleSerializer
+    permission_classes = (IsAdminOrReadOnly,)
+    authentication_classes = (ClaimsJWTAuthentication,)
+    conditional_relations = ("crew",)
+
 
-class TicketViewSet(ModelViewSet):
+class TicketViewSet(ConditionalGetMixin, SparseFieldsetMixin, QueryPlanMixin, ModelViewSet):
     serializer_class = TicketSerializer
     permission_classes = (IsAuthenticated, UserCantUpdateAndDeletePermission)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (ClaimsJWTAuthentication,)
+    pagination_class = TicketPagination
+
+    def get_conditional_relations(self):
+        if self.action == "retrieve":
+            return (
+                "flight",
+                "flight__route",
+                "flight__route__source",
+                "flight__route__destination",
+            )
+        return ()
 
     def get_queryset(self):
-        queryset = Ticket.objects.select_related()
+        queryset = Ticket.objects.all()
         user = self.request.user
         if user.is_staff or user.is_superuser:
             return queryset
@@ -185,8 +513,17 @@ class TicketViewSet(ModelViewSet):
             return TicketDetailSerializer
         return TicketSerializer
 
+    @export_schema
+    @action(detail=False, methods=["get"], permission_classes=(IsAdminUser,))
+    def export(self, request):
+        """Stream every ticket with its order, flight and route as NDJSON or CSV."""
+        return export_response(request, TICKET_EXPORT_COLUMNS, ticket_export_rows(), "tickets")
+
 
 class OrderViewSet(
+    ConditionalGetMixin,
+    SparseFieldsetMixin,
+    QueryPlanMixin,
     GenericViewSet,
     ListModelMixin,
     RetrieveModelMixin,
@@ -194,17 +531,23 @@ class OrderViewSet(
     DestroyModelMixin
 ):
     permission_classes = (IsAuthenticated, UserCantUpdateAndDeletePermission,)
-    authentication_classes = (JWTAuthentication,)
-
-    def get_queryset(self):
-        queryset = Order.objects.all()
-        user = self.request.user
+    authentication_classes = (ClaimsJWTAuthentication,)
+    pagination_class = OrderPagination
 
+    def get_conditional_relations(self):
         if self.action == "retrieve":
-            queryset = queryset.prefetch_related(
+            return (
+                "tickets",
+                "tickets__flight",
+                "tickets__flight__route",
                 "tickets__flight__route__source",
                 "tickets__flight__route__destination",
             )
+        return ()
+
+    def get_queryset(self):
+        queryset = Order.objects.all()
+        user = self.request.user
         if user.is_staff or user.is_superuser:
             return queryset
         return queryset.filter(user=self.request.user)
@@ -214,5 +557,19 @@ class OrderViewSet(
             return OrderDetailSerializer
         user = self.request.user
         if user.is_staff or user.is_superuser:
+            if self.action == "create":
+                return OrderAdminCreateSerializer
             return OrderAdminSerializer
+        if self.action == "create":
+            return OrderUserCreateSerializer
         return OrderUserSerializer
+
+    @export_schema
+    @action(detail=False, methods=["get"], permission_classes=(IsAdminUser,))
+    def export(self, request):
+        """
+        Stream every order with its tickets, flights and routes as NDJSON or
+        CSV, one row per ticket; orders without tickets have one row with
+        empty ticket columns.
+        """
+        return export_response(request, ORDER_EXPORT_COLUMNS, order_export_rows(), "orders")
@@ -0,0 +1,350 @@
+"""
+Measure latency percentiles and query counts of the API endpoints.
+
+Seed an empty database first, then run from the project root:
+
+    python manage.py seed_bench --scale 10
+    python benchmarks/api.py --output baseline.json
+    python benchmarks/api.py --baseline baseline.json --output current.json
+
+Every list, retrieve and create endpoint registered in airport/urls.py and
+every endpoint of accounts/urls.py is requested in-process through
+Django's test client with a real JWT: staff endpoints as `bench_admin`,
+orders and tickets as the customer `bench_user`. Writes run in a
+transaction that is rolled back, so the dataset stays the same between
+runs. Results are written as JSON; with --baseline, endpoints whose
+median latency grew by more than --tolerance or that run more queries
+are reported and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+os.environ.setdefault("DJANGO_SECRET_KEY", "benchmark")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.db.models import F, Max  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from accounts.serializers import ClaimsTokenObtainPairSerializer, role_access_token  # noqa: E402
+from airport.models import (  # noqa: E402
+    Airplane,
+    AirplaneType,
+    Airport,
+    City,
+    Country,
+    Crew,
+    Flight,
+    FlightSchedule,
+    Order,
+    Route,
+    Ticket,
+)
+from airport.seeding import BENCH_ADMIN, BENCH_PASSWORD, BENCH_USER  # noqa: E402
+from airport.urls import router  # noqa: E402
+
+ADMIN, CUSTOMER = "admin", "customer"
+ACTIONS = ("list", "retrieve", "create")
+
+
+class Fixtures:
+    """Existing rows the requests point at, looked up once."""
+    def __init__(self):
+        User = get_user_model()
+        self.users = {
+            ADMIN: User.objects.get(username=BENCH_ADMIN),
+            CUSTOMER: User.objects.get(username=BENCH_USER),
+        }
+        self.country = Country.objects.order_by("pk").first()
+        self.city = City.objects.order_by("pk").first()
+        self.airplane_type = AirplaneType.objects.order_by("pk").first()
+        self.airplane = Airplane.objects.order_by("pk").first()
+        self.crew = Crew.objects.order_by("pk").first()
+        self.order = Order.objects.filter(user=self.users[CUSTOMER]).order_by("pk").first()
+
+        routes = set(Route.objects.values_list("source_id", "destination_id"))
+        airports = list(Airport.objects.order_by("pk").values_list("pk", flat=True)[:100])
+        self.new_route = next(
+            (source, destination)
+            for source in airports
+            for destination in airports
+            if source != destination and (source, destination) not in routes
+        )
+        self.route = Route.objects.order_by("pk").first()
+        # Past every seeded flight, so the new flight conflicts with nothing.
+        last_arrival = Flight.objects.aggregate(last=Max("arrival_time"))["last"]
+        self.departure_time = last_arrival + timedelta(days=30)
+
+        self.flight = Flight.objects.filter(
+            tickets_sold__lt=F("airplane__rows") * F("airplane__seats_per_row")
+        ).select_related("airplane").order_by("pk").first()
+        taken = set(self.flight.tickets.values_list("row", "seat"))
+        self.seat = next(
+            (row, seat)
+            for row in range(1, self.flight.airplane.rows + 1)
+            for seat in range(1, self.flight.airplane.seats_per_row + 1)
+            if (row, seat) not in taken
+        )
+
+    def token(self, role):
+        return ClaimsTokenObtainPairSerializer.get_token(self.users[role])
+
+    def access_token(self, role):
+        return role_access_token(self.token(role), self.users[role])
+
+
+# basename: (role, retrieved queryset, create payload)
+AIRPORT_ENDPOINTS = {
+    "country": (ADMIN, lambda f: Country.objects.all(), lambda f: {"name": "Bench country"}),
+    "city": (
+        ADMIN, lambda f: City.objects.all(),
+        lambda f: {"name": "Bench city", "country": f.country.pk},
+    ),
+    "airplane-type": (
+        ADMIN, lambda f: AirplaneType.objects.all(), lambda f: {"name": "Bench type"},
+    ),
+    "airplane": (
+        ADMIN, lambda f: Airplane.objects.all(),
+        lambda f: {
+            "name": "Bench airplane", "rows": 30, "seats_per_row": 6, "airplane_type": f.airplane_type.pk,
+        },
+    ),
+    "airport": (
+        ADMIN, lambda f: Airport.objects.all(),
+        lambda f: {"name": "Bench airport", "closest_big_city": f.city.pk},
+    ),
+    "route": (
+        ADMIN, lambda f: Route.objects.all(),
+        lambda f: {"source": f.new_route[0], "destination": f.new_route[1], "distance": 1000},
+    ),
+    "crew": (
+        ADMIN, lambda f: Crew.objects.all(), lambda f: {"first_name": "Bench", "last_name": "Crew"},
+    ),
+    "flight": (
+        ADMIN, lambda f: Flight.objects.all(),
+        lambda f: {
+            "route": f.route.pk,
+            "airplane": f.airplane.pk,
+            "crew": [f.crew.pk],
+            "departure_time": f.departure_time.isoformat(),
+            "arrival_time": (f.departure_time + timedelta(hours=2)).isoformat(),
+        },
+    ),
+    "flight-schedule": (
+        ADMIN, lambda f: FlightSchedule.objects.all(),
+        lambda f: {
+            "route": f.route.pk,
+            "airplane": f.airplane.pk,
+            "days_of_week": 127,
+            "departure_time": "08:00",
+            "duration": "02:00:00",
+            "valid_from": f.departure_time.date().isoformat(),
+        },
+    ),
+    "order": (
+        CUSTOMER, lambda f: Order.objects.filter(user=f.users[CUSTOMER]),
+        lambda f: {"tickets": [{"flight": f.flight.pk, "row": f.seat[0], "seat": f.seat[1]}]},
+    ),
+    "ticket": (
+        CUSTOMER, lambda f: Ticket.objects.filter(order__user=f.users[CUSTOMER]),
+        lambda f: {"order": f.order.pk, "flight": f.flight.pk, "row": f.seat[0], "seat": f.seat[1]},
+    ),
+}
+
+
+def accounts_endpoints(fixtures):
+    """(name, method, url, role, payload) of every accounts endpoint."""
+    refresh = fixtures.token(CUSTOMER)
+    return [
+        ("accounts:create", "POST", reverse("accounts:create"), None, {
+            "username": "bench_new", "email": "bench_new@example.com", "password": BENCH_PASSWORD,
+        }),
+        ("accounts:profile", "GET", reverse("accounts:profile"), CUSTOMER, None),
+        ("accounts:token_obtain_pair", "POST", reverse("accounts:token_obtain_pair"), None, {
+            "username": BENCH_USER, "password": BENCH_PASSWORD,
+        }),
+        ("accounts:token_refresh", "POST", reverse("accounts:token_refresh"), None, {
+            "refresh": str(refresh),
+        }),
+        ("accounts:token_verify", "POST", reverse("accounts:token_verify"), None, {
+            "token": str(fixtures.access_token(CUSTOMER)),
+        }),
+    ]
+
+
+def airport_endpoints(fixtures):
+    """(name, method, url, role, payload) of every airport list, retrieve and create action."""
+    endpoints = []
+    for _, viewset, basename in router.registry:
+        if basename not in AIRPORT_ENDPOINTS:
+            raise SystemExit(f"No benchmark requests defined for the {basename!r} viewset")
+        role, queryset, payload = AIRPORT_ENDPOINTS[basename]
+        for action in ACTIONS:
+            if not hasattr(viewset, action):
+                continue
+            if action == "retrieve":
+                pk = queryset(fixtures).order_by("pk").values_list("pk", flat=True).first()
+                url = reverse(f"airport:{basename}-detail", kwargs={"pk": pk})
+            else:
+                url = reverse(f"airport:{basename}-list")
+            endpoints.append((
+                f"airport:{basename}-{action}",
+                "POST" if action == "create" else "GET",
+                url,
+                role,
+                payload(fixtures) if action == "create" else None,
+            ))
+    return endpoints
+
+
+def measure(client, method, url, headers, payload, iterations, warmup, cold):
+    durations, queries, statuses = [], [], set()
+    for iteration in range(warmup + iterations):
+        if cold:
+            cache.clear()
+        with transaction.atomic(), CaptureQueriesContext(connection) as captured:
+            start = perf_counter()
+            response = client.generic(
+                method,
+                url,
+                data=json.dumps(payload) if payload is not None else "",
+                content_type="application/json",
+                headers=headers,
+            )
+            elapsed = perf_counter() - start
+            transaction.set_rollback(True)
+        if iteration >= warmup:
+            durations.append(elapsed * 1000)
+            queries.append(len(captured))
+            statuses.add(response.status_code)
+
+    percentiles = statistics.quantiles(durations, n=100, method="inclusive")
+    return {
+        "method": method,
+        "url": url,
+        "status": sorted(statuses),
+        "p50_ms": round(percentiles[49], 3),
+        "p90_ms": round(percentiles[89], 3),
+        "p99_ms": round(percentiles[98], 3),
+        "mean_ms": round(statistics.fmean(durations), 3),
+        "min_ms": round(min(durations), 3),
+        "max_ms": round(max(durations), 3),
+        "queries": statistics.median_low(queries),
+        "max_queries": max(queries),
+    }
+
+
+def dataset():
+    models = (Country, City, Airport, Route, Airplane, Crew, Flight, Order, Ticket)
+    return {model._meta.model_name: model.objects.count() for model in models}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of every endpoint against `baseline` and return the regressed ones."""
+    if baseline["meta"]["dataset"] != results["meta"]["dataset"]:
+        print("warning: the baseline was measured on a different dataset", file=sys.stderr)
+    regressions = []
+    for name, result in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:42} new", file=sys.stderr)
+            continue
+        change = result["p50_ms"] / base["p50_ms"] - 1 if base["p50_ms"] else 0
+        regressed = change > tolerance or result["queries"] > base["queries"]
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:42} p50 {base['p50_ms']:9.2f} -> {result['p50_ms']:9.2f} ms ({change:+6.1%})  "
+            f"queries {base['queries']:3} -> {result['queries']:3}{'  REGRESSION' if regressed else ''}",
+            file=sys.stderr,
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=30, help="Measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured requests per endpoint first")
+    parser.add_argument("--cold", action="store_true", help="Clear the cache before every request")
+    parser.add_argument("--filter", default="", help="Only endpoints whose name contains this")
+    parser.add_argument("--output", default="-", help="Where to write the JSON results (default: stdout)")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed median latency growth (default: 0.2)"
+    )
+    args = parser.parse_args()
+    if args.iterations < 2:
+        parser.error("--iterations must be at least 2")
+
+    fixtures = Fixtures()
+    client = Client(SERVER_NAME=settings.ALLOWED_HOSTS[0])
+    results = {}
+    for name, method, url, role, payload in airport_endpoints(fixtures) + accounts_endpoints(fixtures):
+        if args.filter not in name:
+            continue
+        headers = {"Authorization": f"Bearer {fixtures.access_token(role)}"} if role else {}
+        results[name] = measure(
+            client, method, url, headers, payload, args.iterations, args.warmup, args.cold
+        )
+        print(
+            f"{name:42} p50 {results[name]['p50_ms']:9.2f} ms  p99 {results[name]['p99_ms']:9.2f} ms  "
+            f"queries {results[name]['queries']:3}  status {results[name]['status']}",
+            file=sys.stderr,
+        )
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "cold": args.cold,
+            "dataset": dataset(),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2) + "\n"
+    if args.output == "-":
+        sys.stdout.write(text)
+    else:
+        Path(args.output).write_text(text)
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} endpoints regressed", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
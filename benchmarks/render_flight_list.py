@@ -0,0 +1,80 @@
+"""
+Compare DRF's JSONRenderer with core.renderers.FastJSONRenderer on a
+serialized flight list.
+
+Run from the project root:
+
+    python benchmarks/render_flight_list.py --rows 10000
+
+Flights are built in memory, so no database is needed.
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+os.environ.setdefault("DJANGO_SECRET_KEY", "benchmark")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+
+from airport.models import Airport, Flight, Route  # noqa: E402
+from airport.serializers import FlightListSerializer  # noqa: E402
+from core.renderers import FastJSONRenderer  # noqa: E402
+
+
+def flight_list_data(rows):
+    airports = [Airport(pk=pk, name=f"Airport {pk}") for pk in range(1, 51)]
+    start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    flights = []
+    for pk in range(1, rows + 1):
+        route = Route(
+            pk=pk % 500 + 1,
+            source=airports[pk % 50],
+            destination=airports[(pk + 7) % 50],
+            distance=500,
+        )
+        flight = Flight(
+            pk=pk,
+            route=route,
+            departure_time=start + timedelta(minutes=pk),
+            arrival_time=start + timedelta(minutes=pk + 120),
+        )
+        flight.tickets_available = pk % 180
+        flights.append(flight)
+
+    request = Request(RequestFactory().get("/flight/", SERVER_NAME=settings.ALLOWED_HOSTS[0]))
+    return FlightListSerializer(flights, many=True, context={"request": request}).data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data = flight_list_data(args.rows)
+    assert JSONRenderer().render(data) == FastJSONRenderer().render(data)
+
+    results = {}
+    for renderer in (JSONRenderer(), FastJSONRenderer()):
+        timings = timeit.repeat(lambda: renderer.render(data), number=1, repeat=args.repeat)
+        results[type(renderer).__name__] = min(timings)
+        print(f"{type(renderer).__name__:>18}: {min(timings) * 1000:8.2f} ms")
+
+    speedup = results["JSONRenderer"] / results["FastJSONRenderer"]
+    print(f"{'speedup':>18}: {speedup:8.1f}x for {args.rows} flights")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import copy
+import threading
+from time import monotonic
+
+from django.conf import settings
+from django.db import router
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+STAFF_CLAIM = "is_staff"
+SUPERUSER_CLAIM = "is_superuser"
+
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
+
+def clear_user_cache():
+    with _user_cache_lock:
+        _user_cache.clear()
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds `request.user` from the token's claims.
+
+    Access tokens issued by `accounts.serializers.ClaimsTokenObtainPairSerializer`
+    and `ClaimsTokenRefreshSerializer` carry the user id, `is_staff` and `is_superuser`, which is all the
+    permissions and per-user querysets need, so no user row is read. The
+    user is an unsaved-looking `User` instance with only those fields set:
+    views that need the rest of the profile must keep `JWTAuthentication`.
+    Tokens without the claims fall back to a database lookup that is
+    cached per process for `JWT_USER_CACHE_TTL` seconds (0 disables it).
+
+    Staff changes and deactivation take effect when the access token
+    expires rather than immediately: refreshing reads the roles again.
+    """
+    def get_user(self, validated_token):
+        if STAFF_CLAIM not in validated_token or SUPERUSER_CLAIM not in validated_token:
+            return self.get_cached_user(validated_token)
+
+        user = self.user_model(**{
+            api_settings.USER_ID_FIELD: validated_token[api_settings.USER_ID_CLAIM],
+            "is_staff": validated_token[STAFF_CLAIM],
+            "is_superuser": validated_token[SUPERUSER_CLAIM],
+            "is_active": True,
+        })
+        user._state.adding = False
+        user._state.db = router.db_for_read(self.user_model)
+        return user
+
+    def get_cached_user(self, validated_token):
+        ttl = getattr(settings, "JWT_USER_CACHE_TTL", 0)
+        if not ttl:
+            return super().get_user(validated_token)
+
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        with _user_cache_lock:
+            expires, user = _user_cache.get(user_id, (0, None))
+        if expires < monotonic():
+            user = super().get_user(validated_token)
+            with _user_cache_lock:
+                _user_cache[user_id] = (monotonic() + ttl, user)
+        return copy.copy(user)
+
+
+class ClaimsJWTScheme(SimpleJWTScheme):
+    target_class = ClaimsJWTAuthentication
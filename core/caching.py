@@ -0,0 +1,137 @@
+import hashlib
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+_cached_models = set()
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {"hits": 0, "misses": 0})
+_missing = object()
+_validator_headers = ("ETag", "Last-Modified")
+
+
+def get_response_cache():
+    return caches[getattr(settings, "RESPONSE_CACHE_ALIAS", "default")]
+
+
+def _version_key(model):
+    return f"response-cache:version:{model._meta.label_lower}"
+
+
+def get_model_versions(models):
+    """
+    Return the current cache version of each model.
+
+    A missing version (never set, or evicted) is seeded from the clock
+    rather than from 1, so it can never collide with a version that keyed
+    entries before the eviction.
+    """
+    cache = get_response_cache()
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_model_version(model):
+    cache = get_response_cache()
+    try:
+        cache.incr(_version_key(model))
+    except ValueError:
+        cache.set(_version_key(model), time.time_ns(), timeout=None)
+
+
+def _bump_sender_version(sender, **kwargs):
+    bump_model_version(sender)
+
+
+def _bump_m2m_versions(sender, instance, model, action, **kwargs):
+    if action.startswith("post_"):
+        for changed in (type(instance), model):
+            if changed in _cached_models:
+                bump_model_version(changed)
+
+
+def register_cached_models(*models):
+    """
+    Bump the cache version of `models` whenever one of their rows changes.
+
+    Queryset `update()`, `bulk_create()` and raw SQL do not send signals;
+    code that writes these models that way must call `bump_model_version`.
+    """
+    for model in models:
+        _cached_models.add(model)
+        post_save.connect(_bump_sender_version, sender=model, weak=False)
+        post_delete.connect(_bump_sender_version, sender=model, weak=False)
+    m2m_changed.connect(_bump_m2m_versions, dispatch_uid="response-cache-m2m", weak=False)
+
+
+def record_cache_lookup(name, hit):
+    with _stats_lock:
+        _stats[name]["hits" if hit else "misses"] += 1
+
+
+def get_response_cache_stats():
+    with _stats_lock:
+        return {name: dict(counters) for name, counters in _stats.items()}
+
+
+# Caches the serialized data of `list` and `retrieve` responses. Keys
+# include the current version of every model in `cache_dependencies`, so any
+# write to one of them makes the old entries unreachable instead of having
+# to find and delete them. Validator headers are stored with the data, so a
+# hit can still answer conditional requests with 304. (A comment, not a
+# docstring: drf-spectacular would publish it as every endpoint's description.)
+class CachedResponseMixin:
+    cache_dependencies = ()
+
+    def get_response_cache_key(self, request):
+        versions = get_model_versions(self.cache_dependencies)
+        location = hashlib.md5(
+            f"{request.get_host()}{request.get_full_path()}".encode()
+        ).hexdigest()
+        return (
+            f"response-cache:{self.basename}:{self.action}:"
+            f"{'.'.join(map(str, versions))}:{location}"
+        )
+
+    def cached_response(self, view, request, *args, **kwargs):
+        cache = get_response_cache()
+        key = self.get_response_cache_key(request)
+        entry = cache.get(key, _missing)
+        record_cache_lookup(self.basename, hit=entry is not _missing)
+        if entry is not _missing:
+            data, headers = entry
+            response = Response(data, headers=headers)
+            return get_conditional_response(
+                request,
+                etag=headers.get("ETag"),
+                last_modified=parse_http_date_safe(headers.get("Last-Modified")),
+                response=response,
+            ) or response
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            headers = {name: response[name] for name in _validator_headers if response.has_header(name)}
+            cache.set(
+                key,
+                (response.data, headers),
+                getattr(settings, "RESPONSE_CACHE_TIMEOUT", 3600),
+            )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
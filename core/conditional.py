@@ -0,0 +1,99 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+# Answers `list` and `retrieve` with 304 when the client's copy is current,
+# before anything is serialized. The validators come from one aggregate
+# query: MAX(updated_at) of the rows and of every relation the serializer
+# nests (`get_conditional_relations()`), plus distinct counts where rows can
+# disappear without touching anything that remains. Paginated lists are
+# validated over the page that was fetched, so no full-table COUNT is run.
+class ConditionalGetMixin:
+    conditional_relations = ()
+
+    def get_conditional_relations(self):
+        return self.conditional_relations
+
+    @staticmethod
+    def _is_many_valued(model, relation):
+        for name in relation.split("__"):
+            field = model._meta.get_field(name)
+            if field.one_to_many or field.many_to_many:
+                return True
+            model = field.related_model
+        return False
+
+    def get_conditional_validators(self, queryset, count=False, state=()):
+        aggregates = {"modified": Max("updated_at")}
+        if count:
+            aggregates["count"] = Count("pk", distinct=True)
+        for relation in self.get_conditional_relations():
+            aggregates[f"modified_{relation}"] = Max(f"{relation}__updated_at")
+            if self._is_many_valued(queryset.model, relation):
+                aggregates[f"count_{relation}"] = Count(f"{relation}__pk", distinct=True)
+        values = queryset.order_by().aggregate(**aggregates)
+
+        modified = [value for key, value in values.items() if key.startswith("modified") and value]
+        state = ":".join(
+            [self.request.get_full_path(), str(self.request.user.pk)]
+            + [str(value) for value in state]
+            + [str(values[key]) for key in sorted(values)]
+        )
+        etag = f'W/"{hashlib.md5(state.encode()).hexdigest()}"'
+        last_modified = int(max(modified).timestamp()) if modified else None
+        return etag, last_modified
+
+    def set_validator_headers(self, response, validators):
+        etag, last_modified = validators
+        if response.status_code in (200, 304):
+            response["ETag"] = quote_etag(etag)
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            validators = self.get_conditional_validators(queryset, count=True)
+        else:
+            pks = [obj["pk"] if isinstance(obj, dict) else obj.pk for obj in page]
+            validators = self.get_conditional_validators(
+                queryset.model._default_manager.filter(pk__in=pks),
+                state=pks + [self.paginator.get_next_link(), self.paginator.get_previous_link()],
+            )
+
+        etag, last_modified = validators
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            if page is None:
+                response = Response(self.get_serializer(queryset, many=True).data)
+            else:
+                response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return self.set_validator_headers(response, validators)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+            validators = self.get_conditional_validators(queryset)
+        except (TypeError, ValueError, ValidationError):
+            # A lookup value of the wrong type, as DRF's get_object_or_404.
+            raise Http404
+        if validators[1] is None:
+            # No such object; let the regular flow answer 404.
+            return super().retrieve(request, *args, **kwargs)
+
+        etag, last_modified = validators
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        return self.set_validator_headers(response, validators)
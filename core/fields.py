@@ -0,0 +1,110 @@
+from functools import lru_cache
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.urls import get_script_prefix, get_urlconf, reverse
+from rest_framework.relations import (
+    MANY_RELATION_KWARGS,
+    HyperlinkedIdentityField,
+    ManyRelatedField,
+    PrimaryKeyRelatedField,
+)
+from rest_framework.settings import api_settings
+
+URL_SENTINEL = 9876543210
+
+
+@lru_cache(maxsize=None)
+def _path_template(view_name, lookup_url_kwarg, urlconf, script_prefix):
+    path = reverse(view_name, kwargs={lookup_url_kwarg: URL_SENTINEL}, urlconf=urlconf)
+    prefix, sentinel, suffix = path.rpartition(str(URL_SENTINEL))
+    if not sentinel or str(URL_SENTINEL) in prefix:
+        return None
+    return prefix, suffix
+
+
+class TemplatedHyperlinkedIdentityField(HyperlinkedIdentityField):
+    """
+    `HyperlinkedIdentityField` that reverses the view once and formats ids
+    into the resulting URL instead of calling `reverse()` and
+    `build_absolute_uri()` for every object.
+
+    The path template is cached per process (per urlconf and script
+    prefix) and its absolute form per request. Integer lookup values get
+    the fast path; format suffixes, other lookup values, versioned
+    requests and `?format=` overrides go through the stock field, so the
+    output is always identical.
+    """
+    def get_url(self, obj, view_name, request, format):
+        if hasattr(obj, "pk") and obj.pk in (None, ""):
+            return None
+
+        lookup_value = getattr(obj, self.lookup_field)
+        if format or type(lookup_value) is not int:
+            return super().get_url(obj, view_name, request, format)
+
+        template = self.get_url_template(view_name, request)
+        if template is None:
+            return super().get_url(obj, view_name, request, format)
+        prefix, suffix = template
+        return f"{prefix}{lookup_value}{suffix}"
+
+    def get_url_template(self, view_name, request):
+        if request is None or getattr(request, "versioning_scheme", None) is not None:
+            return None
+        if api_settings.URL_FORMAT_OVERRIDE in request.GET:
+            return None
+
+        templates = request.__dict__.setdefault("_url_templates", {})
+        key = (view_name, self.lookup_url_kwarg)
+        if key not in templates:
+            template = _path_template(
+                view_name, self.lookup_url_kwarg, get_urlconf(), get_script_prefix()
+            )
+            if template is not None:
+                prefix, suffix = template
+                template = (request.build_absolute_uri(prefix), suffix)
+            templates[key] = template
+        return templates[key]
+
+
+class BulkManyRelatedField(ManyRelatedField):
+    """
+    `ManyRelatedField` that loads every submitted primary key with one
+    `in_bulk()` query instead of one `get()` per key, with the same errors.
+    """
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail("empty")
+
+        child = self.child_relation
+        queryset = child.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks = []
+        for value in data:
+            if child.pk_field is not None:
+                value = child.pk_field.to_internal_value(value)
+            try:
+                if isinstance(value, bool):
+                    raise TypeError
+                pks.append(pk_field.to_python(value))
+            except (TypeError, ValueError, DjangoValidationError):
+                child.fail("incorrect_type", data_type=type(value).__name__)
+
+        objects = queryset.in_bulk(pks)
+        for pk in pks:
+            if pk not in objects:
+                child.fail("does_not_exist", pk_value=pk)
+        return [objects[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    """`PrimaryKeyRelatedField` whose `many=True` form is a `BulkManyRelatedField`."""
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
@@ -0,0 +1,86 @@
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = "fields"
+EXPAND_PARAM = "expand"
+
+
+def parse_field_tree(value):
+    """Turn `"a,b.c,b.d"` into `{"a": {}, "b": {"c": {}, "d": {}}}`."""
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def get_expandable_fields(serializer):
+    return getattr(getattr(serializer, "Meta", None), "expandable_fields", {})
+
+
+def _nested(serializer, name, param):
+    field = serializer.fields[name]
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child
+    if not isinstance(field, serializers.Serializer):
+        raise ValidationError({param: f"{name!r} has no nested fields"})
+    return field
+
+
+def expand_fields(serializer, tree, param=EXPAND_PARAM):
+    """Add the `Meta.expandable_fields` named in `tree`, recursively."""
+    expandable = get_expandable_fields(serializer)
+    unknown = sorted(set(tree) - set(expandable))
+    if unknown:
+        raise ValidationError({param: f"Cannot expand: {', '.join(unknown)}"})
+    for name, subtree in tree.items():
+        serializer_class, kwargs = expandable[name]
+        serializer.fields[name] = serializer_class(**kwargs)
+        if subtree:
+            expand_fields(_nested(serializer, name, param), subtree, param)
+
+
+def prune_fields(serializer, tree, param=FIELDS_PARAM):
+    """Drop every field not named in `tree`, recursively."""
+    fields = serializer.fields
+    unknown = sorted(set(tree) - set(fields))
+    if unknown:
+        raise ValidationError({param: f"Unknown fields: {', '.join(unknown)}"})
+    for name in list(fields):
+        if name not in tree:
+            fields.pop(name)
+    for name, subtree in tree.items():
+        if subtree:
+            prune_fields(_nested(serializer, name, param), subtree, param)
+
+
+# `?fields=` and `?expand=` for read actions (`fieldset_actions`).
+# `expand` adds the serializer's `Meta.expandable_fields`
+# (`{name: (serializer_class, kwargs)}`), `fields` keeps only the named
+# fields, with dots reaching into nested serializers; expanded fields are
+# kept. Both edit the serializer `get_serializer()` returns, so the query
+# plan and the values() path only fetch what is left.
+class SparseFieldsetMixin:
+    fieldset_actions = ("list", "retrieve")
+
+    def get_fieldset(self, param):
+        if self.action not in self.fieldset_actions:
+            return {}
+        value = self.request.query_params.get(param)
+        return parse_field_tree(value) if value else {}
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields, expand = self.get_fieldset(FIELDS_PARAM), self.get_fieldset(EXPAND_PARAM)
+        if not (fields or expand):
+            return serializer
+
+        root = serializer.child if isinstance(serializer, serializers.ListSerializer) else serializer
+        expand_fields(root, expand)
+        if fields:
+            for name in expand:
+                fields.setdefault(name, {})
+            prune_fields(root, fields)
+        return serializer
@@ -0,0 +1,201 @@
+import threading
+from bisect import bisect_left
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+UNRESOLVED = "<unresolved>"
+OVERFLOW = "<other>"
+HTTP_METHODS = {"get", "head", "post", "put", "patch", "delete", "options", "trace"}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+RESPONSE_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# (name, help, buckets) of the histograms kept for every view and action.
+HISTOGRAMS = (
+    ("http_request_duration_seconds", "Request latency, middleware included.", LATENCY_BUCKETS),
+    ("http_request_db_queries", "SQL queries run per request.", QUERY_COUNT_BUCKETS),
+    ("http_request_db_duration_seconds", "Time spent in SQL per request.", LATENCY_BUCKETS),
+    ("http_response_render_seconds", "Time spent rendering the response body.", LATENCY_BUCKETS),
+    ("http_response_size_bytes", "Response body size; streaming bodies are not counted.",
+     RESPONSE_SIZE_BUCKETS),
+)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """Cumulative `(le, count)` pairs, ending with `+Inf`."""
+        total = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            yield bound, total
+
+
+class Series:
+    __slots__ = ("responses", "histograms")
+
+    def __init__(self):
+        self.responses = {}
+        self.histograms = {name: Histogram(buckets) for name, _, buckets in HISTOGRAMS}
+
+
+class MetricsRegistry:
+    """
+    Per `(view, action)` request metrics of this process.
+
+    Views are URL pattern names and actions the viewset action or HTTP
+    method, so the label sets are fixed by the URLconf. `max_series` still
+    caps them: once reached, new pairs are recorded under `<other>`.
+    """
+    def __init__(self, max_series=None):
+        self.max_series = max_series
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def get_series(self, key):
+        series = self.series.get(key)
+        if series is None:
+            max_series = self.max_series or getattr(settings, "METRICS_MAX_SERIES", 1000)
+            if len(self.series) >= max_series:
+                key = (OVERFLOW, OVERFLOW)
+                series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = Series()
+        return series
+
+    def record(self, view, action, status, observations):
+        status_class = f"{status // 100}xx"
+        with self.lock:
+            series = self.get_series((view, action))
+            series.responses[status_class] = series.responses.get(status_class, 0) + 1
+            for name, value in observations.items():
+                series.histograms[name].observe(value)
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format (0.0.4)."""
+        with self.lock:
+            series = sorted(
+                (key, dict(value.responses), {
+                    name: (list(histogram.samples()), histogram.sum, histogram.count)
+                    for name, histogram in value.histograms.items()
+                })
+                for key, value in self.series.items()
+            )
+
+        lines = [
+            "# HELP http_responses_total Responses by view, action and status class.",
+            "# TYPE http_responses_total counter",
+        ]
+        for (view, action), responses, _ in series:
+            for status_class, count in sorted(responses.items()):
+                labels = _labels(view=view, action=action, status=status_class)
+                lines.append(f"http_responses_total{{{labels}}} {count}")
+
+        for name, help_text, _ in HISTOGRAMS:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for (view, action), _, histograms in series:
+                samples, total, count = histograms[name]
+                labels = _labels(view=view, action=action)
+                for bound, cumulative in samples:
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {total:.6g}")
+                lines.append(f"{name}_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+registry = MetricsRegistry()
+
+
+class QueryTimer:
+    """`execute_wrapper` counting the queries run and the time they take."""
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += perf_counter() - start
+
+
+class MetricsMiddleware:
+    """
+    Record latency, SQL query count and time, render time and response size
+    of every request in `registry`, labelled with the resolved URL pattern
+    name and viewset action. Belongs first in `MIDDLEWARE` so the latency
+    covers the other middleware too.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = perf_counter()
+        timer = QueryTimer()
+        method = request.method.lower()
+        request._metrics = {"action": method if method in HTTP_METHODS else OVERFLOW, "render": 0.0}
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+
+        resolver_match = request.resolver_match
+        observations = {
+            "http_request_duration_seconds": perf_counter() - start,
+            "http_request_db_queries": timer.count,
+            "http_request_db_duration_seconds": timer.duration,
+            "http_response_render_seconds": request._metrics["render"],
+        }
+        if not response.streaming:
+            observations["http_response_size_bytes"] = len(response.content)
+        registry.record(
+            resolver_match.view_name if resolver_match else UNRESOLVED,
+            request._metrics["action"],
+            response.status_code,
+            observations,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        actions = getattr(view_func, "actions", None)
+        if actions:
+            request._metrics["action"] = actions.get(request.method.lower(), request._metrics["action"])
+
+    def process_template_response(self, request, response):
+        start = perf_counter()
+
+        def finish_render(response):
+            request._metrics["render"] = perf_counter() - start
+
+        response.add_post_render_callback(finish_render)
+        return response
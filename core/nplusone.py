@@ -0,0 +1,77 @@
+import re
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core.slow_queries import project_frame
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+
+class RepeatedQueriesError(AssertionError):
+    pass
+
+
+def query_shape(sql):
+    """`sql` with literals and the length of `IN` lists taken out."""
+    return _IN_LIST.sub("IN (...)", _LITERAL.sub("?", sql))
+
+
+class RepeatedQueryDetector:
+    """
+    `execute_wrapper` counting the SELECTs run per query shape, and the
+    project frame that first ran each shape.
+    """
+    def __init__(self):
+        self.shapes = Counter()
+        self.frames = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith("SELECT"):
+            shape = query_shape(sql)
+            self.shapes[shape] += 1
+            if shape not in self.frames:
+                self.frames[shape] = project_frame()
+        return execute(sql, params, many, context)
+
+    def repeated(self, max_repeats):
+        """`(shape, count, frame)` of every shape run more than `max_repeats` times."""
+        return [
+            (shape, count, self.frames[shape])
+            for shape, count in self.shapes.most_common()
+            if count > max_repeats
+        ]
+
+    def check(self, max_repeats, label="The request"):
+        repeated = self.repeated(max_repeats)
+        if repeated:
+            raise RepeatedQueriesError(f"{label} repeated {len(repeated)} queries:\n" + "\n".join(
+                f"{count}x from {frame}: {shape}" for shape, count, frame in repeated
+            ))
+
+
+class NPlusOneMiddleware:
+    """
+    Fail every request that runs one SELECT shape more than
+    `NPLUSONE_MAX_REPEATS` times (0, the default, disables the check), the
+    signature of a relation loaded row by row. Meant for tests and local
+    development; queries of streaming response bodies are not counted.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        max_repeats = getattr(settings, "NPLUSONE_MAX_REPEATS", 0)
+        if max_repeats <= 0:
+            return self.get_response(request)
+
+        detector = RepeatedQueryDetector()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(detector))
+            response = self.get_response(request)
+        detector.check(max_repeats, f"{request.method} {request.path}")
+        return response
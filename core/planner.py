@@ -0,0 +1,176 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import (
+    HyperlinkedIdentityField,
+    HyperlinkedRelatedField,
+    PrimaryKeyRelatedField,
+    RelatedField,
+    SlugRelatedField,
+)
+
+
+def _model_field(model, name):
+    if name == "pk":
+        return model._meta.pk
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _is_many_valued(model_field):
+    return model_field.one_to_many or model_field.many_to_many
+
+
+class QueryPlan:
+    """
+    The `select_related()`, `prefetch_related()` and `only()` calls a
+    serializer needs, derived from its readable fields.
+
+    Single-valued relations the serializer reads through (nested
+    serializers, slug fields, dotted sources) are joined, many-valued ones
+    are prefetched with a queryset planned from the nested serializer, and
+    only the columns the fields read are loaded. Primary-key relations and
+    identity hyperlinks read the foreign key or lookup column and join
+    nothing. A level with a field the plan cannot see through (a property,
+    method field or custom `to_representation`) loads all of its columns;
+    queryset annotations are recognised when the plan is applied.
+    """
+    def __init__(self, serializer, model=None):
+        self.model = model or serializer.Meta.model
+        self.select_related = []
+        self.prefetch_related = []
+        self.only = []
+        self.opaque = {}
+        self.add_serializer(serializer, self.model, "")
+
+    def add(self, lookups, path):
+        if path not in lookups:
+            lookups.append(path)
+
+    def add_opaque(self, model, prefix, name):
+        self.opaque.setdefault(prefix, (model, set()))[1].add(name)
+
+    def add_serializer(self, serializer, model, prefix):
+        self.add(self.only, prefix + model._meta.pk.name)
+        if type(serializer).to_representation is not serializers.Serializer.to_representation:
+            self.add_opaque(model, prefix, "to_representation")
+        for field in serializer._readable_fields:
+            self.add_field(field, model, prefix)
+
+    def add_relation(self, model_field, prefix):
+        path = prefix + model_field.name
+        self.add(self.select_related, path)
+        if model_field.concrete:
+            self.add(self.only, path)
+        return model_field.related_model, f"{path}__"
+
+    def add_field(self, field, model, prefix):
+        if field.source == "*":
+            if isinstance(field, HyperlinkedIdentityField):
+                self.add_column(model, prefix, field.lookup_field)
+            else:
+                self.add_opaque(model, prefix, field.field_name)
+            return
+
+        *through, name = field.source_attrs
+        for attr in through:
+            model_field = _model_field(model, attr)
+            if model_field is None or not (model_field.many_to_one or model_field.one_to_one):
+                self.add_opaque(model, prefix, attr)
+                return
+            model, prefix = self.add_relation(model_field, prefix)
+
+        model_field = _model_field(model, name)
+        if isinstance(field, (serializers.BaseSerializer, RelatedField, serializers.ManyRelatedField)):
+            if model_field is None or not model_field.is_relation:
+                self.add_opaque(model, prefix, name)
+            elif _is_many_valued(model_field):
+                self.add_prefetch(field, model_field, prefix)
+            elif isinstance(field, serializers.BaseSerializer):
+                self.add_serializer(field, *self.add_relation(model_field, prefix))
+            elif field.use_pk_only_optimization() and model_field.concrete:
+                self.add(self.only, prefix + model_field.name)
+            else:
+                related, related_prefix = self.add_relation(model_field, prefix)
+                self.add_related_columns(field, related, related_prefix)
+            return
+
+        self.add_column(model, prefix, name)
+
+    def add_column(self, model, prefix, name):
+        model_field = _model_field(model, name)
+        if model_field is None or not model_field.concrete:
+            self.add_opaque(model, prefix, name)
+        else:
+            self.add(self.only, prefix + model_field.name)
+
+    def add_related_columns(self, field, model, prefix):
+        self.add(self.only, prefix + model._meta.pk.name)
+        if isinstance(field, SlugRelatedField):
+            self.add_column(model, prefix, field.slug_field)
+        elif isinstance(field, HyperlinkedRelatedField):
+            self.add_column(model, prefix, field.lookup_field)
+        elif not isinstance(field, PrimaryKeyRelatedField):
+            self.add_opaque(model, prefix, field.field_name)
+
+    def add_prefetch(self, field, model_field, prefix):
+        related = model_field.related_model
+        if isinstance(field, serializers.ListSerializer):
+            nested = QueryPlan(field.child, related)
+        else:
+            nested = QueryPlan(serializers.Serializer(), related)
+            child = getattr(field, "child_relation", field)
+            nested.add_related_columns(child, related, "")
+        if model_field.one_to_many:
+            nested.add(nested.only, model_field.field.name)
+        self.prefetch_related.append(
+            Prefetch(prefix + model_field.name, queryset=nested.apply(related._default_manager.all()))
+        )
+
+    def get_only(self, queryset):
+        only = list(self.only)
+        for prefix, (model, names) in self.opaque.items():
+            if not prefix:
+                names = names - set(queryset.query.annotations)
+            if names:
+                for model_field in model._meta.concrete_fields:
+                    self.add(only, prefix + model_field.name)
+        return only
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        seen = {
+            lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+            for lookup in queryset._prefetch_related_lookups
+        }
+        prefetches = [lookup for lookup in self.prefetch_related if lookup.prefetch_to not in seen]
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset.only(*self.get_only(queryset))
+
+
+# Applies the `QueryPlan` of the action's serializer to the filtered
+# queryset of read actions (`query_plan_actions`), so the joins,
+# prefetches and loaded columns follow the serializer. Writes keep full
+# instances. Paginator ordering fields are always loaded.
+class QueryPlanMixin:
+    query_plan_actions = ("list", "retrieve")
+
+    def get_query_plan(self):
+        return QueryPlan(self.get_serializer())
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action not in self.query_plan_actions:
+            return queryset
+
+        plan = self.get_query_plan()
+        ordering = getattr(self.paginator, "ordering", None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        for name in ordering:
+            plan.add_column(queryset.model, "", name.lstrip("-"))
+        return plan.apply(queryset)
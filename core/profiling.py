@@ -0,0 +1,187 @@
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import uuid
+from collections import Counter
+from pathlib import Path
+from time import perf_counter, time
+
+from django.conf import settings
+from django.core import signing
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_FORMATS = {
+    "pstats": (".prof", "application/octet-stream"),
+    "collapsed": (".collapsed", "text/plain; charset=utf-8"),
+}
+_TOKEN_SALT = "core.profiling"
+_write_lock = threading.Lock()
+
+
+def get_profile_dir():
+    return Path(getattr(settings, "PROFILE_DIR", settings.BASE_DIR / "profiles"))
+
+
+def make_profile_token():
+    """A value for the `X-Profile` header that profiles the requests sending it."""
+    return signing.TimestampSigner(salt=_TOKEN_SALT).sign(uuid.uuid4().hex)
+
+
+def is_valid_profile_token(value):
+    max_age = getattr(settings, "PROFILE_TOKEN_MAX_AGE", 3600)
+    try:
+        signing.TimestampSigner(salt=_TOKEN_SALT).unsign(value, max_age=max_age)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def _frame_label(code):
+    path = code.co_filename
+    base = str(settings.BASE_DIR)
+    if path.startswith(base):
+        path = os.path.relpath(path, base)
+    else:
+        _, found, tail = path.rpartition("site-packages" + os.sep)
+        path = tail if found else os.path.basename(path)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    """
+    Sample the stack of one thread every `interval` seconds from a
+    background thread, counting identical stacks in the collapsed format
+    flamegraph tools read (`outer;inner;leaf count`).
+    """
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def run(self):
+        labels = {}
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if code not in labels:
+                    labels[code] = _frame_label(code)
+                stack.append(labels[code])
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def list_profiles():
+    """Metadata of the stored profiles, newest first."""
+    profiles = []
+    for path in get_profile_dir().glob("*.json"):
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return sorted(profiles, key=lambda profile: profile["created_at"], reverse=True)
+
+
+def get_profile_path(profile_id, profile_format):
+    """The file of a stored profile, or None if there is no such profile."""
+    if profile_format not in PROFILE_FORMATS:
+        return None
+    suffix, _ = PROFILE_FORMATS[profile_format]
+    path = get_profile_dir() / f"{profile_id}{suffix}"
+    return path if path.is_file() else None
+
+
+def _prune_profiles(directory, keep):
+    stored = sorted(directory.glob("*.json"), key=lambda path: path.stem)
+    for metadata in stored[:max(len(stored) - keep, 0)]:
+        for suffix in (".json", *(suffix for suffix, _ in PROFILE_FORMATS.values())):
+            metadata.with_suffix(suffix).unlink(missing_ok=True)
+
+
+def save_profile(metadata, profiler, sampler):
+    directory = get_profile_dir()
+    profile_id = metadata["id"]
+    with _write_lock:
+        directory.mkdir(parents=True, exist_ok=True)
+        if profiler is not None:
+            profiler.dump_stats(directory / f"{profile_id}.prof")
+        (directory / f"{profile_id}.collapsed").write_text(sampler.collapsed())
+        (directory / f"{profile_id}.json").write_text(json.dumps(metadata))
+        _prune_profiles(directory, getattr(settings, "PROFILE_MAX_FILES", 100))
+
+
+class ProfilingMiddleware:
+    """
+    Profile a `PROFILE_SAMPLE_RATE` fraction of requests (none by default),
+    plus every request with a valid signed `X-Profile` header, under
+    cProfile and a stack sampler. The pstats dump, the collapsed stacks and
+    the request's metadata are written to `PROFILE_DIR`, keeping the newest
+    `PROFILE_MAX_FILES` profiles, and the profile id is returned in the
+    `X-Profile-Id` response header.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        token = request.headers.get(PROFILE_HEADER)
+        if token:
+            return is_valid_profile_token(token)
+        rate = getattr(settings, "PROFILE_SAMPLE_RATE", 0)
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        sampler = StackSampler(
+            threading.get_ident(), getattr(settings, "PROFILE_SAMPLE_INTERVAL", 0.005)
+        )
+        created_at = time()
+        start = perf_counter()
+        sampler.start()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is active (Python 3.12+ allows one per process).
+            profiler = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            sampler.stop()
+
+        resolver_match = request.resolver_match
+        profile_id = f"{int(created_at * 1000)}-{uuid.uuid4().hex[:8]}"
+        save_profile({
+            "id": profile_id,
+            "created_at": created_at,
+            "method": request.method,
+            "path": request.path,
+            "view": resolver_match.view_name if resolver_match else None,
+            "status": response.status_code,
+            "duration": perf_counter() - start,
+            "samples": sum(sampler.stacks.values()),
+            "formats": [*(["pstats"] if profiler is not None else []), "collapsed"],
+        }, profiler, sampler)
+        response[PROFILE_ID_HEADER] = profile_id
+        return response
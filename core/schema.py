@@ -0,0 +1,48 @@
+from drf_spectacular import openapi
+from drf_spectacular.contrib.rest_framework_simplejwt import TokenRefreshSerializerExtension
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+
+from core.fieldsets import EXPAND_PARAM, FIELDS_PARAM, SparseFieldsetMixin, get_expandable_fields
+
+
+class AutoSchema(openapi.AutoSchema):
+    """Documents `?fields=` and `?expand=` on views with `SparseFieldsetMixin`."""
+    def get_override_parameters(self):
+        parameters = super().get_override_parameters()
+        view = self.view
+        if not isinstance(view, SparseFieldsetMixin) or view.action not in view.fieldset_actions:
+            return parameters
+
+        parameters = parameters + [
+            OpenApiParameter(
+                FIELDS_PARAM,
+                type=OpenApiTypes.STR,
+                description="Comma-separated fields to return, dots for nested fields "
+                            "(ex. ?fields=departure_time,route.source)",
+            ),
+        ]
+        expandable = get_expandable_fields(view.get_serializer_class())
+        if expandable:
+            parameters.append(OpenApiParameter(
+                EXPAND_PARAM,
+                type=OpenApiTypes.STR,
+                description=f"Comma-separated related objects to embed: {', '.join(expandable)}",
+            ))
+        return parameters
+
+
+class MetricsTokenScheme(OpenApiAuthenticationExtension):
+    target_class = "core.views.MetricsTokenAuthentication"
+    name = "metricsToken"
+
+    def get_security_definition(self, auto_schema):
+        return {"type": "http", "scheme": "bearer", "description": "The METRICS_TOKEN setting"}
+
+
+class ClaimsTokenRefreshSerializerScheme(TokenRefreshSerializerExtension):
+    target_class = "accounts.serializers.ClaimsTokenRefreshSerializer"
+
+    def get_name(self, auto_schema, direction):
+        return "TokenRefresh"
@@ -40,6 +40,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.metrics.MetricsMiddleware",
+    "core.profiling.ProfilingMiddleware",
+    "core.slow_queries.SlowQueryMiddleware",
+    "core.nplusone.NPlusOneMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -131,10 +135,19 @@ AUTH_USER_MODEL = "accounts.User"
 
 # DRF settings
 REST_FRAMEWORK = {
-    "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_SCHEMA_CLASS": "core.schema.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "core.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
 }
 
 # JWT settings
@@ -142,8 +155,87 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=5),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": False,
+    "TOKEN_OBTAIN_SERIALIZER": "accounts.serializers.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "accounts.serializers.ClaimsTokenRefreshSerializer",
+}
+
+# Seconds a user loaded for a token without role claims is reused by
+# ClaimsJWTAuthentication in the same process, 0 to always query
+JWT_USER_CACHE_TTL = int(os.environ.get("JWT_USER_CACHE_TTL", 60))
+
+# Seconds before the in-process route graph is rebuilt from the database
+# to pick up flights changed by other processes
+ROUTE_GRAPH_MAX_AGE = int(os.environ.get("ROUTE_GRAPH_MAX_AGE", 300))
+
+# Cache backend, local memory unless configured (ex. a shared
+# django.core.cache.backends.redis.RedisCache in production)
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "DJANGO_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.environ.get("DJANGO_CACHE_LOCATION", ""),
+    }
 }
 
+# Seconds a cached reference data response is kept; writes to the
+# underlying models make it stale immediately regardless
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get("RESPONSE_CACHE_TIMEOUT", 3600))
+
+# Most (view, action) series kept by the request metrics of each process;
+# further pairs are recorded as <other>
+METRICS_MAX_SERIES = int(os.environ.get("METRICS_MAX_SERIES", 1000))
+
+# Bearer token a Prometheus scraper sends to read /metrics; without it
+# only admin users can
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Request profiling: the fraction of requests profiled (0 for none; requests
+# with a signed X-Profile header from /profiles/token/ always are), the
+# stack sampling interval in seconds, where profiles are written and how
+# many are kept, and how long a profile token is valid in seconds
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", 0.005))
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", BASE_DIR / "profiles"))
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 100))
+PROFILE_TOKEN_MAX_AGE = int(os.environ.get("PROFILE_TOKEN_MAX_AGE", 3600))
+
+# Statements slower than SLOW_QUERY_THRESHOLD seconds (0 to disable) are
+# written with their PostgreSQL plan to a rotating JSON lines log
+SLOW_QUERY_THRESHOLD = float(os.environ.get("SLOW_QUERY_THRESHOLD", 0.5))
+SLOW_QUERY_EXPLAIN = os.environ.get("SLOW_QUERY_EXPLAIN", "True") == "True"
+SLOW_QUERY_LOG = os.environ.get("SLOW_QUERY_LOG", BASE_DIR / "slow_queries.jsonl")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "message": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "slow_queries": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": SLOW_QUERY_LOG,
+            "maxBytes": int(os.environ.get("SLOW_QUERY_LOG_MAX_BYTES", 10 * 1024 * 1024)),
+            "backupCount": int(os.environ.get("SLOW_QUERY_LOG_BACKUPS", 5)),
+            "formatter": "message",
+            "delay": True,
+        },
+    },
+    "loggers": {
+        "core.slow_queries": {
+            "handlers": ["slow_queries"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
+
+# Requests running one SELECT shape more than NPLUSONE_MAX_REPEATS times
+# raise RepeatedQueriesError (0 disables the check; tests turn it on)
+NPLUSONE_MAX_REPEATS = int(os.environ.get("NPLUSONE_MAX_REPEATS", 0))
+
 # Django Debug Toolbar
 DEBUG_TOOLBAR_CONFIG = {
     "IS_RUNNING_TESTS": False,
@@ -0,0 +1,156 @@
+import json
+import logging
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from time import perf_counter
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+MAX_PARAM_LENGTH = 200
+
+# Execute wrappers and request middleware, whose frames sit between a query
+# and the code that ran it.
+EXECUTE_WRAPPER_MODULES = {"core.metrics", "core.nplusone", "core.profiling", __name__}
+
+_current_view = ContextVar("slow_query_view", default=None)
+_explaining = ContextVar("slow_query_explaining", default=False)
+
+
+def project_frame():
+    """`path:line in function` of the innermost caller in this project."""
+    base = str(settings.BASE_DIR)
+    frame = sys._getframe(1)
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if (
+            path.startswith(base)
+            and "site-packages" not in path
+            and frame.f_globals.get("__name__") not in EXECUTE_WRAPPER_MODULES
+        ):
+            return f"{path[len(base) + 1:]}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def _param(value):
+    value = value if isinstance(value, (int, float, bool, type(None))) else str(value)
+    if isinstance(value, str) and len(value) > MAX_PARAM_LENGTH:
+        value = value[:MAX_PARAM_LENGTH] + "..."
+    return value
+
+
+def seq_scans(plan):
+    """The relations a PostgreSQL JSON plan reads with a sequential scan."""
+    relations = []
+    nodes = [node["Plan"] for node in plan] if isinstance(plan, list) else [plan]
+    while nodes:
+        node = nodes.pop()
+        if node.get("Node Type") == "Seq Scan":
+            relations.append(node["Relation Name"])
+        nodes.extend(node.get("Plans", ()))
+    return sorted(relations)
+
+
+def explain(connection, sql, params):
+    """The JSON plan of `sql` on PostgreSQL, None elsewhere or on error."""
+    if connection.vendor != "postgresql" or not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    token = _explaining.set(True)
+    try:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE off, FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+    finally:
+        _explaining.reset(token)
+    return json.loads(plan) if isinstance(plan, str) else plan
+
+
+class SlowQueryRecorder:
+    """
+    `execute_wrapper` logging every statement slower than
+    `SLOW_QUERY_THRESHOLD` seconds to the `core.slow_queries` logger as one
+    JSON object: the SQL and parameters, the view and action being served,
+    the innermost project frame and, on PostgreSQL, the plan and the
+    relations it scans sequentially.
+    """
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __call__(self, execute, sql, params, many, context):
+        threshold = getattr(settings, "SLOW_QUERY_THRESHOLD", 0)
+        if threshold <= 0 or _explaining.get():
+            return execute(sql, params, many, context)
+
+        start = perf_counter()
+        failed = True
+        try:
+            result = execute(sql, params, many, context)
+            failed = False
+            return result
+        finally:
+            duration = perf_counter() - start
+            if duration >= threshold:
+                self.record(sql, params, many, duration, failed)
+
+    def record(self, sql, params, many, duration, failed=False):
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "duration": round(duration, 6),
+            "database": self.connection.alias,
+            "sql": sql,
+            "params": None if many or params is None else [_param(param) for param in params],
+            "many": many,
+            **(_current_view.get() or {"view": None, "action": None}),
+            "frame": project_frame(),
+            "failed": failed,
+        }
+        if not (many or failed) and getattr(settings, "SLOW_QUERY_EXPLAIN", True):
+            entry["plan"] = explain(self.connection, sql, params)
+            entry["seq_scans"] = seq_scans(entry["plan"]) if entry["plan"] else None
+        logger.warning(json.dumps(entry, default=str))
+
+
+def install_recorder(connection):
+    # First in the list, so that `execute_wrapper()` blocks already open on
+    # the connection still pop their own wrapper.
+    if not any(isinstance(wrapper, SlowQueryRecorder) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.insert(0, SlowQueryRecorder(connection))
+
+
+@receiver(connection_created)
+def install_recorder_on_connect(sender, connection, **kwargs):
+    install_recorder(connection)
+
+
+class SlowQueryMiddleware:
+    """
+    Install the slow query recorder and tell it which view and action
+    (viewset action or HTTP method) the queries of a request run for.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        for connection in connections.all():
+            install_recorder(connection)
+
+    def __call__(self, request):
+        token = _current_view.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        method = request.method.lower()
+        _current_view.set({
+            "view": request.resolver_match.view_name,
+            "action": (getattr(view_func, "actions", None) or {}).get(method, method),
+        })
@@ -6,6 +6,13 @@ from drf_spectacular.views import (
 )
 
 from core.settings import DEBUG
+from core.views import (
+    MetricsView,
+    ProfileDownloadView,
+    ProfileListView,
+    ProfileTokenView,
+    ResponseCacheStatsView,
+)
 
 urlpatterns = [
     path("schema/", SpectacularAPIView.as_view(), name="schema"),
@@ -20,6 +27,16 @@ urlpatterns = [
         name="redoc",
     ),
 
+    path("cache-stats/", ResponseCacheStatsView.as_view(), name="cache-stats"),
+    path("metrics", MetricsView.as_view(), name="metrics"),
+    path("profiles/", ProfileListView.as_view(), name="profile-list"),
+    path("profiles/token/", ProfileTokenView.as_view(), name="profile-token"),
+    path(
+        "profiles/<slug:profile_id>/<str:profile_format>/",
+        ProfileDownloadView.as_view(),
+        name="profile-download",
+    ),
+
     path("accounts/", include("accounts.urls", namespace="accounts")),
     path("", include("airport.urls", namespace="airport")),
 ]
@@ -0,0 +1,183 @@
+from types import SimpleNamespace
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.relations import (
+    HyperlinkedIdentityField,
+    PrimaryKeyRelatedField,
+    RelatedField,
+    SlugRelatedField,
+)
+
+
+def _is_column(model, attrs):
+    for attr in attrs:
+        if model is None:
+            return False
+        try:
+            field = model._meta.pk if attr == "pk" else model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return False
+        model = field.related_model
+    return field.concrete
+
+
+class ValuesPlan:
+    """
+    A read-only serializer compiled into `.values()` lookups and a
+    row-to-dict transform.
+
+    Plain fields and annotations read their own column, `SlugRelatedField`
+    and `PrimaryKeyRelatedField` read the related column or the foreign
+    key, identity hyperlinks read the lookup field and nested serializers
+    are compiled in place, joining through their source. Every value goes
+    through the bound field's `to_representation`, so rows come out exactly
+    as the serializer would render the model instances. Fields that need an
+    instance (method fields, properties, many-valued relations, custom
+    `to_representation`) raise `ImproperlyConfigured`; top-level names that
+    are not columns are collected in `annotations` and must be annotated
+    on the queryset.
+    """
+    def __init__(self, serializer, prefix=""):
+        if type(serializer).to_representation is not serializers.Serializer.to_representation:
+            raise ImproperlyConfigured(
+                f"{type(serializer).__name__} overrides to_representation() "
+                "and cannot be compiled to values()."
+            )
+        self.model = getattr(getattr(serializer, "Meta", None), "model", None)
+        self.lookups = [f"{prefix}pk"]
+        self.annotations = []
+        self.steps = [
+            (field.field_name, self.compile_field(field, prefix))
+            for field in serializer._readable_fields
+        ]
+
+    def lookup(self, path):
+        if path not in self.lookups:
+            self.lookups.append(path)
+        return path
+
+    def compile_field(self, field, prefix):
+        path = prefix + "__".join(field.source_attrs)
+
+        if isinstance(field, serializers.BaseSerializer):
+            if isinstance(field, serializers.ListSerializer) or field.source == "*":
+                raise self.unsupported(field)
+            nested = ValuesPlan(field, prefix=f"{path}__")
+            self.lookups.extend(lookup for lookup in nested.lookups if lookup not in self.lookups)
+            pk = f"{path}__pk"
+
+            def represent_nested(row):
+                return None if row[pk] is None else nested.to_representation(row)
+            return represent_nested
+
+        if isinstance(field, HyperlinkedIdentityField):
+            pk = self.lookup(f"{prefix}pk")
+            value = self.lookup(prefix + field.lookup_field)
+
+            def represent_url(row):
+                obj = SimpleNamespace(pk=row[pk])
+                setattr(obj, field.lookup_field, row[value])
+                return field.to_representation(obj)
+            return represent_url
+
+        if isinstance(field, SlugRelatedField):
+            lookup = self.lookup(f"{path}__{field.slug_field}")
+            return lambda row: row[lookup]
+
+        if isinstance(field, PrimaryKeyRelatedField):
+            lookup = self.lookup(path)
+            pk_field = field.pk_field
+
+            def represent_pk(row):
+                value = row[lookup]
+                if value is None or pk_field is None:
+                    return value
+                return pk_field.to_representation(value)
+            return represent_pk
+
+        unsupported = (RelatedField, serializers.ManyRelatedField, serializers.SerializerMethodField)
+        if isinstance(field, unsupported) or field.source == "*":
+            raise self.unsupported(field)
+
+        if not _is_column(self.model, field.source_attrs):
+            if prefix:
+                raise self.unsupported(field)
+            self.annotations.append(path)
+        lookup = self.lookup(path)
+        to_representation = field.to_representation
+
+        def represent(row):
+            value = row[lookup]
+            return None if value is None else to_representation(value)
+        return represent
+
+    @staticmethod
+    def unsupported(field):
+        return ImproperlyConfigured(
+            f"{type(field).__name__} {field.field_name!r} cannot be compiled to values()."
+        )
+
+    def to_representation(self, row):
+        return {key: represent(row) for key, represent in self.steps}
+
+
+class ValuesListSerializer(serializers.ListSerializer):
+    """`ListSerializer` that renders `.values()` rows with a `ValuesPlan`."""
+    def to_representation(self, data):
+        plan = ValuesPlan(self.child)
+        return [
+            plan.to_representation(item) if isinstance(item, dict)
+            else self.child.to_representation(item)
+            for item in data
+        ]
+
+
+# Opt-in for read-only list actions: the filtered queryset is narrowed to
+# the `.values()` lookups of the action's serializer (plus the paginator's
+# ordering fields), and `get_serializer(many=True)` returns a
+# `ValuesListSerializer`, so no model instance is built. Requests whose
+# serializer cannot be compiled (e.g. with an expanded many-valued field or
+# a property) are served from instances as usual.
+class ValuesListMixin:
+    values_actions = ("list",)
+
+    def get_values_plan(self):
+        if not hasattr(self, "_values_plan"):
+            self._values_plan = None
+            try:
+                self._values_plan = ValuesPlan(self.get_serializer())
+            except ImproperlyConfigured:
+                pass
+        return self._values_plan
+
+    def uses_values(self):
+        return self.action in self.values_actions and self.get_values_plan() is not None
+
+    def get_values_lookups(self):
+        lookups = list(self.get_values_plan().lookups)
+        ordering = getattr(self.paginator, "ordering", None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        for name in ordering:
+            name = name.lstrip("-")
+            if name not in lookups:
+                lookups.append(name)
+        return lookups
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.uses_values():
+            if set(self.get_values_plan().annotations) <= set(queryset.query.annotations):
+                return queryset.prefetch_related(None).values(*self.get_values_lookups())
+            self._values_plan = None
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if not (kwargs.get("many") and self.uses_values()):
+            return super().get_serializer(*args, **kwargs)
+
+        kwargs.pop("many")
+        kwargs.setdefault("context", self.get_serializer_context())
+        child = self.get_serializer_class()(context=kwargs["context"])
+        return ValuesListSerializer(*args, child=child, **kwargs)
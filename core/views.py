@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import FileResponse, Http404
+from django.utils.crypto import constant_time_compare
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.permissions import BasePermission, IsAdminUser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.authentication import ClaimsJWTAuthentication
+from core.caching import get_response_cache_stats
+from core.metrics import registry
+from core.profiling import (
+    PROFILE_FORMATS,
+    PROFILE_HEADER,
+    get_profile_path,
+    list_profiles,
+    make_profile_token,
+)
+
+
+class ResponseCacheStatsView(APIView):
+    """Response cache hits and misses per viewset since this process started."""
+    authentication_classes = (ClaimsJWTAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request):
+        return Response(get_response_cache_stats())
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = "text/plain"
+    format = "prometheus"
+    charset = "utf-8"
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data.encode(self.charset) if isinstance(data, str) else b""
+
+
+class MetricsTokenAuthentication(BaseAuthentication):
+    """A `Bearer` token equal to the `METRICS_TOKEN` setting, when it is set."""
+    def authenticate(self, request):
+        token = getattr(settings, "METRICS_TOKEN", "")
+        scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+        if token and scheme == "Bearer" and constant_time_compare(credentials, token):
+            return AnonymousUser(), token
+        return None
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="metrics"'
+
+
+class HasMetricsToken(BasePermission):
+    def has_permission(self, request, view):
+        token = getattr(settings, "METRICS_TOKEN", "")
+        return bool(token) and request.auth == token
+
+
+class MetricsView(APIView):
+    """Request metrics of this process in the Prometheus text format."""
+    authentication_classes = (MetricsTokenAuthentication, ClaimsJWTAuthentication)
+    permission_classes = (HasMetricsToken | IsAdminUser,)
+    renderer_classes = (PrometheusRenderer,)
+
+    @extend_schema(responses={(200, "text/plain"): OpenApiTypes.STR})
+    def get(self, request):
+        return Response(registry.render(), content_type=PrometheusRenderer.content_type)
+
+
+class ProfileListView(APIView):
+    """Stored request profiles of this host, newest first."""
+    authentication_classes = (ClaimsJWTAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request):
+        return Response(list_profiles())
+
+
+class ProfileDownloadView(APIView):
+    """
+    Download a stored profile: `pstats` for `python -m pstats` or snakeviz,
+    `collapsed` for flamegraph.pl or speedscope.
+    """
+    authentication_classes = (ClaimsJWTAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(responses={(200, "application/octet-stream"): OpenApiTypes.BINARY})
+    def get(self, request, profile_id, profile_format):
+        path = get_profile_path(profile_id, profile_format)
+        if path is None:
+            raise Http404
+        _, content_type = PROFILE_FORMATS[profile_format]
+        return FileResponse(path.open("rb"), as_attachment=True, content_type=content_type)
+
+
+class ProfileTokenView(APIView):
+    """A signed `X-Profile` header value; requests sending it are profiled."""
+    authentication_classes = (ClaimsJWTAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(request=None, responses=OpenApiTypes.OBJECT)
+    def post(self, request):
+        return Response({
+            "header": PROFILE_HEADER,
+            "token": make_profile_token(),
+            "expires_in": getattr(settings, "PROFILE_TOKEN_MAX_AGE", 3600),
+        })